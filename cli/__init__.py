@@ -0,0 +1 @@
+"""main.py 命令列工具使用的輔助模組"""
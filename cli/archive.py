@@ -0,0 +1,88 @@
+"""
+壓縮檔輸出
+
+--zip 模式下，生成的文檔直接寫入單一 zip 壓縮檔，不在輸出目錄中逐一寫出
+.docx 文件；可選擇一併寫入彙整所有項目的 manifest.csv。
+
+壓縮檔先寫到 .partial 暫存檔，完成時才改名，中斷時不會留下不完整的壓縮檔。
+.docx 本身已經是壓縮過的 zip，因此以 ZIP_STORED 存入，不再重複壓縮。
+"""
+
+import codecs
+import csv
+import os
+import tempfile
+import zipfile
+
+
+MANIFEST_CSV = 'manifest.csv'
+
+MANIFEST_COLUMNS = [
+    'code', 'project_name', 'company_name', 'contacts', 'date',
+    'price', 'untaxed', 'taxes', 'files'
+]
+
+
+class ZipOutput:
+    def __init__(self, path, manifest_csv=False):
+        self.path = path
+        self.partial_path = f'{path}.partial'
+        self.zip = zipfile.ZipFile(self.partial_path, 'w', compression=zipfile.ZIP_STORED)
+        self.names = set()
+        self.document_count = 0
+
+        # manifest.csv 先寫到暫存檔，關閉時再放入壓縮檔
+        self.csv_file = None
+        if manifest_csv:
+            self.csv_file = tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=MANIFEST_COLUMNS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+
+    def add_project(self, processed_data, documents):
+        """
+        寫入一個項目的文檔 [(file_name, bytes)]，返回實際使用的文件名列表
+
+        同名的文件會在名稱前加上項目編號以免互相覆蓋。
+        """
+        names = []
+        for file_name, content in documents:
+            if file_name in self.names:
+                file_name = f'{processed_data["code"]}_{file_name}'
+            self.zip.writestr(file_name, content)
+            self.names.add(file_name)
+            names.append(file_name)
+
+        self.document_count += len(names)
+        if self.csv_file is not None:
+            self.csv_writer.writerow({**processed_data, 'files': ';'.join(names)})
+
+        return names
+
+    def close(self):
+        """完成壓縮檔；沒有寫入任何文檔時捨棄，返回壓縮檔路徑或 None"""
+        if self.csv_file is not None:
+            if self.document_count:
+                self.csv_file.seek(0)
+                with self.zip.open(MANIFEST_CSV, 'w') as entry:
+                    # BOM 讓 Excel 以 UTF-8 開啟
+                    entry.write(codecs.BOM_UTF8)
+                    for chunk in iter(lambda: self.csv_file.read(64 * 1024), ''):
+                        entry.write(chunk.encode('utf-8'))
+            self.csv_file.close()
+
+        self.zip.close()
+        if not self.document_count:
+            os.remove(self.partial_path)
+            return None
+
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def discard(self):
+        """中斷時捨棄暫存檔"""
+        if self.csv_file is not None:
+            self.csv_file.close()
+        self.zip.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
@@ -0,0 +1,49 @@
+"""
+輸入文件
+
+除了 JSON 陣列外也接受 JSON Lines 與 CSV，並逐筆串流讀取（JSON 陣列也以
+增量方式解析），不需要把整個文件載入記憶體。讀取器與 Cloud Functions 的
+專案匯入共用 functions/src/utils/row_streams.py，functions/ 由 main.py 加入
+匯入路徑。
+"""
+
+import os
+
+from src.utils.row_streams import FORMATS, detect_format, iter_rows
+
+
+# input/ 中依序尋找的輸入文件
+INPUT_FILES = ['projects.json', 'projects.jsonl', 'projects.csv']
+
+
+def input_files(input_dir):
+    """返回 input/ 中存在的輸入文件，依 INPUT_FILES 的順序"""
+    return [
+        os.path.join(input_dir, name)
+        for name in INPUT_FILES
+        if os.path.exists(os.path.join(input_dir, name))
+    ]
+
+
+def find_input_file(input_dir):
+    """返回 input/ 中第一個存在的輸入文件，都不存在時返回 None"""
+    files = input_files(input_dir)
+    return files[0] if files else None
+
+
+def read_projects(file, fmt):
+    """
+    逐筆產生項目，無法解析的記錄以 ValueError 表示（訊息含行號）
+
+    JSON 陣列出現語法錯誤時無法繼續讀取，會直接拋出 ValueError。
+    """
+    for row_number, row in iter_rows(file, fmt):
+        if isinstance(row, ValueError):
+            yield ValueError(f"第 {row_number} 行: {row}")
+        elif not isinstance(row, dict):
+            yield ValueError(f"第 {row_number} 筆記錄不是物件")
+        else:
+            yield row
+
+
+__all__ = ['FORMATS', 'INPUT_FILES', 'detect_format', 'find_input_file', 'input_files', 'read_projects']
@@ -0,0 +1,110 @@
+"""
+編號帳本
+
+以 SQLite 記錄每個日期已發出的最大序號與每個發出的編號，不同次執行（包括
+同一天的多次執行）不會再產生重複的 HIYES 編號：
+
+    counters(date, last_serial)     每個日期一行，分配序號是單行更新
+    codes(code, date, serial, ...)  每個發出的編號，可依編號查詢
+
+序號以區塊預留 (reserve)：一次交易取得一段連續序號，執行結束時歸還沒用
+完的尾段。交易以 BEGIN IMMEDIATE 取得 SQLite 的文件寫入鎖，同一台機器上
+同時執行的多個 CLI 會依序預留，不會拿到相同序號；此時各自歸還不了的尾段
+會在編號中留下空號。
+"""
+
+import sqlite3
+from datetime import datetime
+
+
+# 每次預留的序號數
+RESERVE_BLOCK = 20
+
+# 等待其他執行釋放寫入鎖的秒數
+LOCK_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    date TEXT PRIMARY KEY,
+    last_serial INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS codes (
+    code TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    serial INTEGER NOT NULL,
+    project_name TEXT,
+    company_name TEXT,
+    output_path TEXT,
+    issued_at TEXT NOT NULL
+);
+"""
+
+
+class NumberingLedger:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+        # 日期 -> [下一個可用序號, 已預留的最後序號]
+        self.blocks = {}
+
+    def reserve(self, date_str, count):
+        """原子地預留指定日期的 count 個連續序號，返回第一個序號"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute('SELECT last_serial FROM counters WHERE date = ?', (date_str,)).fetchone()
+            first = (row['last_serial'] if row else 0) + 1
+            self.conn.execute(
+                'INSERT INTO counters (date, last_serial) VALUES (?, ?) '
+                'ON CONFLICT(date) DO UPDATE SET last_serial = excluded.last_serial',
+                (date_str, first + count - 1)
+            )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return first
+
+    def next_serial(self, date_str):
+        """從已預留的區塊中取出下一個序號，用完時再預留一個區塊"""
+        block = self.blocks.get(date_str)
+        if block is None or block[0] > block[1]:
+            first = self.reserve(date_str, RESERVE_BLOCK)
+            block = self.blocks[date_str] = [first, first + RESERVE_BLOCK - 1]
+
+        serial = block[0]
+        block[0] += 1
+        return serial
+
+    def issue(self, code, date_str, serial, project_name=None, company_name=None, output_path=None):
+        """記錄發出的編號"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO codes (code, date, serial, project_name, company_name, output_path, issued_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (code, date_str, serial, project_name, company_name, output_path,
+             datetime.now().isoformat(timespec='seconds'))
+        )
+
+    def lookup(self, code):
+        """依編號查詢發出紀錄，找不到時返回 None"""
+        row = self.conn.execute('SELECT * FROM codes WHERE code = ?', (code,)).fetchone()
+        return dict(row) if row else None
+
+    def release_unused(self):
+        """歸還各區塊沒用完的序號；其他執行已在之後預留時無法歸還"""
+        for date_str, (next_serial, last) in self.blocks.items():
+            if next_serial > last:
+                continue
+            self.conn.execute(
+                'UPDATE counters SET last_serial = ? WHERE date = ? AND last_serial = ?',
+                (next_serial - 1, date_str, last)
+            )
+        self.blocks = {}
+
+    def close(self):
+        self.release_unused()
+        self.conn.close()
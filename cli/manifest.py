@@ -0,0 +1,192 @@
+"""
+執行紀錄 (manifest)
+
+每個輸入文件的執行在 output/.runs/<輸入內容的 SHA-256>.jsonl 逐行追加紀錄，
+程式中途中斷後以同一個輸入重新執行時可從中恢復（即使已經過了一天）：
+
+    {"type": "run", ...}       每次（重新）開始執行，含輸入與模板的雜湊值及輸出目錄
+    {"type": "code", ...}      項目分配到的編號 (index, project_sha256, date, serial, code)
+    {"type": "done", ...}      項目已生成的文檔 (index, data_sha256, templates, outputs)
+                               寫入壓縮檔的文檔在 outputs 中另有 archive 欄位
+    {"type": "completed", ...} 執行成功完成
+
+恢復的執行繼續寫入第一次執行的輸出目錄；項目沿用原來的編號，資料與模板都
+未變、且輸出文件仍存在且未被修改的項目會直接略過。輸入文件被修改後內容雜湊
+不同，視為新的執行，重新由編號帳本 (見 cli.ledger) 分配編號。紀錄中的輸入
+雜湊與本次輸入不符時紀錄作廢，不會沿用。執行成功完成（或以 --fresh 捨棄）
+後紀錄移到輸出目錄並改名為 manifest-YYYYMMDD-HHMMSS.jsonl 保存（檔名已存在時
+加上 -2、-3 等序號）。
+
+只追加寫入，每個項目一行，紀錄檔大小與寫入成本都與項目數成線性關係；中斷
+時寫到一半的最後一行會被忽略。
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+# output/ 中存放進行中執行紀錄的目錄
+RUNS_DIR = '.runs'
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_json(value):
+    """JSON 值的雜湊（鍵排序，與格式無關）"""
+    return sha256_bytes(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+
+
+class RunManifest:
+    def __init__(self, output_base_path, output_path, template_hashes, input_sha256, fresh=False):
+        """
+        output_path 是新執行的輸出目錄；恢復上次的執行時改為該次的輸出目錄
+        """
+        runs_dir = os.path.join(output_base_path, RUNS_DIR)
+        os.makedirs(runs_dir, exist_ok=True)
+        self.path = os.path.join(runs_dir, f'{input_sha256}.jsonl')
+        self.output_path = output_path
+        self.template_hashes = template_hashes
+        self.input_sha256 = input_sha256
+        self.invalidated = False
+
+        # index -> 最近一次的 code / done 紀錄
+        self.codes = {}
+        self.done = {}
+
+        if os.path.exists(self.path):
+            recorded_output_path, valid = self._load()
+            if fresh or not valid:
+                self.invalidated = not fresh
+                self.codes, self.done = {}, {}
+                self._rotate(recorded_output_path or output_path)
+            elif recorded_output_path:
+                self.output_path = recorded_output_path
+
+        self.resumed = bool(self.codes or self.done)
+        os.makedirs(self.output_path, exist_ok=True)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self._append({
+            'type': 'run',
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'input_sha256': input_sha256,
+            'templates': template_hashes,
+            'output_path': self.output_path
+        })
+
+    def _load(self):
+        """讀取紀錄，返回 (第一次執行的輸出目錄, 各次執行的輸入雜湊是否都與本次相同)"""
+        output_path = None
+        valid = True
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中斷時寫到一半的行
+                    continue
+
+                if record.get('type') == 'run':
+                    output_path = output_path or record.get('output_path')
+                    if record.get('input_sha256') != self.input_sha256:
+                        valid = False
+                elif record.get('type') == 'code':
+                    self.codes[record['index']] = record
+                elif record.get('type') == 'done':
+                    self.done[record['index']] = record
+
+        return output_path, valid
+
+    def _rotate(self, output_path=None):
+        """將紀錄檔移到輸出目錄保存，讓下一次執行從頭開始"""
+        output_path = output_path or self.output_path
+        os.makedirs(output_path, exist_ok=True)
+        # 以 O_EXCL 先佔用檔名，同一秒內或不同日期同一時間的紀錄不會互相覆蓋
+        stem = os.path.join(output_path, f'manifest-{datetime.now().strftime("%Y%m%d-%H%M%S")}')
+        counter = 1
+        while True:
+            rotated = f'{stem}.jsonl' if counter == 1 else f'{stem}-{counter}.jsonl'
+            try:
+                os.close(os.open(rotated, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+                break
+            except FileExistsError:
+                counter += 1
+        os.replace(self.path, rotated)
+
+    def _append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def recorded_code(self, index, project_sha256):
+        """輸入內容未變時返回上次分配的編號"""
+        record = self.codes.get(index)
+        if record and record['project_sha256'] == project_sha256:
+            return record['code']
+        return None
+
+    def record_code(self, index, project_sha256, date_str, serial, code):
+        record = {
+            'type': 'code',
+            'index': index,
+            'project_sha256': project_sha256,
+            'date': date_str,
+            'serial': serial,
+            'code': code
+        }
+        self.codes[index] = record
+        self._append(record)
+
+    def completed_outputs(self, index, data_sha256):
+        """
+        返回項目上次生成且仍然有效的文檔列表；需要重新生成時返回 None
+        """
+        record = self.done.get(index)
+        if not record or record['data_sha256'] != data_sha256 or record['templates'] != self.template_hashes:
+            return None
+
+        for output in record['outputs']:
+            # 寫入壓縮檔的文檔無法個別確認，一律重新生成
+            if output.get('archive'):
+                return None
+            path = os.path.join(self.output_path, output['file'])
+            if not os.path.exists(path) or sha256_file(path) != output['sha256']:
+                return None
+
+        return [os.path.join(self.output_path, output['file']) for output in record['outputs']]
+
+    def output_entry(self, path):
+        """輸出目錄中的文檔在 done 紀錄中的項目"""
+        return {'file': os.path.relpath(path, self.output_path), 'sha256': sha256_file(path)}
+
+    def record_done(self, index, code, data_sha256, outputs):
+        record = {
+            'type': 'done',
+            'index': index,
+            'code': code,
+            'data_sha256': data_sha256,
+            'templates': self.template_hashes,
+            'outputs': outputs
+        }
+        self.done[index] = record
+        self._append(record)
+
+    def complete(self):
+        """標記執行成功完成並保存紀錄檔"""
+        self._append({'type': 'completed', 'finished_at': datetime.now().isoformat(timespec='seconds')})
+        self.close()
+        self._rotate()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
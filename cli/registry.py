@@ -0,0 +1,124 @@
+"""
+公司與聯繫人登記表
+
+啟動時讀取一次 config/companies.json 與 config/contacts.json，並以正規化的
+名稱建立索引（全形/半形統一、空白合併、不分大小寫），每個項目的查詢不再
+重新讀檔或線性搜尋。新聯繫人先暫存在記憶體中，執行結束時由 save() 一次
+以原子方式寫回 contacts.json。常駐模式以 is_stale() 檢查配置文件是否被修改，
+需要時重新載入。
+"""
+
+import json
+import os
+import re
+import tempfile
+import unicodedata
+
+
+def normalize_key(name):
+    """正規化名稱：NFKC（全形轉半形）、合併空白、不分大小寫"""
+    if not isinstance(name, str):
+        return ''
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', name)).strip().casefold()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class Registry:
+    def __init__(self, companies, contacts, contacts_file=None):
+        self.companies = companies
+        self.contacts = contacts
+        self.contacts_file = contacts_file
+        self.new_contacts = []
+        # 載入時各配置文件的修改時間
+        self.file_mtimes = {}
+
+        # 同名時保留第一筆，與原本逐一比對的結果一致
+        self.company_index = {}
+        for company in companies:
+            self.company_index.setdefault(normalize_key(company.get('companyName')), company)
+
+        self.contact_index = {}
+        for contact in contacts or []:
+            self.contact_index.setdefault(normalize_key(contact.get('name')), contact)
+
+    @classmethod
+    def load(cls, config_dir):
+        """從 config 目錄讀取公司與聯繫人；聯繫人文件缺失或無法讀取時只停用聯繫人登記"""
+        with open(os.path.join(config_dir, 'companies.json'), 'r', encoding='utf-8') as file:
+            companies = json.load(file)
+
+        contacts_file = os.path.join(config_dir, 'contacts.json')
+        contacts = None
+        if not os.path.exists(contacts_file):
+            print(f"錯誤: 找不到聯繫人文件 {contacts_file}")
+        else:
+            try:
+                with open(contacts_file, 'r', encoding='utf-8') as file:
+                    contacts = json.load(file)
+            except Exception as e:
+                print(f"錯誤: 無法讀取聯繫人文件: {e}")
+
+        registry = cls(companies, contacts, contacts_file if contacts is not None else None)
+        for name in ('companies.json', 'contacts.json'):
+            path = os.path.join(config_dir, name)
+            registry.file_mtimes[path] = _mtime(path)
+        return registry
+
+    def is_stale(self):
+        """載入後配置文件是否被其他程式修改過"""
+        return any(_mtime(path) != mtime for path, mtime in self.file_mtimes.items())
+
+    def company(self, name):
+        """依名稱查找公司，找不到時返回 None"""
+        return self.company_index.get(normalize_key(name))
+
+    def company_names(self):
+        return [c.get('companyName', '') for c in self.companies]
+
+    def contact(self, contact_name):
+        """返回填入模板的聯繫人文字，未登記的聯繫人會加入待寫入清單"""
+        if not contact_name:
+            return ""
+        if self.contacts is None:
+            return contact_name
+
+        key = normalize_key(contact_name)
+        contact = self.contact_index.get(key)
+        if contact is not None:
+            return f"{contact['name']} TEL: {contact['phone']}"
+
+        new_contact = {"name": contact_name, "phone": ""}
+        self.contacts.append(new_contact)
+        self.contact_index[key] = new_contact
+        self.new_contacts.append(new_contact)
+        return contact_name
+
+    def save(self):
+        """將新聯繫人一次寫回 contacts.json（先寫暫存檔再替換）"""
+        if not self.new_contacts or not self.contacts_file:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.contacts_file))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.contacts-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(self.contacts, file, ensure_ascii=False, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.contacts_file)
+            if self.contacts_file in self.file_mtimes:
+                self.file_mtimes[self.contacts_file] = _mtime(self.contacts_file)
+        except Exception as e:
+            print(f"警告: 無法更新聯繫人文件: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        print(f"已新增 {len(self.new_contacts)} 個聯繫人到 {self.contacts_file}")
+        self.new_contacts = []
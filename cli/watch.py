@@ -0,0 +1,98 @@
+"""
+監視目錄
+
+常駐模式 (--watch) 用來等待 input/ 中出現新的輸入文件。Linux 上透過 libc 的
+inotify 在文件寫入完成或移入時立即喚醒；其他平台或 inotify 不可用時改為定期
+輪詢。不需要額外安裝套件。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+
+# 輪詢模式下檢查目錄的間隔 (秒)
+POLL_INTERVAL = 1.0
+
+# 文件大小與修改時間在這段時間內不變才視為寫入完成 (秒)
+SETTLE_SECONDS = 0.2
+
+# inotify 事件 (sys/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+def _inotify_watch(path):
+    """建立監視 path 的 inotify 文件描述符，不支援時返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            os.close(fd)
+            return None
+    except (OSError, AttributeError):
+        return None
+
+    return fd
+
+
+class FolderWatcher:
+    def __init__(self, path, poll_interval=POLL_INTERVAL, inotify=True):
+        """inotify=False 時固定使用輪詢模式"""
+        self.path = path
+        self.poll_interval = poll_interval
+        self.fd = _inotify_watch(path) if inotify else None
+
+    @property
+    def mode(self):
+        return 'inotify' if self.fd is not None else f'輪詢 (每 {self.poll_interval} 秒)'
+
+    def wait(self, timeout=None):
+        """等待目錄有變化；輪詢模式下等待一個輪詢間隔"""
+        if self.fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            return
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            # 只需要被喚醒，事件內容不重要，讀空即可
+            try:
+                while os.read(self.fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def file_signature(path):
+    """文件的 (大小, 修改時間)，文件不存在時返回 None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def wait_until_settled(path, settle_seconds=SETTLE_SECONDS):
+    """等到文件停止變化，返回最後的 signature；文件消失時返回 None"""
+    signature = file_signature(path)
+    while signature is not None:
+        time.sleep(settle_seconds)
+        current = file_signature(path)
+        if current == signature:
+            return signature
+        signature = current
+    return None
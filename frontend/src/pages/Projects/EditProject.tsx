@@ -2,7 +2,9 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useForm } from 'react-hook-form';
 import { Save, X, AlertCircle, Loader } from 'lucide-react';
-import { getDocument, updateDocument, getDocuments } from '../../firebase/firestore';
+import { httpsCallable } from 'firebase/functions';
+import { functions } from '../../firebase/config';
+import { getDocument, getDocuments } from '../../firebase/firestore';
 
 interface Company {
   id: string;
@@ -37,6 +39,9 @@ interface EditProjectFormData {
   extra_data?: Record<string, any>;
 }
 
+// Projects store references as "companies/<id>"; the selects use the id
+const refId = (ref: string) => (ref || '').split('/').pop() || '';
+
 const EditProject: React.FC = () => {
   const { projectId } = useParams<{ projectId: string }>();
   const navigate = useNavigate();
@@ -93,8 +98,8 @@ const EditProject: React.FC = () => {
         // Pre-fill form with project data
         reset({
           project_name: projectData.project_name,
-          company_ref: projectData.company_ref,
-          contact_ref: projectData.contact_ref,
+          company_ref: refId(projectData.company_ref),
+          contact_ref: refId(projectData.contact_ref),
           price: projectData.price,
           date: projectData.date,
           extra_data: projectData.extra_data || {},
@@ -114,7 +119,7 @@ const EditProject: React.FC = () => {
   useEffect(() => {
     if (selectedCompanyRef) {
       const filtered = contacts.filter(
-        (contact) => contact.company_ref === selectedCompanyRef
+        (contact) => refId(contact.company_ref || '') === selectedCompanyRef
       );
       setFilteredContacts(filtered);
     } else {
@@ -144,11 +149,14 @@ const EditProject: React.FC = () => {
         return;
       }
 
-      // Update project in Firestore
-      await updateDocument('projects', projectId, {
+      // Update through the function so the dashboard aggregates follow
+      // price, date and company changes
+      const updateProject = httpsCallable(functions, 'update_project');
+      await updateProject({
+        project_id: projectId,
         project_name: data.project_name,
-        company_ref: data.company_ref,
-        contact_ref: data.contact_ref,
+        company_ref: `companies/${data.company_ref}`,
+        contact_ref: `contacts/${data.contact_ref}`,
         price: data.price,
         date: data.date,
         extra_data: data.extra_data || {},
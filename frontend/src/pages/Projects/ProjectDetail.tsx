@@ -20,7 +20,7 @@ interface Project {
   date: string;
   status: string;
   generated_docs?: GeneratedDoc[];
-  status_history?: StatusHistory[];
+  status_changed_at?: any;
   created_at: any;
   updated_at: any;
   created_by: string;
@@ -37,11 +37,18 @@ interface GeneratedDoc {
 }
 
 interface StatusHistory {
+  id: string;
   status: string;
-  timestamp: any;
+  previous_status: string | null;
+  timestamp: string | null;
   updated_by: string;
 }
 
+interface StatusHistoryPage {
+  entries: StatusHistory[];
+  next_page_token: string | null;
+}
+
 interface Company {
   id: string;
   company_name: string;
@@ -65,6 +72,11 @@ const ProjectDetail: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
+  // Status history (paginated, newest first)
+  const [statusHistory, setStatusHistory] = useState<StatusHistory[]>([]);
+  const [historyPageToken, setHistoryPageToken] = useState<string | null>(null);
+  const [historyLoading, setHistoryLoading] = useState(false);
+
   // Modal states
   const [showStatusModal, setShowStatusModal] = useState(false);
   const [newStatus, setNewStatus] = useState('');
@@ -90,6 +102,7 @@ const ProjectDetail: React.FC = () => {
       }
 
       setProject(projectData);
+      loadStatusHistory();
 
       // Extract company and contact IDs from refs
       const companyId = projectData.company_ref.split('/').pop();
@@ -112,6 +125,28 @@ const ProjectDetail: React.FC = () => {
     }
   };
 
+  const loadStatusHistory = async (pageToken?: string) => {
+    try {
+      setHistoryLoading(true);
+
+      const getHistory = httpsCallable<unknown, StatusHistoryPage>(functions, 'get_project_status_history');
+      const result = await getHistory({
+        project_id: projectId,
+        page_token: pageToken
+      });
+
+      setStatusHistory(prev =>
+        pageToken ? [...prev, ...result.data.entries] : result.data.entries
+      );
+      setHistoryPageToken(result.data.next_page_token);
+
+    } catch (err: any) {
+      console.error('Error loading status history:', err);
+    } finally {
+      setHistoryLoading(false);
+    }
+  };
+
   const handleDownloadDocument = async (doc: GeneratedDoc) => {
     try {
       // In production, this would call a Cloud Function to generate a signed URL
@@ -367,12 +402,12 @@ const ProjectDetail: React.FC = () => {
       </div>
 
       {/* Status History */}
-      {project.status_history && project.status_history.length > 0 && (
+      {statusHistory.length > 0 && (
         <div className="card">
           <h2 className="text-xl font-semibold mb-4">Status History</h2>
           <div className="space-y-3">
-            {project.status_history.map((history, index) => (
-              <div key={index} className="flex items-start gap-3">
+            {statusHistory.map((history) => (
+              <div key={history.id} className="flex items-start gap-3">
                 <Clock className="w-5 h-5 text-gray-400 mt-0.5" />
                 <div className="flex-1">
                   <div className="flex items-center gap-2">
@@ -380,13 +415,22 @@ const ProjectDetail: React.FC = () => {
                       {formatStatus(history.status)}
                     </span>
                     <span className="text-sm text-gray-500">
-                      {history.timestamp?.toDate?.()?.toLocaleString() || 'Just now'}
+                      {history.timestamp ? new Date(history.timestamp).toLocaleString() : 'Just now'}
                     </span>
                   </div>
                 </div>
               </div>
             ))}
           </div>
+          {historyPageToken && (
+            <button
+              onClick={() => loadStatusHistory(historyPageToken)}
+              className="btn-secondary btn-sm mt-4"
+              disabled={historyLoading}
+            >
+              {historyLoading ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       )}
 
@@ -12,6 +12,7 @@ import { getDocument, createDocument, updateDocument } from '../../firebase/fire
 import { ref, uploadBytes, getDownloadURL } from 'firebase/storage';
 import { storage } from '../../firebase/config';
 import { ActivityLogger } from '../../utils/activityLogger';
+import { useAuth } from '../../contexts/AuthContext';
 
 interface TemplateFormData {
   template_name: string;
@@ -25,6 +26,7 @@ interface TemplateFormData {
 const TemplateForm: React.FC = () => {
   const { templateId } = useParams<{ templateId: string }>();
   const navigate = useNavigate();
+  const { user } = useAuth();
   const isEdit = !!templateId;
 
   const [loading, setLoading] = useState(isEdit);
@@ -156,6 +158,7 @@ const TemplateForm: React.FC = () => {
       } else {
         const newId = await createDocument('templates', {
           ...templateData,
+          created_by: user?.uid ?? null,
           created_at: new Date(),
         });
         ActivityLogger.projectCreated(data.template_name, newId);
@@ -4,9 +4,21 @@
  * Logs user activities to Firestore
  */
 
+import { Timestamp } from 'firebase/firestore';
 import { addDocument } from '../firebase/firestore';
 import { auth } from '../firebase/config';
 
+// Raw entries are kept this long, then removed by the Firestore TTL policy
+const ACTIVITY_RETENTION_DAYS = 90;
+
+/**
+ * Month partition and day of a moment in Taiwan time (UTC+8)
+ */
+const activityPartition = (moment: Date): { month: string; day: string } => {
+  const taiwan = new Date(moment.getTime() + 8 * 60 * 60 * 1000).toISOString();
+  return { month: taiwan.slice(0, 7), day: taiwan.slice(0, 10) };
+};
+
 export type ActivityType =
   | 'project_created'
   | 'project_updated'
@@ -39,7 +51,15 @@ export const logActivity = async (data: ActivityData): Promise<void> => {
       return;
     }
 
-    await addDocument('activities', {
+    const now = new Date();
+    const { month, day } = activityPartition(now);
+
+    await addDocument(`activity_log/${month}/entries`, {
+      day,
+      expire_at: Timestamp.fromMillis(
+        now.getTime() + ACTIVITY_RETENTION_DAYS * 24 * 60 * 60 * 1000
+      ),
+      project_id: data.metadata?.project_id ?? null,
       user_id: user.uid,
       user_email: user.email,
       user_name: user.displayName || 'Unknown',
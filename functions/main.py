@@ -1,8 +1,23 @@
 """
 Cloud Functions entry point
 
-This file imports all functions from the src module.
+This file exposes all functions from the src module.
 Firebase Functions looks for main.py in the root directory.
+
+Functions are resolved lazily through src.main, so an instance serving one
+function does not import the modules of all the others.
 """
 
-from src.main import *  # noqa: F401, F403
+import src.main as _functions
+
+__all__ = _functions.__all__
+
+
+def __getattr__(name: str):
+    if name in _functions.FUNCTION_MODULES:
+        return getattr(_functions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_functions.FUNCTION_MODULES))
@@ -10,13 +10,9 @@ Handle document template processing:
 import re
 import io
 from typing import Dict, List, Optional, Tuple
-from docx import Document
-from docx.shared import Pt
-from PyPDF2 import PdfReader
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+
+# python-docx, PyPDF2 and reportlab are imported inside the functions that
+# use them, so importing this module does not slow down cold starts.
 
 
 def extract_variables(text: str) -> List[str]:
@@ -46,6 +42,8 @@ def extract_variables_from_docx(file_path: str) -> Tuple[str, List[str]]:
     Returns:
         Tuple of (text_content, variables_list)
     """
+    from docx import Document
+
     doc = Document(file_path)
 
     # Extract all text
@@ -69,6 +67,8 @@ def extract_variables_from_pdf(file_path: str) -> Tuple[str, List[str]]:
     Returns:
         Tuple of (text_content, variables_list)
     """
+    from PyPDF2 import PdfReader
+
     reader = PdfReader(file_path)
 
     # Extract all text
@@ -110,6 +110,8 @@ def generate_docx(template_path: str, values: Dict[str, str], output_path: str):
         values: Variable values to replace
         output_path: Path for output file
     """
+    from docx import Document
+
     # Load template
     doc = Document(template_path)
 
@@ -146,6 +148,8 @@ def generate_docx_from_text(text: str, values: Dict[str, str], output_path: str)
         values: Variable values to replace
         output_path: Path for output file
     """
+    from docx import Document
+
     # Create new document
     doc = Document()
 
@@ -169,6 +173,11 @@ def generate_pdf_from_text(text: str, values: Dict[str, str], output_path: str):
         values: Variable values to replace
         output_path: Path for output file
     """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+
     # Replace variables
     processed_text = replace_variables(text, values)
 
@@ -0,0 +1,217 @@
+"""
+Generated Document Dependency Index
+
+Maintains a reverse index from companies, contacts and templates to the
+generated documents that used their data, so that a change to any of them
+can be traced to exactly the documents that went stale.
+
+Each generated document gets one entry in the `document_index` collection:
+
+    document_index/{project_id}_{document_id}
+        project_id, document_id, template_id,
+        company_ref, contact_ref,
+        variables: list of template variables the document depends on
+"""
+
+from firebase_admin import firestore
+from typing import Dict, Any, List, Set
+
+from ..projects.variables import STANDARD_VARIABLES
+
+
+INDEX_COLLECTION = 'document_index'
+
+# Standard variables derived from each company / contact field
+COMPANY_FIELD_VARIABLES = {
+    'company_name': {'company_name'},
+    'address': {'company_address'},
+}
+
+CONTACT_FIELD_VARIABLES = {
+    'contact_name': {'contact_name', 'contact_info'},
+    'phone': {'contact_phone', 'contact_info'},
+    'email': {'contact_email'},
+}
+
+# Firestore limits array-contains-any to 30 values
+MAX_ARRAY_CONTAINS_ANY = 30
+
+
+def index_entry_id(project_id: str, document_id: str) -> str:
+    """Return the document_index ID for a generated document."""
+    return f"{project_id}_{document_id}"
+
+
+def template_variable_names(template_data: Dict[str, Any]) -> List[str]:
+    """
+    Get the variable names used by a template.
+
+    Templates store variables either as a flat list or as a dict with
+    'standard' / 'extra' lists. Templates without a variable list are
+    assumed to depend on every standard variable.
+
+    Args:
+        template_data: Template data from Firestore
+
+    Returns:
+        Sorted list of variable names
+    """
+    variables = template_data.get('variables')
+
+    if isinstance(variables, dict):
+        names = set(variables.get('all', []))
+        names.update(variables.get('standard', []))
+        names.update(variables.get('extra', []))
+    elif isinstance(variables, list):
+        names = set(variables)
+    else:
+        names = set()
+
+    if not names:
+        names = set(STANDARD_VARIABLES)
+
+    return sorted(names)
+
+
+def index_generated_documents(
+    db,
+    project_id: str,
+    project_data: Dict[str, Any],
+    generated_docs: List[Dict[str, Any]],
+    batch=None
+) -> None:
+    """
+    Write document_index entries for newly generated documents.
+
+    Args:
+        db: Firestore client
+        project_id: Project ID
+        project_data: Project data from Firestore
+        generated_docs: Document metadata returned by generate_single_document
+        batch: Write batch or UnitOfWork to stage the entries on (optional);
+            when omitted the entries are committed in a batch of their own
+    """
+    template_ids = sorted({doc['template_id'] for doc in generated_docs})
+    template_refs = [db.collection('templates').document(tid) for tid in template_ids]
+
+    template_variables = {}
+    for snapshot in db.get_all(template_refs):
+        if snapshot.exists:
+            template_variables[snapshot.id] = template_variable_names(snapshot.to_dict())
+
+    commit = batch is None
+    if commit:
+        batch = db.batch()
+
+    for doc in generated_docs:
+        entry_ref = db.collection(INDEX_COLLECTION).document(
+            index_entry_id(project_id, doc['id'])
+        )
+        batch.set(entry_ref, {
+            'project_id': project_id,
+            'document_id': doc['id'],
+            'template_id': doc['template_id'],
+            'company_ref': project_data.get('company_ref', ''),
+            'contact_ref': project_data.get('contact_ref', ''),
+            'variables': template_variables.get(
+                doc['template_id'], sorted(STANDARD_VARIABLES)
+            ),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    if commit:
+        batch.commit()
+
+
+def stage_index_refs(
+    db,
+    project_id: str,
+    refs: Dict[str, str],
+    batch,
+    transaction=None
+) -> int:
+    """
+    Point a project's document_index entries at its new company/contact.
+
+    Args:
+        db: Firestore client
+        project_id: Project ID
+        refs: New values of company_ref and/or contact_ref
+        batch: Write batch or UnitOfWork to stage the updates on
+        transaction: Transaction to read the entries in (optional)
+
+    Returns:
+        Number of entries updated
+    """
+    query = db.collection(INDEX_COLLECTION).where('project_id', '==', project_id)
+    snapshots = query.get(transaction=transaction) if transaction else query.get()
+
+    for snapshot in snapshots:
+        batch.update(snapshot.reference, {
+            **refs,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    return len(snapshots)
+
+
+def changed_variables(
+    field_variables: Dict[str, Set[str]],
+    before: Dict[str, Any],
+    after: Dict[str, Any]
+) -> Set[str]:
+    """
+    Work out which standard variables are affected by a document change.
+
+    Args:
+        field_variables: COMPANY_FIELD_VARIABLES or CONTACT_FIELD_VARIABLES
+        before: Document data before the change
+        after: Document data after the change
+
+    Returns:
+        Set of affected variable names (empty if nothing relevant changed)
+    """
+    affected = set()
+
+    for field, variables in field_variables.items():
+        if before.get(field) != after.get(field):
+            affected.update(variables)
+
+    return affected
+
+
+def find_dependent_documents(
+    db,
+    ref_field: str,
+    ref_path: str,
+    variables: Set[str]
+) -> List[Dict[str, Any]]:
+    """
+    Find generated documents that depend on the given variables of a
+    company or contact.
+
+    Args:
+        db: Firestore client
+        ref_field: 'company_ref' or 'contact_ref'
+        ref_path: Firestore path of the changed company/contact
+        variables: Variables that changed
+
+    Returns:
+        List of document_index entries
+    """
+    if not variables:
+        return []
+
+    query = db.collection(INDEX_COLLECTION).where(ref_field, '==', ref_path)
+
+    if len(variables) <= MAX_ARRAY_CONTAINS_ANY:
+        query = query.where('variables', 'array_contains_any', sorted(variables))
+        return [snapshot.to_dict() for snapshot in query.stream()]
+
+    entries = []
+    for snapshot in query.stream():
+        entry = snapshot.to_dict()
+        if variables.intersection(entry.get('variables', [])):
+            entries.append(entry)
+
+    return entries
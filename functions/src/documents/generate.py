@@ -5,31 +5,106 @@ Main function for generating Word documents from templates.
 """
 
 from firebase_functions import https_fn
-from firebase_admin import firestore, storage
-from docx import Document
-from datetime import datetime
+from firebase_admin import firestore
+from datetime import datetime, timezone
+import base64
+import binascii
+import copy
+import io
+import json
 import tempfile
 import os
 import uuid
+from typing import TYPE_CHECKING
 
 from .placeholders import replace_placeholders
-from ..projects.variables import prepare_standard_variables
+from .dependencies import index_generated_documents
+from ..projects.snapshot import get_standard_variables
+from ..templates.usage import stage_usage_increment
+from ..utils.clients import get_db, get_bucket, count_round_trips
+from ..utils.deadline import TimeBudget
+from ..utils.side_effects import SideEffects, UnitOfWork
 
+if TYPE_CHECKING:
+    from docx.document import Document
 
-@https_fn.on_call()
+
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# Callable timeout, and the time kept back for committing finished documents
+FUNCTION_TIMEOUT_SEC = 120
+COMMIT_RESERVE_SEC = 15
+
+# Expected render time of one document before any has been measured
+RENDER_ESTIMATE_SEC = 5
+
+CONTINUATION_VERSION = 1
+
+
+def encode_continuation(project_id: str, template_ids: list) -> str:
+    """Encode the unfinished part of a generation as a continuation token."""
+    payload = {'v': CONTINUATION_VERSION, 'project_id': project_id, 'template_ids': template_ids}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_continuation(token: str) -> dict:
+    """
+    Decode a continuation token.
+
+    Returns:
+        dict with project_id and template_ids
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    if not isinstance(token, str):
+        raise ValueError('Invalid continuation token: must be a string')
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f'Invalid continuation token: {e}')
+
+    if (not isinstance(payload, dict) or payload.get('v') != CONTINUATION_VERSION
+            or not payload.get('project_id') or not isinstance(payload['project_id'], str)
+            or not payload.get('template_ids') or not isinstance(payload['template_ids'], list)
+            or not all(isinstance(tid, str) and tid for tid in payload['template_ids'])):
+        raise ValueError('Invalid continuation token')
+
+    return {'project_id': payload['project_id'], 'template_ids': payload['template_ids']}
+
+
+@https_fn.on_call(timeout_sec=FUNCTION_TIMEOUT_SEC)
+@count_round_trips
 def generate_documents(req: https_fn.CallableRequest) -> dict:
     """
     Generate documents from templates for a project.
 
+    Rendering stops before the function timeout: documents finished by then
+    are committed and the rest are returned as a continuation token, which
+    the client passes back to resume.
+
     Request data:
         project_id: str - Project ID
         template_ids: list[str] - List of template IDs to generate
+        continuation_token: str - Resume an earlier partial generation
+            (replaces project_id / template_ids)
+        async: bool - Queue a generation job instead of rendering in the
+            request (optional, default False)
 
     Returns:
         dict with:
             success: bool
             document_ids: list[str]
             failed_templates: list[dict] (if any failures)
+            complete: bool - False if templates were left unfinished
+            pending_template_ids: list[str] - Templates not yet rendered
+            continuation_token: str (if not complete)
+
+        In async mode:
+            success: bool
+            job_id: str - generation_jobs document to poll or listen to
+            lane: str - 'interactive' or 'bulk'
     """
 
     # Verify authentication
@@ -39,10 +114,35 @@ def generate_documents(req: https_fn.CallableRequest) -> dict:
             message='Authentication required'
         )
 
+    budget = TimeBudget(
+        FUNCTION_TIMEOUT_SEC,
+        reserve_sec=COMMIT_RESERVE_SEC,
+        initial_estimate_sec=RENDER_ESTIMATE_SEC
+    )
+
     # Get request data
     project_id = req.data.get('project_id')
     template_ids = req.data.get('template_ids', [])
 
+    continuation_token = req.data.get('continuation_token')
+    if continuation_token:
+        try:
+            continuation = decode_continuation(continuation_token)
+        except ValueError as e:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+                message=str(e)
+            )
+
+        if project_id and project_id != continuation['project_id']:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+                message='continuation_token belongs to another project'
+            )
+
+        project_id = continuation['project_id']
+        template_ids = continuation['template_ids']
+
     if not project_id:
         raise https_fn.HttpsError(
             code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
@@ -56,8 +156,8 @@ def generate_documents(req: https_fn.CallableRequest) -> dict:
         )
 
     # Initialize Firestore and Storage
-    db = firestore.client()
-    bucket = storage.bucket()
+    db = get_db()
+    bucket = get_bucket()
 
     try:
         # Get project data
@@ -70,38 +170,52 @@ def generate_documents(req: https_fn.CallableRequest) -> dict:
                 message='Project not found'
             )
 
-        project_data = project_doc.to_dict()
+        if req.data.get('async'):
+            from .jobs import FirestoreJobQueue, new_generation_job
 
-        # Get company and contact data
-        company_ref = db.document(project_data['company_ref'])
-        contact_ref = db.document(project_data['contact_ref'])
+            job = new_generation_job(
+                user_id=req.auth.uid,
+                user_name=req.auth.token.get('name', 'Unknown'),
+                project_id=project_id,
+                template_ids=template_ids
+            )
+            job_id = FirestoreJobQueue(db).enqueue(job)
 
-        company_data = company_ref.get().to_dict()
-        contact_data = contact_ref.get().to_dict()
+            return {
+                'success': True,
+                'job_id': job_id,
+                'lane': job['lane']
+            }
 
-        # Prepare standard variables
-        standard_vars = prepare_standard_variables(
-            project_data,
-            company_data,
-            contact_data,
-            db
-        )
+        project_data = project_doc.to_dict()
+
+        # Standard variables come from the project's stored snapshot
+        standard_vars = get_standard_variables(db, project_ref, project_data)
 
         # Generate documents for each template
         generated_docs = []
         failed_templates = []
+        pending_template_ids = []
+
+        for index, template_id in enumerate(template_ids):
+            # Leave enough time to commit what has finished
+            if not budget.can_start():
+                pending_template_ids = list(template_ids[index:])
+                print(f"Time budget reached for project {project_id}: "
+                      f"{len(pending_template_ids)} template(s) left")
+                break
 
-        for template_id in template_ids:
             try:
-                doc_info = generate_single_document(
-                    db=db,
-                    bucket=bucket,
-                    project_id=project_id,
-                    project_data=project_data,
-                    template_id=template_id,
-                    standard_vars=standard_vars,
-                    user_id=req.auth.uid
-                )
+                with budget.measure():
+                    doc_info = generate_single_document(
+                        db=db,
+                        bucket=bucket,
+                        project_id=project_id,
+                        project_data=project_data,
+                        template_id=template_id,
+                        standard_vars=standard_vars,
+                        user_id=req.auth.uid
+                    )
                 generated_docs.append(doc_info)
 
             except Exception as e:
@@ -111,34 +225,35 @@ def generate_documents(req: https_fn.CallableRequest) -> dict:
                     'error': str(e)
                 })
 
-        # Update project with generated documents
+        # Project update, dependency index, usage counters and activity
+        # entry are committed together
+        uow = UnitOfWork(db)
         if generated_docs:
-            project_ref.update({
-                'generated_docs': firestore.ArrayUnion(generated_docs),
-                'updated_at': firestore.SERVER_TIMESTAMP
-            })
-
-        # Log activity
-        db.collection('activities').add({
-            'action': 'generate_documents',
-            'user_id': req.auth.uid,
-            'user_name': req.auth.token.get('name', 'Unknown'),
-            'resource_type': 'project',
-            'resource_id': project_id,
-            'resource_name': project_data.get('project_name', ''),
-            'details': {
-                'template_count': len(template_ids),
-                'generated_count': len(generated_docs),
-                'failed_count': len(failed_templates)
-            },
-            'timestamp': firestore.SERVER_TIMESTAMP
-        })
+            stage_generated_documents(uow, project_ref, project_id, project_data, generated_docs)
+
+        log_generation_activity(
+            uow,
+            user_id=req.auth.uid,
+            user_name=req.auth.token.get('name', 'Unknown'),
+            project_id=project_id,
+            project_data=project_data,
+            template_count=len(template_ids) - len(pending_template_ids),
+            generated_count=len(generated_docs),
+            failed_count=len(failed_templates)
+        )
+        uow.commit()
 
         return {
             'success': True,
             'document_ids': [doc['id'] for doc in generated_docs],
             'documents': generated_docs,
-            'failed_templates': failed_templates if failed_templates else None
+            'failed_templates': failed_templates if failed_templates else None,
+            'complete': not pending_template_ids,
+            'pending_template_ids': pending_template_ids,
+            'continuation_token': (
+                encode_continuation(project_id, pending_template_ids)
+                if pending_template_ids else None
+            )
         }
 
     except https_fn.HttpsError:
@@ -151,6 +266,71 @@ def generate_documents(req: https_fn.CallableRequest) -> dict:
         )
 
 
+def stage_generated_documents(
+    uow: UnitOfWork,
+    project_ref,
+    project_id: str,
+    project_data: dict,
+    generated_docs: list
+) -> None:
+    """
+    Stage the writes recording newly generated documents.
+
+    Adds the documents to the project, indexes their dependencies and
+    counts template usage.
+
+    Args:
+        uow: Unit of work to stage the writes on
+        project_ref: Project document reference
+        project_id: Project ID
+        project_data: Project data from Firestore
+        generated_docs: Document metadata returned by generate_single_document
+    """
+    uow.update(project_ref, {
+        'generated_docs': firestore.ArrayUnion(generated_docs),
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+
+    # Record what each document depends on for later re-renders
+    try:
+        index_generated_documents(uow.db, project_id, project_data, generated_docs, batch=uow)
+    except Exception as e:
+        print(f"Warning: Could not index generated documents: {e}")
+
+    usage = {}
+    for doc in generated_docs:
+        usage[doc['template_id']] = usage.get(doc['template_id'], 0) + 1
+
+    for template_id, count in usage.items():
+        stage_usage_increment(uow, template_id, count)
+
+
+def log_generation_activity(
+    effects: SideEffects,
+    user_id: str,
+    user_name: str,
+    project_id: str,
+    project_data: dict,
+    template_count: int,
+    generated_count: int,
+    failed_count: int
+) -> None:
+    """Buffer the activity entry for a document generation."""
+    effects.log_activity(
+        action='generate_documents',
+        user_id=user_id,
+        user_name=user_name,
+        resource_type='project',
+        resource_id=project_id,
+        resource_name=project_data.get('project_name', ''),
+        details={
+            'template_count': template_count,
+            'generated_count': generated_count,
+            'failed_count': failed_count
+        }
+    )
+
+
 def generate_single_document(
     db,
     bucket,
@@ -180,18 +360,66 @@ def generate_single_document(
     extra_data = project_data.get('extra_data', {}).get(template_id, {})
     all_vars = {**standard_vars, **extra_data}
 
+    # Generate output filename
+    project_name = project_data.get('project_name', 'Project')
+    template_name = template_data.get('name', 'Document')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_filename = f"{project_name}_{template_name}_{timestamp}.docx"
+
+    # Render and upload to Storage
+    output_path = f"documents/{project_id}/{template_id}_{timestamp}.docx"
+    file_size = render_to_storage(
+        bucket, template_data['file_path'], all_vars, output_path
+    )
+
+    # Make it accessible (according to storage rules)
+    file_url = f"gs://{bucket.name}/{output_path}"
+
+    # Create document metadata
+    doc_info = {
+        'id': f"DOC-{uuid.uuid4().hex[:8]}",
+        'template_id': template_id,
+        'template_name': template_data.get('name', ''),
+        'file_url': file_url,
+        'file_path': output_path,
+        'file_name': output_filename,
+        'file_size': file_size,
+        # Server timestamps are not allowed inside the generated_docs array
+        'created_at': datetime.now(timezone.utc),
+        'created_by': user_id,
+        'generation_data': all_vars
+    }
+
+    return doc_info
+
+
+def render_to_storage(bucket, template_path: str, variables: dict, output_path: str) -> int:
+    """
+    Render a Storage template with the given variables and upload the result.
+
+    Args:
+        bucket: Storage bucket
+        template_path: Storage path of the .docx template
+        variables: Placeholder values
+        output_path: Storage path for the rendered document
+
+    Returns:
+        Size of the rendered document in bytes
+    """
+
     # Download template from Storage
-    template_path = template_data['file_path']
     template_blob = bucket.blob(template_path)
 
     with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_template:
         template_blob.download_to_filename(temp_template.name)
         template_file = temp_template.name
 
+    from docx import Document
+
     try:
         # Load and process document
         doc = Document(template_file)
-        replace_placeholders(doc, all_vars)
+        replace_placeholders(doc, variables)
 
         # Save processed document
         with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_output:
@@ -199,38 +427,11 @@ def generate_single_document(
             output_file = temp_output.name
 
         try:
-            # Generate output filename
-            project_name = project_data.get('project_name', 'Project')
-            template_name = template_data.get('name', 'Document')
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_filename = f"{project_name}_{template_name}_{timestamp}.docx"
-
             # Upload to Storage
-            output_path = f"documents/{project_id}/{template_id}_{timestamp}.docx"
             output_blob = bucket.blob(output_path)
             output_blob.upload_from_filename(output_file)
 
-            # Make it accessible (according to storage rules)
-            file_url = f"gs://{bucket.name}/{output_path}"
-
-            # Get file size
-            file_size = os.path.getsize(output_file)
-
-            # Create document metadata
-            doc_info = {
-                'id': f"DOC-{uuid.uuid4().hex[:8]}",
-                'template_id': template_id,
-                'template_name': template_data.get('name', ''),
-                'file_url': file_url,
-                'file_path': output_path,
-                'file_name': output_filename,
-                'file_size': file_size,
-                'created_at': firestore.SERVER_TIMESTAMP,
-                'created_by': user_id,
-                'generation_data': all_vars
-            }
-
-            return doc_info
+            return os.path.getsize(output_file)
 
         finally:
             # Clean up output file
@@ -239,3 +440,33 @@ def generate_single_document(
     finally:
         # Clean up template file
         os.unlink(template_file)
+
+
+def render_parsed_to_storage(bucket, template: 'Document', variables: dict, output_path: str) -> int:
+    """
+    Render an already parsed template and upload the result.
+
+    The template's package is copied before placeholders are replaced, so
+    one parsed template can be rendered many times. (Deep-copying the
+    Document object itself is not enough: its cached body still points at
+    the original XML.)
+
+    Args:
+        bucket: Storage bucket
+        template: Parsed python-docx Document (left unmodified)
+        variables: Placeholder values
+        output_path: Storage path for the rendered document
+
+    Returns:
+        Size of the rendered document in bytes
+    """
+    doc = copy.deepcopy(template.part.package).main_document_part.document
+    replace_placeholders(doc, variables)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    content = buffer.getvalue()
+
+    bucket.blob(output_path).upload_from_string(content, content_type=DOCX_CONTENT_TYPE)
+
+    return len(content)
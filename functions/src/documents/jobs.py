@@ -0,0 +1,471 @@
+"""
+Asynchronous Generation Jobs
+
+`generate_documents` called with `async: true` records a job and returns its
+ID immediately; workers render the documents in the background. Clients
+poll or listen to the job document for per-template progress.
+
+Job documents live in `generation_jobs/{job_id}`:
+
+    status: 'queued' | 'running' | 'completed' | 'failed'
+    lane: 'interactive' (single template) | 'bulk'
+    user_id / user_name, project_id, template_ids
+    progress: {template_id: {status: 'pending' | 'done' | 'failed',
+                             document_id?, error?}}
+    total / completed / failed: progress counters
+    user_backlog: the user's queued/running jobs when this one was queued
+    heartbeat_at: last progress write of the running worker
+
+Scheduling:
+
+- interactive jobs are always claimed before bulk jobs
+- within a lane, jobs are ordered by the backlog their user already had
+  when they were queued (then by age), so users take turns and one user's
+  bulk backlog cannot starve everyone else
+- at most MAX_RUNNING_JOBS jobs run at once, MAX_RUNNING_PER_USER per user
+
+Each generated document is committed to its project as soon as it is
+rendered, so a job interrupted by the function timeout loses nothing; the
+scheduled sweep re-queues and runs it, and the worker skips finished
+templates. Workers are triggered by job creation only, so per-template
+progress writes never start another worker.
+
+The queue backend is pluggable: FirestoreJobQueue in production and
+InMemoryJobQueue, an in-process stand-in with the same scheduling, for tests.
+"""
+
+from firebase_functions import firestore_fn, scheduler_fn
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple, Callable
+import itertools
+import threading
+import time
+
+from .generate import (
+    generate_single_document,
+    stage_generated_documents,
+    log_generation_activity,
+)
+from ..projects.snapshot import get_standard_variables
+from ..utils.clients import get_db, get_bucket
+from ..utils.side_effects import SideEffects, UnitOfWork
+
+
+JOBS_COLLECTION = 'generation_jobs'
+
+# Priority lanes, highest priority first
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+# Requests with at most this many templates go to the interactive lane
+INTERACTIVE_MAX_TEMPLATES = 1
+
+# Concurrency bounds across all workers
+MAX_RUNNING_JOBS = 8
+MAX_RUNNING_PER_USER = 2
+
+# Jobs run in parallel by one worker
+WORKER_THREADS = 4
+
+# Oldest queued jobs per lane considered when claiming
+CLAIM_WINDOW = 50
+
+# Function timeout and the share of it spent claiming new jobs
+FUNCTION_TIMEOUT_SEC = 540
+WORK_BUDGET_SEC = 420
+
+# Running jobs without a heartbeat for this long are considered dead
+STALL_TIMEOUT = timedelta(seconds=FUNCTION_TIMEOUT_SEC + 60)
+
+Job = Tuple[str, Dict[str, Any]]
+Reporter = Callable[[str, Dict[str, Any]], None]
+
+
+def new_generation_job(user_id: str, user_name: str, project_id: str,
+                       template_ids: List[str]) -> Dict[str, Any]:
+    """
+    Build the data for a new generation job.
+
+    Args:
+        user_id: Requesting user
+        user_name: Requesting user's display name
+        project_id: Project ID
+        template_ids: Templates to generate
+
+    Returns:
+        Job data, ready to enqueue
+    """
+    template_ids = list(dict.fromkeys(template_ids))
+    lane = LANE_INTERACTIVE if len(template_ids) <= INTERACTIVE_MAX_TEMPLATES else LANE_BULK
+
+    return {
+        'status': 'queued',
+        'lane': lane,
+        'user_id': user_id,
+        'user_name': user_name,
+        'project_id': project_id,
+        'template_ids': template_ids,
+        'progress': {tid: {'status': 'pending'} for tid in template_ids},
+        'total': len(template_ids),
+        'completed': 0,
+        'failed': 0,
+        'attempt': 0,
+    }
+
+
+def select_next_job(queued: List[Job], running: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Pick the next job to run.
+
+    Args:
+        queued: Queued jobs as (job_id, data), oldest first
+        running: Data of the jobs currently running
+
+    Returns:
+        Job ID, or None if nothing may start now
+    """
+    if len(running) >= MAX_RUNNING_JOBS:
+        return None
+
+    running_per_user = Counter(job['user_id'] for job in running)
+
+    for lane in LANES:
+        candidates = [
+            (job.get('user_backlog', 0), running_per_user[job['user_id']], position, job_id)
+            for position, (job_id, job) in enumerate(queued)
+            if job.get('lane') == lane
+            and running_per_user[job['user_id']] < MAX_RUNNING_PER_USER
+        ]
+
+        if candidates:
+            return min(candidates)[-1]
+
+    return None
+
+
+class InMemoryJobQueue:
+    """In-process job queue with the same scheduling as FirestoreJobQueue."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def enqueue(self, job: Dict[str, Any]) -> str:
+        with self._lock:
+            job_id = f"job-{next(self._ids)}"
+            backlog = sum(
+                1 for other in self._jobs.values()
+                if other['user_id'] == job['user_id']
+                and other['status'] in ('queued', 'running')
+            )
+            self._jobs[job_id] = {**job, 'status': 'queued', 'user_backlog': backlog}
+            return job_id
+
+    def claim(self) -> Optional[Job]:
+        with self._lock:
+            queued = [(job_id, job) for job_id, job in self._jobs.items()
+                      if job['status'] == 'queued']
+            running = [job for job in self._jobs.values() if job['status'] == 'running']
+
+            job_id = select_next_job(queued, running)
+            if job_id is None:
+                return None
+
+            job = self._jobs[job_id]
+            job['status'] = 'running'
+            job['attempt'] = job.get('attempt', 0) + 1
+            return job_id, dict(job)
+
+    def report(self, job_id: str, template_id: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job['progress'] = {**job.get('progress', {}), template_id: entry}
+            if entry['status'] == 'done':
+                job['completed'] = job.get('completed', 0) + 1
+            elif entry['status'] == 'failed':
+                job['failed'] = job.get('failed', 0) + 1
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._jobs[job_id]['status'] = status
+            if error:
+                self._jobs[job_id]['error'] = error
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._jobs[job_id])
+
+
+class FirestoreJobQueue:
+    """Job queue backed by the generation_jobs collection."""
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.collection(JOBS_COLLECTION)
+
+    def enqueue(self, job: Dict[str, Any]) -> str:
+        backlog_query = (
+            self.collection
+            .where('user_id', '==', job['user_id'])
+            .where('status', 'in', ['queued', 'running'])
+        )
+        backlog = backlog_query.count().get()[0][0].value
+
+        job_ref = self.collection.document()
+        job_ref.set({
+            **job,
+            'user_backlog': backlog,
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        return job_ref.id
+
+    def claim(self) -> Optional[Job]:
+        """Atomically pick the next job and mark it running."""
+
+        @firestore.transactional
+        def claim(transaction):
+            running = [
+                snapshot.to_dict()
+                for snapshot in self.collection.where('status', '==', 'running')
+                .get(transaction=transaction)
+            ]
+
+            queued = []
+            for lane in LANES:
+                query = (
+                    self.collection
+                    .where('status', '==', 'queued')
+                    .where('lane', '==', lane)
+                    .order_by('created_at')
+                    .limit(CLAIM_WINDOW)
+                )
+                queued.extend(
+                    (snapshot.id, snapshot.to_dict())
+                    for snapshot in query.get(transaction=transaction)
+                )
+
+            job_id = select_next_job(queued, running)
+            if job_id is None:
+                return None
+
+            transaction.update(self.collection.document(job_id), {
+                'status': 'running',
+                'attempt': firestore.Increment(1),
+                'started_at': firestore.SERVER_TIMESTAMP,
+                'heartbeat_at': firestore.SERVER_TIMESTAMP,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            return job_id, dict(queued)[job_id]
+
+        return claim(self.db.transaction())
+
+    def report(self, job_id: str, template_id: str, entry: Dict[str, Any]) -> None:
+        update = {
+            FieldPath('progress', template_id).to_api_repr(): entry,
+            'heartbeat_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }
+        if entry['status'] == 'done':
+            update['completed'] = firestore.Increment(1)
+        elif entry['status'] == 'failed':
+            update['failed'] = firestore.Increment(1)
+
+        self.collection.document(job_id).update(update)
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        update = {
+            'status': status,
+            'finished_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }
+        if error:
+            update['error'] = error
+
+        self.collection.document(job_id).update(update)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        return self.collection.document(job_id).get().to_dict()
+
+
+def _run_job(queue, handler, job_id: str, job_data: Dict[str, Any]) -> None:
+    """Run one claimed job and record its final status."""
+
+    def report(template_id: str, entry: Dict[str, Any]) -> None:
+        queue.report(job_id, template_id, entry)
+
+    try:
+        handler(job_id, job_data, report)
+        queue.finish(job_id, 'completed')
+    except Exception as e:
+        print(f"Error processing generation job {job_id}: {e}")
+        queue.finish(job_id, 'failed', str(e))
+
+
+def drain(queue, handler: Callable[[str, Dict[str, Any], Reporter], None],
+          max_workers: int = WORKER_THREADS, deadline: Optional[float] = None) -> int:
+    """
+    Claim and run jobs until none can be claimed or the deadline passes.
+
+    Args:
+        queue: InMemoryJobQueue or FirestoreJobQueue
+        handler: Called as handler(job_id, job_data, report) for each job;
+            report(template_id, entry) records per-template progress
+        max_workers: Jobs run in parallel
+        deadline: time.monotonic() value after which no new job is claimed
+
+    Returns:
+        Number of jobs run
+    """
+    processed = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        active = set()
+
+        while True:
+            while len(active) < max_workers and (deadline is None or time.monotonic() < deadline):
+                claimed = queue.claim()
+                if claimed is None:
+                    break
+                active.add(executor.submit(_run_job, queue, handler, *claimed))
+                processed += 1
+
+            if not active:
+                return processed
+
+            # A finished job may free a slot held back by the limits
+            _, active = wait(active, return_when=FIRST_COMPLETED)
+
+
+def run_generation_job(db, bucket, job_id: str, job_data: Dict[str, Any], report: Reporter) -> None:
+    """
+    Generate the documents of one job, committing each as it finishes.
+
+    Templates already marked done by an earlier attempt are skipped.
+
+    Args:
+        db: Firestore client
+        bucket: Storage bucket
+        job_id: Job ID
+        job_data: Job data
+        report: Progress callback
+    """
+    project_id = job_data['project_id']
+    project_ref = db.collection('projects').document(project_id)
+    project_doc = project_ref.get()
+
+    if not project_doc.exists:
+        raise Exception('Project not found')
+
+    project_data = project_doc.to_dict()
+    standard_vars = get_standard_variables(db, project_ref, project_data)
+    progress = job_data.get('progress', {})
+
+    generated_count = 0
+    failed_count = 0
+
+    for template_id in job_data['template_ids']:
+        if progress.get(template_id, {}).get('status') == 'done':
+            continue
+
+        try:
+            doc_info = generate_single_document(
+                db=db,
+                bucket=bucket,
+                project_id=project_id,
+                project_data=project_data,
+                template_id=template_id,
+                standard_vars=standard_vars,
+                user_id=job_data['user_id']
+            )
+            uow = UnitOfWork(db)
+            stage_generated_documents(uow, project_ref, project_id, project_data, [doc_info])
+            uow.commit()
+            report(template_id, {'status': 'done', 'document_id': doc_info['id']})
+            generated_count += 1
+
+        except Exception as e:
+            print(f"Error generating document for template {template_id} (job {job_id}): {e}")
+            report(template_id, {'status': 'failed', 'error': str(e)})
+            failed_count += 1
+
+    effects = SideEffects(db)
+    log_generation_activity(
+        effects,
+        user_id=job_data['user_id'],
+        user_name=job_data.get('user_name', 'Unknown'),
+        project_id=project_id,
+        project_data=project_data,
+        template_count=len(job_data['template_ids']),
+        generated_count=generated_count,
+        failed_count=failed_count
+    )
+    effects.flush()
+
+
+def _drain_firestore_queue() -> int:
+    """Drain generation_jobs with the shared clients."""
+    db = get_db()
+    bucket = get_bucket()
+
+    def handler(job_id, job_data, report):
+        run_generation_job(db, bucket, job_id, job_data, report)
+
+    return drain(
+        FirestoreJobQueue(db),
+        handler,
+        deadline=time.monotonic() + WORK_BUDGET_SEC
+    )
+
+
+@firestore_fn.on_document_created(
+    document=f'{JOBS_COLLECTION}/{{jobId}}',
+    timeout_sec=FUNCTION_TIMEOUT_SEC
+)
+def process_generation_jobs(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    """
+    Worker: drain the generation queue when a job is queued.
+
+    The worker claims whichever job the scheduler picks next, which is not
+    necessarily the one that triggered it. Only creation triggers it, so
+    the progress writes of running jobs do not; re-queued jobs are drained
+    by the scheduled sweep.
+    """
+    if event.data is None or event.data.to_dict().get('status') != 'queued':
+        return
+
+    processed = _drain_firestore_queue()
+    if processed:
+        print(f"Processed {processed} generation job(s)")
+
+
+@scheduler_fn.on_schedule(schedule='every 5 minutes', timeout_sec=FUNCTION_TIMEOUT_SEC)
+def resume_generation_jobs(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Re-queue stalled jobs and run jobs left waiting on the concurrency limits.
+    """
+    db = get_db()
+    stalled_before = datetime.now(timezone.utc) - STALL_TIMEOUT
+
+    query = (
+        db.collection(JOBS_COLLECTION)
+        .where('status', '==', 'running')
+        .where('heartbeat_at', '<', stalled_before)
+    )
+
+    for snapshot in query.stream():
+        print(f"Resuming stalled generation job {snapshot.id}")
+        snapshot.reference.update({
+            'status': 'queued',
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    processed = _drain_firestore_queue()
+    if processed:
+        print(f"Processed {processed} generation job(s)")
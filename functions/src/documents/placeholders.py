@@ -5,13 +5,14 @@ Handles replacing {{variable}} placeholders in Word documents while
 preserving formatting.
 """
 
-from docx import Document
-from docx.text.paragraph import Paragraph
-from docx.table import Table
-from typing import Dict
+from typing import Dict, TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from docx.document import Document
+    from docx.text.paragraph import Paragraph
 
-def replace_placeholders(doc: Document, data: Dict[str, str]) -> None:
+
+def replace_placeholders(doc: 'Document', data: Dict[str, str]) -> None:
     """
     Replace all {{variable}} placeholders in the document with actual values.
 
@@ -48,7 +49,7 @@ def replace_placeholders(doc: Document, data: Dict[str, str]) -> None:
             replace_in_paragraph(paragraph, data)
 
 
-def replace_in_paragraph(paragraph: Paragraph, data: Dict[str, str]) -> None:
+def replace_in_paragraph(paragraph: 'Paragraph', data: Dict[str, str]) -> None:
     """
     Replace placeholders in a single paragraph while preserving formatting.
 
@@ -90,7 +91,7 @@ def replace_in_paragraph(paragraph: Paragraph, data: Dict[str, str]) -> None:
             paragraph.text = new_text
 
 
-def find_placeholders(doc: Document) -> set:
+def find_placeholders(doc: 'Document') -> set:
     """
     Find all {{variable}} placeholders in the document.
 
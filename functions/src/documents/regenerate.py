@@ -3,21 +3,20 @@ Document Regeneration Cloud Function
 """
 
 from firebase_functions import https_fn
-from firebase_admin import firestore, storage
-from docx import Document
-from datetime import datetime
-import tempfile
-import os
 
-from .placeholders import replace_placeholders
+from .rerender import rerender_generated_document, commit_rerendered_docs
+from ..utils.clients import get_db, get_bucket, count_round_trips
 
 
 @https_fn.on_call()
+@count_round_trips
 def regenerate_document(req: https_fn.CallableRequest) -> dict:
     """
     Regenerate an existing document.
 
-    Uses the original generation_data to recreate the document.
+    Uses the original generation_data to recreate the document. The new
+    entry is merged into the project's current generated_docs, so concurrent
+    changes to other documents are kept.
 
     Request data:
         project_id: str
@@ -42,8 +41,8 @@ def regenerate_document(req: https_fn.CallableRequest) -> dict:
             message='project_id and document_id are required'
         )
 
-    db = firestore.client()
-    bucket = storage.bucket()
+    db = get_db()
+    bucket = get_bucket()
 
     try:
         # Get project
@@ -86,93 +85,42 @@ def regenerate_document(req: https_fn.CallableRequest) -> dict:
 
         template_data = template_doc.to_dict()
 
-        # Use original generation data
-        generation_data = original_doc.get('generation_data', {})
-
-        # Download template
-        template_path = template_data['file_path']
-        template_blob = bucket.blob(template_path)
-
-        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_template:
-            template_blob.download_to_filename(temp_template.name)
-            template_file = temp_template.name
-
-        try:
-            # Generate document
-            doc = Document(template_file)
-            replace_placeholders(doc, generation_data)
-
-            with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_output:
-                doc.save(temp_output.name)
-                output_file = temp_output.name
-
-            try:
-                # Delete old file
-                old_path = original_doc.get('file_path')
-                if old_path:
-                    old_blob = bucket.blob(old_path)
-                    try:
-                        old_blob.delete()
-                    except Exception as e:
-                        print(f"Warning: Could not delete old file: {e}")
-
-                # Upload new file
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                output_path = f"documents/{project_id}/{template_id}_{timestamp}.docx"
-                output_blob = bucket.blob(output_path)
-                output_blob.upload_from_filename(output_file)
-
-                file_url = f"gs://{bucket.name}/{output_path}"
-                file_size = os.path.getsize(output_file)
-
-                # Update document info
-                updated_doc = {
-                    **original_doc,
-                    'file_url': file_url,
-                    'file_path': output_path,
-                    'file_size': file_size,
-                    'regenerated_at': firestore.SERVER_TIMESTAMP,
-                    'regenerated_by': req.auth.uid
-                }
+        # Render from the original generation data
+        updated_doc = rerender_generated_document(
+            bucket, project_id, original_doc, template_data,
+            original_doc.get('generation_data', {}), req.auth.uid
+        )
 
-                # Update in project
-                # Remove old, add new
-                new_generated_docs = [
-                    doc if doc['id'] != document_id else updated_doc
-                    for doc in generated_docs
-                ]
-
-                project_ref.update({
-                    'generated_docs': new_generated_docs,
-                    'updated_at': firestore.SERVER_TIMESTAMP
-                })
-
-                # Log activity
-                db.collection('activities').add({
-                    'action': 'regenerate_document',
-                    'user_id': req.auth.uid,
-                    'user_name': req.auth.token.get('name', 'Unknown'),
-                    'resource_type': 'document',
-                    'resource_id': document_id,
-                    'resource_name': original_doc.get('template_name', ''),
-                    'details': {
-                        'project_id': project_id,
-                        'template_id': template_id
-                    },
-                    'timestamp': firestore.SERVER_TIMESTAMP
-                })
-
-                return {
-                    'success': True,
-                    'document': updated_doc,
-                    'download_url': file_url
+        # The entry is merged into the project's current generated_docs in
+        # a transaction, with the activity entry and cleanup of the old file
+        skipped = commit_rerendered_docs(
+            db, project_ref, {document_id: (original_doc, updated_doc)},
+            'regenerate_document',
+            activity={
+                'action': 'regenerate_document',
+                'user_id': req.auth.uid,
+                'user_name': req.auth.token.get('name', 'Unknown'),
+                'resource_type': 'document',
+                'resource_id': document_id,
+                'resource_name': original_doc.get('template_name', ''),
+                'details': {
+                    'project_id': project_id,
+                    'template_id': template_id
                 }
+            }
+        )
 
-            finally:
-                os.unlink(output_file)
+        if skipped:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.ABORTED,
+                message='Document changed during regeneration, please try again'
+            )
 
-        finally:
-            os.unlink(template_file)
+        return {
+            'success': True,
+            'document': updated_doc,
+            'download_url': updated_doc['file_url']
+        }
 
     except https_fn.HttpsError:
         raise
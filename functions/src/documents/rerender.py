@@ -0,0 +1,541 @@
+"""
+Dependency-Driven Re-render
+
+When a company or contact changes, documents generated from the old values
+are stale. Firestore triggers look up the affected documents through the
+document_index and queue re-render jobs; a worker re-renders only those
+documents with bounded concurrency and records progress on the job document.
+
+Rendering happens outside any transaction; the new entries are then merged
+into the project's current generated_docs inside one, so documents added or
+re-rendered concurrently (by another job or a template revision) are never
+overwritten with a stale copy of the array.
+
+Job documents live in `rerender_jobs/{job_id}`:
+
+    status: 'queued' | 'running' | 'completed' | 'failed'
+    reason: str
+    documents: list of {project_id, document_id}
+    total / completed / failed: progress counters
+    errors: list of {project_id, document_id, error}
+    done_projects: projects already finished by an earlier attempt
+    heartbeat_at: last progress write of the running worker
+
+Workers stop starting projects once their work budget is spent and put
+the job back in the queue; a worker killed by the function timeout leaves
+its job running without a heartbeat. A scheduled sweep re-queues such jobs
+and drains the queue within its own budget, skipping the projects that
+were already done and leaving the rest for its next run.
+"""
+
+from firebase_functions import firestore_fn, scheduler_fn
+from firebase_admin import firestore
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import time
+
+from .generate import render_to_storage, render_parsed_to_storage
+from .dependencies import (
+    COMPANY_FIELD_VARIABLES,
+    CONTACT_FIELD_VARIABLES,
+    changed_variables,
+    find_dependent_documents,
+)
+from ..projects.variables import company_variables, contact_variables
+from ..utils.clients import get_db, get_bucket
+from ..utils.side_effects import UnitOfWork
+
+
+JOBS_COLLECTION = 'rerender_jobs'
+
+# Maximum documents per job document (keeps job documents well under 1 MiB)
+JOB_CHUNK_SIZE = 500
+
+# Projects re-rendered in parallel by one worker
+MAX_CONCURRENT_RENDERS = 4
+
+FUNCTION_TIMEOUT_SEC = 540
+
+# Seconds of work after which no new project or job is started, leaving
+# time for the projects already running to finish
+WORK_BUDGET_SEC = 420
+
+# Running jobs without a heartbeat for this long are considered dead
+STALL_TIMEOUT = timedelta(seconds=FUNCTION_TIMEOUT_SEC + 60)
+
+# {document_id: (entry rendered from, re-rendered entry)}
+Rendered = Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]
+
+
+def queue_rerender_jobs(db, documents: List[Dict[str, str]], reason: str) -> List[str]:
+    """
+    Queue re-render jobs for a list of generated documents.
+
+    Args:
+        db: Firestore client
+        documents: List of {project_id, document_id}
+        reason: Human-readable reason, stored on the job
+
+    Returns:
+        List of created job IDs
+    """
+    job_ids = []
+
+    for start in range(0, len(documents), JOB_CHUNK_SIZE):
+        chunk = documents[start:start + JOB_CHUNK_SIZE]
+        job_ref = db.collection(JOBS_COLLECTION).document()
+        job_ref.set({
+            'status': 'queued',
+            'reason': reason,
+            'documents': chunk,
+            'total': len(chunk),
+            'completed': 0,
+            'failed': 0,
+            'errors': [],
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        job_ids.append(job_ref.id)
+
+    return job_ids
+
+
+def rerender_generated_document(
+    bucket,
+    project_id: str,
+    original_doc: Dict[str, Any],
+    template_data: Dict[str, Any],
+    variables: Dict[str, Any],
+    regenerated_by: str,
+    parsed_template=None
+) -> Dict[str, Any]:
+    """
+    Render a generated document again into a new Storage file.
+
+    The old file is left in place; commit_rerendered_docs() queues its
+    cleanup once the new entry has been committed.
+
+    Args:
+        bucket: Storage bucket
+        project_id: Project ID
+        original_doc: Entry from the project's generated_docs
+        template_data: Template data from Firestore
+        variables: Variables to render with
+        regenerated_by: User ID or system identifier
+        parsed_template: Already parsed template Document (optional);
+            downloaded from template_data['file_path'] when omitted
+
+    Returns:
+        Updated generated_docs entry
+    """
+    template_id = original_doc['template_id']
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_path = f"documents/{project_id}/{template_id}_{timestamp}_{original_doc['id']}.docx"
+
+    if parsed_template is not None:
+        file_size = render_parsed_to_storage(bucket, parsed_template, variables, output_path)
+    else:
+        file_size = render_to_storage(
+            bucket, template_data['file_path'], variables, output_path
+        )
+
+    return {
+        **original_doc,
+        'file_url': f"gs://{bucket.name}/{output_path}",
+        'file_path': output_path,
+        'file_size': file_size,
+        'generation_data': variables,
+        'regenerated_at': datetime.now(),
+        'regenerated_by': regenerated_by
+    }
+
+
+def merge_rerendered_docs(current_docs: List[Dict[str, Any]], rendered: Rendered) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Replace re-rendered entries in a project's current generated_docs.
+
+    An entry is only replaced if its file is still the one it was rendered
+    from; if a concurrent re-render committed first, or the document was
+    removed, the new render is dropped.
+
+    Args:
+        current_docs: generated_docs as currently stored
+        rendered: {document_id: (entry rendered from, re-rendered entry)}
+
+    Returns:
+        (merged generated_docs, IDs of the documents applied)
+    """
+    merged = []
+    applied = []
+
+    for doc in current_docs:
+        entry = rendered.get(doc['id'])
+        if entry is not None and doc.get('file_path') == entry[0].get('file_path'):
+            merged.append(entry[1])
+            applied.append(doc['id'])
+        else:
+            merged.append(doc)
+
+    return merged, applied
+
+
+def commit_rerendered_docs(db, project_ref, rendered: Rendered, reason: str,
+                           activity: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Merge re-rendered entries into a project inside a transaction.
+
+    The project is re-read in the transaction, so entries written by other
+    workers since the documents were rendered are kept. Cleanup of the
+    replaced files (and of new files that were not applied) commits with
+    the project update.
+
+    Args:
+        db: Firestore client
+        project_ref: Project document reference
+        rendered: {document_id: (entry rendered from, re-rendered entry)}
+        reason: Prefix for the cleanup task reasons
+        activity: UnitOfWork.log_activity() arguments, logged in the same
+            commit if any document was applied (optional)
+
+    Returns:
+        IDs of the documents that were not applied
+    """
+
+    @firestore.transactional
+    def merge(transaction):
+        snapshot = project_ref.get(transaction=transaction)
+        current_docs = (snapshot.to_dict() or {}).get('generated_docs', []) if snapshot.exists else []
+
+        merged, applied = merge_rerendered_docs(current_docs, rendered)
+        uow = UnitOfWork(db)
+
+        if applied:
+            uow.update(project_ref, {
+                'generated_docs': merged,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            if activity:
+                uow.log_activity(**activity)
+
+        kept_paths = {doc.get('file_path') for doc in merged}
+        for document_id, (original_doc, new_doc) in rendered.items():
+            # The replaced file if applied, otherwise the unused new one
+            path = original_doc.get('file_path') if document_id in applied else new_doc['file_path']
+            if path not in kept_paths:
+                uow.delete_blob(path, reason=f'{reason}:{project_ref.id}/{document_id}')
+
+        uow.commit(transaction)
+        return [document_id for document_id in rendered if document_id not in applied]
+
+    return merge(db.transaction())
+
+
+def _rerender_project(db, bucket, job_ref, project_id: str, document_ids: List[str],
+                      templates: Dict[str, Dict[str, Any]]) -> None:
+    """Re-render the listed documents of one project and record progress."""
+
+    errors = []
+    completed = 0
+
+    try:
+        project_ref = db.collection('projects').document(project_id)
+        project_doc = project_ref.get()
+
+        if not project_doc.exists:
+            raise Exception('Project not found')
+
+        project_data = project_doc.to_dict()
+        company_data = db.document(project_data['company_ref']).get().to_dict() or {}
+        contact_data = db.document(project_data['contact_ref']).get().to_dict() or {}
+
+        fresh_vars = {
+            **company_variables(company_data),
+            **contact_variables(contact_data),
+        }
+
+        generated_docs = project_data.get('generated_docs', [])
+        rendered = {}
+
+        for doc in generated_docs:
+            if doc['id'] not in document_ids:
+                continue
+
+            try:
+                template_data = templates.get(doc['template_id'])
+                if not template_data:
+                    raise Exception(f"Template {doc['template_id']} not found")
+
+                # Keep document numbers and extra data, refresh party data
+                variables = {**doc.get('generation_data', {}), **fresh_vars}
+                rendered[doc['id']] = (doc, rerender_generated_document(
+                    bucket, project_id, doc, template_data, variables, 'system:rerender'
+                ))
+
+            except Exception as e:
+                print(f"Error re-rendering {project_id}/{doc['id']}: {e}")
+                errors.append({
+                    'project_id': project_id,
+                    'document_id': doc['id'],
+                    'error': str(e)
+                })
+
+        missing = set(document_ids) - {doc['id'] for doc in generated_docs}
+        for document_id in sorted(missing):
+            errors.append({
+                'project_id': project_id,
+                'document_id': document_id,
+                'error': 'Document not found'
+            })
+
+        if rendered:
+            skipped = commit_rerendered_docs(db, project_ref, rendered, 'system:rerender')
+            completed = len(rendered) - len(skipped)
+            for document_id in skipped:
+                errors.append({
+                    'project_id': project_id,
+                    'document_id': document_id,
+                    'error': 'Document changed during re-render'
+                })
+
+    except Exception as e:
+        print(f"Error re-rendering project {project_id}: {e}")
+        completed = 0
+        errors = [{
+            'project_id': project_id,
+            'document_id': document_id,
+            'error': str(e)
+        } for document_id in document_ids]
+
+    progress = {
+        'completed': firestore.Increment(completed),
+        'failed': firestore.Increment(len(errors)),
+        'done_projects': firestore.ArrayUnion([project_id]),
+        'heartbeat_at': firestore.SERVER_TIMESTAMP,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    }
+    if errors:
+        progress['errors'] = firestore.ArrayUnion(errors)
+
+    job_ref.update(progress)
+
+
+def _claim_job(db, job_ref) -> bool:
+    """Atomically move a job from 'queued' to 'running'."""
+
+    @firestore.transactional
+    def claim(transaction):
+        snapshot = job_ref.get(transaction=transaction)
+        if not snapshot.exists or snapshot.get('status') != 'queued':
+            return False
+
+        transaction.update(job_ref, {
+            'status': 'running',
+            'attempt': firestore.Increment(1),
+            'started_at': firestore.SERVER_TIMESTAMP,
+            'heartbeat_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        return True
+
+    return claim(db.transaction())
+
+
+def run_rerender_job(db, bucket, job_ref, job_data: Dict[str, Any],
+                     deadline: Optional[float] = None) -> bool:
+    """
+    Process a claimed re-render job.
+
+    Projects finished by an earlier attempt are skipped. Once the deadline
+    passes no new project is started and the job is put back in the queue.
+
+    Args:
+        db: Firestore client
+        bucket: Storage bucket
+        job_ref: Job document reference
+        job_data: Job data from Firestore
+        deadline: time.monotonic() value after which no new project is started
+
+    Returns:
+        True if the job completed, False if it was re-queued
+    """
+    done_projects = set(job_data.get('done_projects', []))
+
+    # Group documents by project so each project is read and written once
+    by_project = {}
+    for entry in job_data.get('documents', []):
+        if entry['project_id'] not in done_projects:
+            by_project.setdefault(entry['project_id'], []).append(entry['document_id'])
+
+    # Read every template the job needs up front
+    template_ids = sorted({
+        doc['template_id']
+        for doc in job_data.get('documents', [])
+        if doc.get('template_id') and doc['project_id'] in by_project
+    })
+    templates = {}
+    if template_ids:
+        refs = [db.collection('templates').document(tid) for tid in template_ids]
+        templates = {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in db.get_all(refs)
+            if snapshot.exists
+        }
+
+    def rerender(project_id: str, document_ids: List[str]) -> bool:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        _rerender_project(db, bucket, job_ref, project_id, document_ids, templates)
+        return True
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RENDERS) as executor:
+        futures = [
+            executor.submit(rerender, project_id, document_ids)
+            for project_id, document_ids in by_project.items()
+        ]
+        finished = [future.result() for future in futures]
+
+    if not all(finished):
+        job_ref.update({
+            'status': 'queued',
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        return False
+
+    job_ref.update({
+        'status': 'completed',
+        'finished_at': firestore.SERVER_TIMESTAMP,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    return True
+
+
+def _run_claimed_job(db, job_ref, deadline: Optional[float] = None) -> None:
+    """Claim a queued job and run it, recording failure on the job."""
+
+    if not _claim_job(db, job_ref):
+        return
+
+    try:
+        run_rerender_job(db, get_bucket(), job_ref, job_ref.get().to_dict(), deadline)
+    except Exception as e:
+        print(f"Error processing re-render job {job_ref.id}: {e}")
+        job_ref.update({
+            'status': 'failed',
+            'error': str(e),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+
+def drain_rerender_jobs(db, deadline: float) -> int:
+    """
+    Run queued jobs, oldest first, until none is left or the deadline passes.
+
+    Returns:
+        Number of jobs started
+    """
+    query = (
+        db.collection(JOBS_COLLECTION)
+        .where('status', '==', 'queued')
+        .order_by('created_at')
+        .limit(1)
+    )
+
+    started = 0
+    while time.monotonic() < deadline:
+        snapshots = list(query.stream())
+        if not snapshots:
+            break
+        _run_claimed_job(db, snapshots[0].reference, deadline)
+        started += 1
+
+    return started
+
+
+def _queue_dependents(ref_field: str, ref_path: str, variables: set, reason: str) -> None:
+    """Queue re-render jobs for documents depending on a changed company/contact."""
+
+    if not variables:
+        return
+
+    db = get_db()
+    entries = find_dependent_documents(db, ref_field, ref_path, variables)
+
+    if not entries:
+        return
+
+    documents = [{
+        'project_id': entry['project_id'],
+        'document_id': entry['document_id'],
+        'template_id': entry['template_id']
+    } for entry in entries]
+
+    job_ids = queue_rerender_jobs(db, documents, reason)
+    print(f"Queued {len(documents)} re-renders for {ref_path} in {len(job_ids)} job(s)")
+
+
+@firestore_fn.on_document_created(document=f'{JOBS_COLLECTION}/{{jobId}}', timeout_sec=FUNCTION_TIMEOUT_SEC)
+def process_rerender_job(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    """
+    Worker: re-render the documents listed on a newly queued job.
+    """
+    if event.data is None or event.data.to_dict().get('status') != 'queued':
+        return
+
+    _run_claimed_job(get_db(), event.data.reference, time.monotonic() + WORK_BUDGET_SEC)
+
+
+@scheduler_fn.on_schedule(schedule='every 10 minutes', timeout_sec=FUNCTION_TIMEOUT_SEC)
+def resume_stalled_rerender_jobs(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Re-queue jobs whose worker hit the function timeout, then run queued
+    jobs within the work budget; the rest wait for the next run.
+    """
+    deadline = time.monotonic() + WORK_BUDGET_SEC
+    db = get_db()
+    stalled_before = datetime.now(timezone.utc) - STALL_TIMEOUT
+
+    query = (
+        db.collection(JOBS_COLLECTION)
+        .where('status', '==', 'running')
+        .where('heartbeat_at', '<', stalled_before)
+    )
+
+    for snapshot in query.stream():
+        print(f"Resuming stalled re-render job {snapshot.id}")
+        snapshot.reference.update({
+            'status': 'queued',
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    started = drain_rerender_jobs(db, deadline)
+    if started:
+        print(f"Ran {started} re-render job(s)")
+
+
+@firestore_fn.on_document_updated(document='companies/{companyId}')
+def on_company_updated(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Queue re-renders of documents that used changed company data.
+    """
+    before = event.data.before.to_dict() or {}
+    after = event.data.after.to_dict() or {}
+
+    variables = changed_variables(COMPANY_FIELD_VARIABLES, before, after)
+    company_path = f"companies/{event.params['companyId']}"
+
+    _queue_dependents('company_ref', company_path, variables, f'company_updated:{company_path}')
+
+
+@firestore_fn.on_document_updated(document='contacts/{contactId}')
+def on_contact_updated(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Queue re-renders of documents that used changed contact data.
+    """
+    before = event.data.before.to_dict() or {}
+    after = event.data.after.to_dict() or {}
+
+    variables = changed_variables(CONTACT_FIELD_VARIABLES, before, after)
+    contact_path = f"contacts/{event.params['contactId']}"
+
+    _queue_dependents('contact_ref', contact_path, variables, f'contact_updated:{contact_path}')
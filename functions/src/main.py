@@ -1,31 +1,72 @@
 """
 AutoDocGen Cloud Functions - Main Entry Point
 
-This module contains all Cloud Functions for the AutoDocGen platform.
+This module exposes all Cloud Functions for the AutoDocGen platform.
+
+Functions are loaded lazily: every deployed function runs in its own
+instance, and the runtime only looks up that one name, so each instance
+imports just the module that defines it. Heavy document libraries
+(python-docx, reportlab, PyPDF2) are imported inside the code paths that
+use them. Firebase Admin is initialized on first use by utils.clients.
+
+Measure import cost per function with:
+    python -m src.utils.cold_start
 """
 
-from firebase_functions import https_fn
-from firebase_admin import initialize_app, firestore, storage
-import os
+from .utils.cold_start import timed_import
 
-# Initialize Firebase Admin
-initialize_app()
 
-# Import Cloud Functions
-from .documents.generate import generate_documents
-from .documents.regenerate import regenerate_document
-from .templates.analyze import analyze_template
-from .projects.create import create_project
-from .projects.update_status import update_project_status
-from .template_functions import extract_template_variables, generate_document
+# Function name -> module that defines it
+FUNCTION_MODULES = {
+    'generate_documents': '.documents.generate',
+    'regenerate_document': '.documents.regenerate',
+    'process_rerender_job': '.documents.rerender',
+    'on_company_updated': '.documents.rerender',
+    'on_contact_updated': '.documents.rerender',
+    'resume_stalled_rerender_jobs': '.documents.rerender',
+    'process_generation_jobs': '.documents.jobs',
+    'resume_generation_jobs': '.documents.jobs',
+    'analyze_template': '.templates.analyze',
+    'start_template_revision': '.templates.revision',
+    'process_template_revision': '.templates.revision',
+    'on_template_updated': '.templates.revision',
+    'resume_stalled_template_revisions': '.templates.revision',
+    'get_template_usage_counts': '.templates.usage',
+    'compact_template_usage_counters': '.templates.usage',
+    'create_project': '.projects.create',
+    'update_project': '.projects.update',
+    'update_project_status': '.projects.update_status',
+    'bulk_update_project_status': '.projects.bulk_status',
+    'import_projects': '.projects.bulk_import',
+    'compact_project_stats': '.projects.aggregates',
+    'get_project_status_history': '.projects.status_history',
+    'sync_project_acl': '.projects.acl',
+    'refresh_project_variables': '.projects.snapshot',
+    'refresh_company_variables': '.projects.snapshot',
+    'refresh_contact_variables': '.projects.snapshot',
+    'extract_template_variables': '.template_functions',
+    'generate_document': '.template_functions',
+    'rollup_activities': '.utils.activity_log',
+    'process_cleanup_task': '.utils.side_effects',
+    'retry_cleanup_tasks': '.utils.side_effects',
+    'health_check': '.utils.health',
+}
 
 # Export functions
-__all__ = [
-    'generate_documents',
-    'regenerate_document',
-    'analyze_template',
-    'create_project',
-    'update_project_status',
-    'extract_template_variables',
-    'generate_document',
-]
+__all__ = list(FUNCTION_MODULES)
+
+
+def __getattr__(name: str):
+    """Import the module defining a Cloud Function on first access."""
+    module_name = FUNCTION_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = timed_import(name, module_name, __package__)
+    function = getattr(module, name)
+    globals()[name] = function
+    return function
+
+
+def __dir__():
+    return sorted(set(globals()) | set(FUNCTION_MODULES))
@@ -0,0 +1,234 @@
+"""
+Project Access Records
+
+Permission checks only need who created a project and who it is shared
+with, but the project document also carries generated documents, variable
+snapshots and extra data. A compact copy of the access fields is kept per
+project and cached in the warm instance:
+
+    project_acl/{project_id}
+        created_by: user ID
+        shared_with: {user_id: role}
+        project_updated_at: update time of the project version it mirrors
+
+sync_project_acl rewrites the record whenever a project's access fields
+change and drops the cached copy in its instance. Other instances keep a
+cached record for at most ACL_CACHE_TTL seconds; a denial is always
+rechecked against Firestore, so newly shared users are never turned away
+by a stale cache. Projects created before the records existed get one on
+first access.
+"""
+
+from firebase_functions import firestore_fn
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+from typing import Dict, Any, List, Optional, Tuple
+import threading
+import time
+
+from ..utils.clients import get_db
+
+
+ACL_COLLECTION = 'project_acl'
+
+# Project fields mirrored in the access record
+ACL_FIELDS = ['created_by', 'shared_with']
+
+# Roles (in shared_with) allowed to change a project
+EDITOR_ROLES = ['member', 'owner']
+
+# How long a warm instance trusts a cached access record (seconds)
+ACL_CACHE_TTL = 30
+
+# project_id -> (expires at, access record or None for missing projects)
+_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+_cache_lock = threading.Lock()
+
+
+def acl_record(project_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the access fields of a project."""
+    return {
+        'created_by': project_data.get('created_by'),
+        'shared_with': project_data.get('shared_with') or {}
+    }
+
+
+def can_edit(acl: Dict[str, Any], user_id: str) -> bool:
+    """Check whether a user may change a project (owner or member access)."""
+    if user_id == acl.get('created_by'):
+        return True
+
+    return (acl.get('shared_with') or {}).get(user_id) in EDITOR_ROLES
+
+
+def invalidate(project_id: str) -> None:
+    """Drop a project's cached access record in this instance."""
+    with _cache_lock:
+        _cache.pop(project_id, None)
+
+
+def _load_acl(db, project_id: str) -> Optional[Dict[str, Any]]:
+    """Read an access record, creating it from the project if missing."""
+    acl_doc = db.collection(ACL_COLLECTION).document(project_id).get()
+    if acl_doc.exists:
+        return acl_record(acl_doc.to_dict())
+
+    project_doc = db.collection('projects').document(project_id).get(field_paths=ACL_FIELDS)
+    if not project_doc.exists:
+        return None
+
+    acl = acl_record(project_doc.to_dict())
+    try:
+        db.collection(ACL_COLLECTION).document(project_id).create({
+            **acl,
+            'project_updated_at': project_doc.update_time
+        })
+    except AlreadyExists:
+        # sync_project_acl got there first
+        pass
+
+    return acl
+
+
+def stage_project_acl(uow, project_id: str, project_data: Dict[str, Any]) -> None:
+    """
+    Stage the access record of a new project on a unit of work.
+
+    The server timestamp resolves to the commit time, which is also the
+    project's update time, so the sync trigger for the same write is a no-op.
+    """
+    uow.set(uow.db.collection(ACL_COLLECTION).document(project_id), {
+        **acl_record(project_data),
+        'project_updated_at': firestore.SERVER_TIMESTAMP
+    })
+
+
+def get_project_acl(db, project_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Get a project's access record, from the instance cache when possible.
+
+    Args:
+        db: Firestore client
+        project_id: Project ID
+        fresh: Bypass the cache and re-read the record
+
+    Returns:
+        dict with created_by and shared_with, or None if the project
+        does not exist
+    """
+    now = time.monotonic()
+
+    if not fresh:
+        with _cache_lock:
+            cached = _cache.get(project_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    acl = _load_acl(db, project_id)
+
+    with _cache_lock:
+        _cache[project_id] = (now + ACL_CACHE_TTL, acl)
+
+    return acl
+
+
+def check_edit_access(db, project_id: str, user_id: str) -> Optional[bool]:
+    """
+    Check whether a user may change a project.
+
+    A cached grant is trusted; a denial is confirmed with a fresh read.
+
+    Returns:
+        True or False, or None if the project does not exist
+    """
+    acl = get_project_acl(db, project_id)
+    if acl is not None and can_edit(acl, user_id):
+        return True
+
+    acl = get_project_acl(db, project_id, fresh=True)
+    if acl is None:
+        return None
+
+    return can_edit(acl, user_id)
+
+
+def check_edit_access_many(db, project_ids: List[str], user_id: str) -> Dict[str, Optional[bool]]:
+    """
+    check_edit_access for many projects, reading uncached records in one call.
+
+    Returns:
+        dict of project ID -> True, False, or None if the project does not exist
+    """
+    now = time.monotonic()
+    acls: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    with _cache_lock:
+        for project_id in project_ids:
+            cached = _cache.get(project_id)
+            if cached and cached[0] > now and cached[1] is not None and can_edit(cached[1], user_id):
+                acls[project_id] = cached[1]
+
+    to_read = [project_id for project_id in project_ids if project_id not in acls]
+    if to_read:
+        refs = [db.collection(ACL_COLLECTION).document(project_id) for project_id in to_read]
+        found = {
+            snapshot.id: acl_record(snapshot.to_dict())
+            for snapshot in db.get_all(refs)
+            if snapshot.exists
+        }
+
+        for project_id in to_read:
+            acls[project_id] = found[project_id] if project_id in found else _load_acl(db, project_id)
+
+        with _cache_lock:
+            for project_id in to_read:
+                _cache[project_id] = (now + ACL_CACHE_TTL, acls[project_id])
+
+    return {
+        project_id: None if acls[project_id] is None else can_edit(acls[project_id], user_id)
+        for project_id in project_ids
+    }
+
+
+@firestore_fn.on_document_written(document='projects/{projectId}')
+def sync_project_acl(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Mirror a project's access fields into its access record.
+    """
+    project_id = event.params['projectId']
+    before = event.data.before
+    after = event.data.after
+
+    db = get_db()
+    acl_ref = db.collection(ACL_COLLECTION).document(project_id)
+    invalidate(project_id)
+
+    if after is None or not after.exists:
+        acl_ref.delete()
+        return
+
+    before_data = before.to_dict() if before is not None and before.exists else None
+    after_data = after.to_dict()
+
+    if before_data is not None and acl_record(before_data) == acl_record(after_data):
+        return
+
+    # Triggers may arrive out of order: never replace a record mirroring a
+    # newer version of the project
+    @firestore.transactional
+    def sync(transaction):
+        current = acl_ref.get(transaction=transaction)
+        synced_at = current.to_dict().get('project_updated_at') if current.exists else None
+
+        if synced_at is not None and synced_at >= after.update_time:
+            return
+
+        transaction.set(acl_ref, {
+            **acl_record(after_data),
+            'project_updated_at': after.update_time
+        })
+
+    try:
+        sync(db.transaction())
+    except Exception as e:
+        print(f"Error syncing access record of project {project_id}: {e}")
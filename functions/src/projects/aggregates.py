@@ -0,0 +1,405 @@
+"""
+Materialized Project Aggregates
+
+Dashboard counts and revenue totals are kept in `project_stats`, updated in
+the same atomic commit as the project writes that change them, so a
+dashboard reads a constant number of documents however many projects
+there are:
+
+    project_stats/all
+    project_stats/status_{status}
+    project_stats/month_{YYYY-MM}         (by project date)
+    project_stats/company_{company_id}
+        count: number of projects
+        revenue: sum of project prices
+        by_status: {status: {count, revenue}}   (all / month / company only)
+
+`all`, the status documents and the month documents take a write for
+nearly every project change, more than one document sustains, so their
+increments are spread over shards like the template usage counters:
+
+    project_stats/{stats_id}/stats_shards/{0..NUM_SHARDS-1}
+
+The value of a stats document is the document plus the sum of its shards
+(read_project_stats()); a daily job compacts the shards into the document
+in a transaction.
+
+create_project, update_project, update_project_status and the bulk paths
+maintain them. rebuild_project_stats() recomputes everything from the
+projects in one transaction (see scripts/rebuild_project_stats.py).
+"""
+
+from firebase_functions import scheduler_fn
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+import random
+
+from ..utils.clients import get_db
+
+
+STATS_COLLECTION = 'project_stats'
+SHARDS_SUBCOLLECTION = 'stats_shards'
+
+# Each shard sustains roughly one write per second
+NUM_SHARDS = 10
+
+# Stats documents written on (nearly) every project change
+SHARDED_PREFIXES = ('status_', 'month_')
+
+# Projects read per page when rebuilding
+SCAN_PAGE_SIZE = 500
+
+# Fields of a stats document that hold aggregated values
+STATS_FIELDS = ('status', 'count', 'revenue', 'by_status')
+
+# Fields of a project the aggregates depend on
+AGGREGATE_FIELDS = ['status', 'price', 'date', 'company_ref']
+
+
+def is_sharded(stats_id: str) -> bool:
+    """Check whether a stats document takes its increments through shards."""
+    return stats_id == 'all' or stats_id.startswith(SHARDED_PREFIXES)
+
+
+def stats_ref(db, stats_id: str, shard: int = None):
+    """
+    Return the document a stats increment is written to: a shard (a random
+    one by default) of sharded stats documents, the document itself
+    otherwise.
+    """
+    ref = db.collection(STATS_COLLECTION).document(stats_id)
+    if not is_sharded(stats_id):
+        return ref
+
+    if shard is None:
+        shard = random.randrange(NUM_SHARDS)
+
+    return ref.collection(SHARDS_SUBCOLLECTION).document(str(shard))
+
+
+def _stats_values(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the aggregated fields of a stored stats document or shard."""
+    return {field: value for field, value in data.items() if field in STATS_FIELDS}
+
+
+def _price(project: Dict[str, Any]) -> float:
+    try:
+        return float(project.get('price') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def aggregate_keys(project: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """
+    Return the stats documents a project counts towards.
+
+    Returns:
+        (status document ID, IDs of the documents broken down by status)
+    """
+    grouped = ['all']
+
+    date = project.get('date')
+    if isinstance(date, str) and len(date) >= 7:
+        grouped.append(f"month_{date[:7]}")
+
+    company_ref = project.get('company_ref')
+    if company_ref:
+        grouped.append(f"company_{company_ref.rstrip('/').split('/')[-1]}")
+
+    return f"status_{project.get('status', 'draft')}", grouped
+
+
+def project_deltas(project: Dict[str, Any], sign: int = 1) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute the stats increments for adding (sign=1) or removing (sign=-1)
+    a project.
+
+    Args:
+        project: Project data
+        sign: 1 to add the project, -1 to remove it
+
+    Returns:
+        dict of stats document ID -> nested increments
+    """
+    status = project.get('status', 'draft')
+    count = sign
+    revenue = sign * _price(project)
+
+    status_key, grouped = aggregate_keys(project)
+    deltas = {status_key: {'status': status, 'count': count, 'revenue': revenue}}
+
+    for key in grouped:
+        deltas[key] = {
+            'count': count,
+            'revenue': revenue,
+            'by_status': {status: {'count': count, 'revenue': revenue}}
+        }
+
+    return deltas
+
+
+def add_deltas(target: Dict[str, Dict[str, Any]], deltas: Dict[str, Dict[str, Any]]) -> None:
+    """Add a set of increments into target, in place."""
+
+    def add(into, source):
+        for field, value in source.items():
+            if isinstance(value, dict):
+                add(into.setdefault(field, {}), value)
+            elif isinstance(value, str):
+                into[field] = value
+            else:
+                into[field] = into.get(field, 0) + value
+
+    for key, delta in deltas.items():
+        add(target.setdefault(key, {}), delta)
+
+
+def merge_deltas(*all_deltas: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Add several sets of increments together."""
+    merged: Dict[str, Dict[str, Any]] = {}
+
+    for deltas in all_deltas:
+        add_deltas(merged, deltas)
+
+    return merged
+
+
+def _as_increments(delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn numeric deltas into Firestore increments, dropping no-ops."""
+    result = {}
+
+    for field, value in delta.items():
+        if isinstance(value, dict):
+            nested = _as_increments(value)
+            if nested:
+                result[field] = nested
+        elif isinstance(value, str):
+            result[field] = value
+        elif value:
+            result[field] = firestore.Increment(value)
+
+    return result
+
+
+def stats_writes(deltas: Dict[str, Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Turn increments into the merge writes of the stats documents.
+
+    Yields:
+        (stats document ID, data to set with merge=True); documents whose
+        increments are all zero are skipped
+    """
+    for key, delta in deltas.items():
+        increments = _as_increments(delta)
+        if not any(field != 'status' for field in increments):
+            continue
+
+        increments['updated_at'] = firestore.SERVER_TIMESTAMP
+        yield key, increments
+
+
+def stage_project_stats(uow, deltas: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Stage stats increments on a unit of work.
+
+    Args:
+        uow: UnitOfWork to stage the writes on
+        deltas: Increments from project_deltas() / merge_deltas()
+    """
+    for key, increments in stats_writes(deltas):
+        uow.set(stats_ref(uow.db, key), increments, merge=True)
+
+
+def status_change_deltas(project: Dict[str, Any], new_status: str) -> Dict[str, Dict[str, Any]]:
+    """Increments for moving a project from its current status to new_status."""
+    return merge_deltas(
+        project_deltas(project, sign=-1),
+        project_deltas({**project, 'status': new_status})
+    )
+
+
+def compute_project_stats(projects: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Compute every stats document from scratch."""
+    return merge_deltas(*(project_deltas(project) for project in projects))
+
+
+def read_project_stats(db, stats_id: str) -> Dict[str, Any]:
+    """
+    Read a stats document's value: the document plus its shards.
+
+    Args:
+        db: Firestore client
+        stats_id: Stats document ID (e.g. 'all', 'status_draft')
+
+    Returns:
+        dict with count, revenue and (where kept) by_status; empty if no
+        project counts towards it
+    """
+    refs = [db.collection(STATS_COLLECTION).document(stats_id)]
+    if is_sharded(stats_id):
+        refs.extend(stats_ref(db, stats_id, shard) for shard in range(NUM_SHARDS))
+
+    value: Dict[str, Any] = {}
+    for snapshot in db.get_all(refs):
+        if snapshot.exists:
+            add_deltas(value, {stats_id: _stats_values(snapshot.to_dict())})
+
+    return value.get(stats_id, {})
+
+
+def compact_stats_shards(db, stats_id: str) -> int:
+    """
+    Fold a sharded stats document's shards into the document.
+
+    Args:
+        db: Firestore client
+        stats_id: Stats document ID
+
+    Returns:
+        Number of shards compacted
+    """
+    stats_doc_ref = db.collection(STATS_COLLECTION).document(stats_id)
+    shard_refs = [stats_ref(db, stats_id, shard) for shard in range(NUM_SHARDS)]
+
+    @firestore.transactional
+    def compact(transaction):
+        shards = [
+            snapshot for snapshot in db.get_all(shard_refs, transaction=transaction)
+            if snapshot.exists
+        ]
+
+        pending: Dict[str, Dict[str, Any]] = {}
+        for snapshot in shards:
+            add_deltas(pending, {stats_id: _stats_values(snapshot.to_dict())})
+
+        for _, increments in stats_writes(pending):
+            transaction.set(stats_doc_ref, increments, merge=True)
+        for snapshot in shards:
+            transaction.delete(snapshot.reference)
+
+        return len(shards)
+
+    return compact(db.transaction())
+
+
+def scan_projects(db, page_size: int = SCAN_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the aggregated fields of every project, one page at a time."""
+    cursor = None
+
+    while True:
+        query = (
+            db.collection('projects')
+            .select(AGGREGATE_FIELDS)
+            .order_by(FieldPath.document_id())
+            .limit(page_size)
+        )
+        if cursor:
+            query = query.start_after({FieldPath.document_id(): cursor})
+
+        page = list(query.stream())
+        for snapshot in page:
+            yield snapshot.to_dict()
+
+        if len(page) < page_size:
+            return
+        cursor = page[-1].id
+
+
+def reset_stats(db, stats_id: str, data: Dict[str, Any]) -> None:
+    """
+    Replace a stats document's value: write data to the document and
+    delete its shards, in one transaction that touches only this key.
+    """
+    stats_doc_ref = db.collection(STATS_COLLECTION).document(stats_id)
+    shard_refs = (
+        [stats_ref(db, stats_id, shard) for shard in range(NUM_SHARDS)]
+        if is_sharded(stats_id) else []
+    )
+
+    @firestore.transactional
+    def reset(transaction):
+        shards = [
+            snapshot for snapshot in db.get_all(shard_refs, transaction=transaction)
+            if snapshot.exists
+        ] if shard_refs else []
+
+        transaction.set(stats_doc_ref, {**data, 'updated_at': firestore.SERVER_TIMESTAMP})
+        for snapshot in shards:
+            transaction.delete(snapshot.reference)
+
+    reset(db.transaction())
+
+
+def rebuild_project_stats(db) -> Dict[str, int]:
+    """
+    Recompute project_stats from all projects and replace the stored
+    documents and shards, deleting stats no project contributes to any more.
+
+    The projects are read with a paginated scan outside any transaction,
+    so project writes are never blocked. Each stats key is then replaced
+    in its own small transaction (like compact_stats_shards), and stale
+    keys are deleted with a BulkWriter. Project writes made while the scan
+    runs may still be off by their increments; run the rebuild when the
+    dashboard is quiet, or again if a write raced it.
+
+    Args:
+        db: Firestore client
+
+    Returns:
+        dict with projects, written and deleted counts
+    """
+    stats: Dict[str, Dict[str, Any]] = {}
+    project_count = 0
+    for project in scan_projects(db):
+        add_deltas(stats, project_deltas(project))
+        project_count += 1
+
+    for stats_id, data in stats.items():
+        reset_stats(db, stats_id, data)
+
+    stats_collection = db.collection(STATS_COLLECTION)
+    stale = [
+        snapshot.reference
+        for snapshot in stats_collection.select([FieldPath.document_id()]).stream()
+        if snapshot.id not in stats
+    ]
+    # Shards of stale keys, including shards whose document was never written
+    stale_shards = [
+        snapshot.reference
+        for snapshot in db.collection_group(SHARDS_SUBCOLLECTION).select([FieldPath.document_id()]).stream()
+        if snapshot.reference.parent.parent.id not in stats
+    ]
+
+    if stale or stale_shards:
+        writer = db.bulk_writer()
+        for ref in [*stale_shards, *stale]:
+            writer.delete(ref)
+        writer.close()
+
+    return {
+        'projects': project_count,
+        'written': len(stats),
+        'deleted': len(stale)
+    }
+
+
+@scheduler_fn.on_schedule(schedule='every day 03:30', timezone='Asia/Taipei')
+def compact_project_stats(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Compact the shards of every sharded stats document.
+    """
+    db = get_db()
+    stats_ids = {
+        snapshot.reference.parent.parent.id
+        for snapshot in db.collection_group(SHARDS_SUBCOLLECTION).select([FieldPath.document_id()]).stream()
+    }
+
+    compacted = 0
+    for stats_id in sorted(stats_ids):
+        try:
+            compacted += compact_stats_shards(db, stats_id)
+        except Exception as e:
+            print(f"Error compacting project stats {stats_id}: {e}")
+
+    print(f"Compacted {compacted} project stats shard(s)")
@@ -0,0 +1,512 @@
+"""
+Bulk Project Import
+
+Imports projects from files in the legacy `input/*/projects.json` format
+(project_name, company_name, contacts, date, contact_date, price), as a
+JSON array, JSON Lines or CSV. Rows are parsed one at a time
+(see utils/row_streams.py), company and contact names are resolved through
+an in-memory index loaded once per import, and projects are written with a
+Firestore BulkWriter, which batches and rate-limits the writes and retries
+failures.
+
+Each imported project gets the same document, access record and first
+status history entry as create_project. The dashboard aggregates are added
+once at the end for all imported projects, and one activity entry records
+the import. Rows that fail validation, name resolution or writing (of the
+project, its access record or history entry, or a company or contact it
+created) are reported with their row number; the other rows are imported.
+
+The callable reads an uploaded file from Storage (`imports/{uid}/...`);
+scripts/import_projects.py runs the same import on a local file.
+"""
+
+from firebase_functions import https_fn
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import math
+import threading
+import unicodedata
+
+from ..utils.clients import get_db, get_bucket, count_round_trips
+from ..utils.row_streams import FORMATS, Row, detect_format, iter_rows
+from ..utils.side_effects import SideEffects
+from .acl import acl_record, ACL_COLLECTION
+from .aggregates import add_deltas, project_deltas, stats_ref, stats_writes
+from .status_history import history_collection
+
+
+# Storage folder the callable imports from (one folder per user)
+IMPORTS_PREFIX = 'imports'
+
+# Row errors included in a report (the total is always counted)
+MAX_REPORTED_ERRORS = 200
+
+# Attempts per write before a row is reported as failed
+MAX_WRITE_ATTEMPTS = 5
+
+# Rows between progress callbacks
+PROGRESS_INTERVAL = 500
+
+# Row fields with a meaning of their own; any others go into extra_data
+KNOWN_FIELDS = {
+    'project_name', 'company_name', 'contacts', 'contact_name',
+    'date', 'contact_date', 'price'
+}
+
+
+def normalize_name(name: Any) -> str:
+    """
+    Normalize a company or contact name for matching: full-width forms
+    folded (NFKC), whitespace collapsed, case ignored.
+    """
+    if not isinstance(name, str):
+        return ''
+
+    return ' '.join(unicodedata.normalize('NFKC', name).split()).casefold()
+
+
+class NameIndex:
+    """Company and contact names -> Firestore paths, loaded once per import."""
+
+    def __init__(self):
+        self.companies: Dict[str, str] = {}
+        # (company path, contact name) -> contact path
+        self.contacts: Dict[Tuple[str, str], str] = {}
+        # contact name -> contact path, or None if the name is ambiguous
+        self.contacts_by_name: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def load(cls, db) -> 'NameIndex':
+        """Build the index from the companies and contacts collections."""
+        index = cls()
+
+        for snapshot in db.collection('companies').select(['company_name']).stream():
+            index.add_company(snapshot.to_dict().get('company_name'), snapshot.reference.path)
+
+        contacts = db.collection('contacts').select(['contact_name', 'company_ref']).stream()
+        for snapshot in contacts:
+            data = snapshot.to_dict()
+            index.add_contact(data.get('contact_name'), data.get('company_ref'), snapshot.reference.path)
+
+        return index
+
+    def add_company(self, name: Any, path: str) -> None:
+        key = normalize_name(name)
+        if key:
+            self.companies.setdefault(key, path)
+
+    def add_contact(self, name: Any, company_path: Optional[str], path: str) -> None:
+        key = normalize_name(name)
+        if not key:
+            return
+
+        if company_path:
+            self.contacts.setdefault((company_path, key), path)
+
+        if key in self.contacts_by_name and self.contacts_by_name[key] != path:
+            self.contacts_by_name[key] = None
+        else:
+            self.contacts_by_name[key] = path
+
+    def company(self, name: Any) -> Optional[str]:
+        return self.companies.get(normalize_name(name))
+
+    def contact(self, name: Any, company_path: str) -> Optional[str]:
+        """Find a contact of a company, or a contact whose name is unique."""
+        key = normalize_name(name)
+        return self.contacts.get((company_path, key)) or self.contacts_by_name.get(key)
+
+
+def parse_project_row(row: Row, require_contact: bool = True) -> Dict[str, Any]:
+    """
+    Validate an import row.
+
+    Args:
+        row: Row from utils.row_streams.iter_rows()
+        require_contact: Reject rows without contacts (otherwise
+            contact_name is '')
+
+    Returns:
+        dict with project_name, company_name, contact_name, date, price and
+        extra_data
+
+    Raises:
+        ValueError: If the row is invalid
+    """
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+
+    project_name = str(row.get('project_name') or '').strip()
+    company_name = str(row.get('company_name') or '').strip()
+    contact_name = str(row.get('contacts') or row.get('contact_name') or '').strip()
+
+    required = [('project_name', project_name), ('company_name', company_name)]
+    if require_contact:
+        required.append(('contacts', contact_name))
+
+    for field, value in required:
+        if not value:
+            raise ValueError(f'{field} is required')
+
+    date = str(row.get('date') or '').strip()
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'date must be YYYY-MM-DD, got {date!r}')
+
+    try:
+        price = float(str(row.get('price', '')).replace(',', ''))
+        if not math.isfinite(price) or price <= 0:
+            raise ValueError()
+    except ValueError:
+        raise ValueError(f"price must be a positive number, got {row.get('price')!r}")
+
+    extra_data = {key: value for key, value in row.items() if key not in KNOWN_FIELDS}
+    if row.get('contact_date'):
+        extra_data['contact_date'] = str(row['contact_date']).strip()
+
+    return {
+        'project_name': project_name,
+        'company_name': company_name,
+        'contact_name': contact_name,
+        'date': date,
+        'price': price,
+        'extra_data': extra_data
+    }
+
+
+class ProjectImport:
+    """One import run: resolves rows and queues their writes."""
+
+    def __init__(self, db, user_id: str, create_missing: bool = False, dry_run: bool = False):
+        self.db = db
+        self.user_id = user_id
+        self.create_missing = create_missing
+        self.dry_run = dry_run
+
+        self.index = NameIndex.load(db)
+        self.writer = None if dry_run else db.bulk_writer()
+
+        self.rows = 0
+        self.imported = 0
+        self.created_companies = 0
+        self.created_contacts = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+        # Document path -> row number (None: not tied to a row) for every
+        # queued write until it succeeds
+        self._pending: Dict[str, Optional[int]] = {}
+        # Project path -> project data until its write succeeds
+        self._projects: Dict[str, Dict[str, Any]] = {}
+        self._failed_rows = set()
+        self._lock = threading.Lock()
+
+        if self.writer is not None:
+            self.writer.on_write_result(self._on_write_result)
+            self.writer.on_write_error(self._on_write_error)
+
+    def add_error(self, row_number: Optional[int], message: str) -> None:
+        with self._lock:
+            self.error_count += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({'row': row_number, 'error': message})
+
+    def _on_write_result(self, reference, result, writer) -> None:
+        with self._lock:
+            self._pending.pop(reference.path, None)
+            self._projects.pop(reference.path, None)
+
+    def _on_write_error(self, failure, writer) -> bool:
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+
+        path = failure.operation.reference.path
+        with self._lock:
+            row_number = self._pending.pop(path, None)
+            project_data = self._projects.pop(path, None)
+
+            # The project itself was not written: it is not imported
+            if project_data is not None:
+                self.imported -= 1
+                add_deltas(self.stats, project_deltas(project_data, sign=-1))
+
+            # One error per row, however many of its writes failed
+            first_failure = row_number is None or row_number not in self._failed_rows
+            if row_number is not None:
+                self._failed_rows.add(row_number)
+
+        if first_failure:
+            self.add_error(row_number, f'Write failed for {path}: {failure.message}')
+
+        return False
+
+    def _write(
+        self,
+        ref,
+        data: Dict[str, Any],
+        merge: bool = False,
+        row_number: Optional[int] = None
+    ) -> None:
+        """
+        Queue a write, tracked until it succeeds so a failure is reported
+        against the row it belongs to (row None: not tied to a row, e.g.
+        the aggregates).
+        """
+        if self.writer is not None:
+            with self._lock:
+                self._pending[ref.path] = row_number
+            self.writer.set(ref, data, merge=merge)
+
+    def _resolve_company(self, name: str, row_number: int) -> str:
+        path = self.index.company(name)
+        if path:
+            return path
+        if not self.create_missing:
+            raise ValueError(f'Unknown company: {name}')
+
+        ref = self.db.collection('companies').document()
+        self._write(ref, {
+            'company_name': name,
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, row_number=row_number)
+        self.index.add_company(name, ref.path)
+        self.created_companies += 1
+        return ref.path
+
+    def _resolve_contact(self, name: str, company_path: str, row_number: int) -> str:
+        path = self.index.contact(name, company_path)
+        if path:
+            return path
+        if not self.create_missing:
+            raise ValueError(f'Unknown contact: {name}')
+
+        ref = self.db.collection('contacts').document()
+        self._write(ref, {
+            'contact_name': name,
+            'company_ref': company_path,
+            'email': '',
+            'phone': '',
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, row_number=row_number)
+        self.index.add_contact(name, company_path, ref.path)
+        self.created_contacts += 1
+        return ref.path
+
+    def add_row(self, row_number: int, row: Row) -> None:
+        """Validate and resolve one row and queue its writes."""
+        self.rows += 1
+
+        try:
+            parsed = parse_project_row(row)
+            company_path = self._resolve_company(parsed['company_name'], row_number)
+            contact_path = self._resolve_contact(parsed['contact_name'], company_path, row_number)
+        except ValueError as e:
+            self.add_error(row_number, str(e))
+            return
+
+        project_data = {
+            'project_name': parsed['project_name'],
+            'company_ref': company_path,
+            'contact_ref': contact_path,
+            'price': parsed['price'],
+            'date': parsed['date'],
+            'status': 'draft',
+            'status_changed_at': firestore.SERVER_TIMESTAMP,
+            'generated_docs': [],
+            'extra_data': parsed['extra_data'],
+            'created_by': self.user_id,
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP,
+            'shared_with': {}
+        }
+
+        # Dry run: the row is valid, nothing is written
+        if self.writer is None:
+            self.imported += 1
+            return
+
+        project_ref = self.db.collection('projects').document()
+
+        with self._lock:
+            self.imported += 1
+            add_deltas(self.stats, project_deltas(project_data))
+            self._projects[project_ref.path] = project_data
+
+        self._write(project_ref, project_data, row_number=row_number)
+        self._write(self.db.collection(ACL_COLLECTION).document(project_ref.id), {
+            **acl_record(project_data),
+            'project_updated_at': firestore.SERVER_TIMESTAMP
+        }, row_number=row_number)
+        self._write(history_collection(self.db, project_ref.id).document(), {
+            'status': 'draft',
+            'previous_status': None,
+            'updated_by': self.user_id,
+            'timestamp': firestore.SERVER_TIMESTAMP
+        }, row_number=row_number)
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Wait for the project writes, then add the aggregates of the
+        projects that were written.
+
+        Returns:
+            Import report
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
+            for key, increments in stats_writes(self.stats):
+                self._write(stats_ref(self.db, key), increments, merge=True)
+
+            self.writer.close()
+
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': self.error_count,
+            'created_companies': self.created_companies,
+            'created_contacts': self.created_contacts,
+            'dry_run': self.dry_run,
+            'errors': self.errors
+        }
+
+
+def run_project_import(
+    db,
+    rows: Iterable[Tuple[int, Row]],
+    user_id: str,
+    create_missing: bool = False,
+    dry_run: bool = False,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Import projects from (row_number, row) pairs.
+
+    Args:
+        db: Firestore client
+        rows: Rows from utils.row_streams.iter_rows()
+        user_id: User recorded as the projects' creator
+        create_missing: Create companies and contacts that are not found
+            instead of rejecting the row
+        dry_run: Validate and resolve only, write nothing
+        progress: Called with {'rows', 'imported', 'failed'} every
+            PROGRESS_INTERVAL rows
+
+    Returns:
+        dict with rows, imported, failed, created_companies,
+        created_contacts, dry_run, errors: [{row, error}] (row None for a
+        failed aggregate write) and aborted (the parse error that stopped
+        the import early, if any)
+    """
+    run = ProjectImport(db, user_id, create_missing=create_missing, dry_run=dry_run)
+    aborted = None
+
+    try:
+        for row_number, row in rows:
+            run.add_row(row_number, row)
+
+            if progress and run.rows % PROGRESS_INTERVAL == 0:
+                progress({'rows': run.rows, 'imported': run.imported, 'failed': run.error_count})
+    except ValueError as e:
+        # The rest of the file cannot be parsed; keep what was read so far
+        aborted = str(e)
+    finally:
+        report = run.finish()
+
+    report['aborted'] = aborted
+    return report
+
+
+@https_fn.on_call(timeout_sec=540)
+@count_round_trips
+def import_projects(req: https_fn.CallableRequest) -> dict:
+    """
+    Import projects from a file uploaded to Storage.
+
+    Request data:
+        storage_path: str (under imports/{uid}/)
+        format: str (optional, 'json', 'jsonl' or 'csv'; default from the
+            file extension)
+        create_missing: bool (optional, create unknown companies/contacts)
+        dry_run: bool (optional, validate only)
+
+    Returns:
+        dict with success and the import report
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    storage_path = req.data.get('storage_path') or ''
+    fmt = req.data.get('format') or detect_format(storage_path)
+
+    if not storage_path.startswith(f'{IMPORTS_PREFIX}/{req.auth.uid}/'):
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=f'storage_path must be under {IMPORTS_PREFIX}/{req.auth.uid}/'
+        )
+
+    if fmt not in FORMATS:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=f'Invalid format. Must be one of: {", ".join(FORMATS)}'
+        )
+
+    db = get_db()
+    blob = get_bucket().blob(storage_path)
+
+    try:
+        with blob.open('r', encoding='utf-8-sig') as stream:
+            report = run_project_import(
+                db,
+                iter_rows(stream, fmt),
+                req.auth.uid,
+                create_missing=bool(req.data.get('create_missing')),
+                dry_run=bool(req.data.get('dry_run'))
+            )
+
+        if not report['dry_run']:
+            effects = SideEffects(db)
+            effects.log_activity(
+                action='import_projects',
+                user_id=req.auth.uid,
+                user_name=req.auth.token.get('name', 'Unknown'),
+                resource_type='import',
+                resource_id=storage_path,
+                resource_name=storage_path.rsplit('/', 1)[-1],
+                details={
+                    'rows': report['rows'],
+                    'imported': report['imported'],
+                    'failed': report['failed'],
+                    'aborted': report['aborted']
+                }
+            )
+            effects.flush()
+
+        return {
+            'success': True,
+            **report
+        }
+
+    except NotFound:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.NOT_FOUND,
+            message='Import file not found'
+        )
+    except Exception as e:
+        print(f"Error importing projects: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f'Internal error: {str(e)}'
+        )
@@ -0,0 +1,210 @@
+"""
+Bulk Project Status Cloud Function
+
+Moves many projects to a new status in one call (e.g. every
+`pending_invoice` project to `pending_payment` at month end). Permissions
+are checked from the access records in one read, and projects are updated
+in chunks: each chunk is one transaction that reads the chunk's projects
+and commits their updates, history entries and activity entries with a
+single merged set of aggregate increments.
+
+Every project gets its own outcome:
+    updated: status changed
+    unchanged: project already had the status (nothing written)
+    status_mismatch: project was not in from_status
+    not_found / permission_denied
+    failed: its chunk could not be committed (see error)
+"""
+
+from firebase_functions import https_fn
+from firebase_admin import firestore
+from typing import Dict, Any, List, Optional
+
+from ..utils.clients import get_db, count_round_trips
+from ..utils.side_effects import UnitOfWork
+from .acl import check_edit_access_many
+from .aggregates import merge_deltas, stage_project_stats
+from .update_status import VALID_STATUSES, STATUS_UPDATE_FIELDS, stage_status_update
+
+
+# Project IDs accepted by one call
+MAX_BULK_PROJECTS = 500
+
+# Projects per transaction; each takes three writes plus aggregate
+# increments, which keeps a chunk well under the 500-write limit
+BULK_CHUNK_SIZE = 50
+
+
+def classify_status_update(
+    project_data: Optional[Dict[str, Any]],
+    new_status: str,
+    from_status: Optional[str] = None
+) -> str:
+    """
+    Decide what a bulk update does to one project.
+
+    Args:
+        project_data: Project fields, or None if the project does not exist
+        new_status: Status to move to
+        from_status: Only move projects currently in this status (optional)
+
+    Returns:
+        'updated', 'unchanged', 'status_mismatch' or 'not_found'
+    """
+    if project_data is None:
+        return 'not_found'
+
+    status = project_data.get('status')
+    if from_status and status != from_status:
+        return 'status_mismatch'
+    if status == new_status:
+        return 'unchanged'
+
+    return 'updated'
+
+
+def apply_status_chunk(
+    db,
+    project_ids: List[str],
+    new_status: str,
+    from_status: Optional[str],
+    user_id: str,
+    user_name: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Update one chunk of projects in a transaction.
+
+    Returns:
+        dict of project ID -> outcome entry
+    """
+    refs = [db.collection('projects').document(project_id) for project_id in project_ids]
+
+    @firestore.transactional
+    def apply(transaction):
+        snapshots = db.get_all(refs, field_paths=STATUS_UPDATE_FIELDS, transaction=transaction)
+        projects = {
+            snapshot.id: snapshot.to_dict() if snapshot.exists else None
+            for snapshot in snapshots
+        }
+
+        uow = UnitOfWork(db)
+        stats: List[Dict[str, Any]] = []
+        results = {}
+
+        for ref in refs:
+            project_data = projects.get(ref.id)
+            outcome = classify_status_update(project_data, new_status, from_status)
+            results[ref.id] = {'outcome': outcome}
+
+            if project_data is not None:
+                results[ref.id]['old_status'] = project_data.get('status')
+
+            if outcome == 'updated':
+                stage_status_update(
+                    uow, ref, project_data, new_status, user_id, user_name, stats=stats
+                )
+
+        stage_project_stats(uow, merge_deltas(*stats))
+        uow.commit(transaction)
+        return results
+
+    return apply(db.transaction())
+
+
+@https_fn.on_call()
+@count_round_trips
+def bulk_update_project_status(req: https_fn.CallableRequest) -> dict:
+    """
+    Update the status of many projects.
+
+    Request data:
+        project_ids: list[str]
+        status: str (one of VALID_STATUSES)
+        from_status: str (optional, only move projects in this status)
+
+    Returns:
+        dict with success, results: [{project_id, outcome, old_status?, error?}]
+        and counts per outcome
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    project_ids = req.data.get('project_ids') or []
+    new_status = req.data.get('status')
+    from_status = req.data.get('from_status')
+
+    valid_ids = isinstance(project_ids, list) and all(
+        isinstance(project_id, str) and project_id for project_id in project_ids
+    )
+
+    if not valid_ids or not project_ids or not new_status:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message='project_ids and status are required'
+        )
+
+    if len(project_ids) > MAX_BULK_PROJECTS:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=f'At most {MAX_BULK_PROJECTS} projects can be updated at once'
+        )
+
+    for status in (new_status, from_status):
+        if status is not None and status not in VALID_STATUSES:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+                message=f'Invalid status. Must be one of: {", ".join(VALID_STATUSES)}'
+            )
+
+    project_ids = list(dict.fromkeys(project_ids))
+    user_name = req.auth.token.get('name', 'Unknown')
+    db = get_db()
+
+    try:
+        access = check_edit_access_many(db, project_ids, req.auth.uid)
+    except Exception as e:
+        print(f"Error checking bulk status permissions: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f'Internal error: {str(e)}'
+        )
+
+    results: Dict[str, Dict[str, Any]] = {}
+    allowed = []
+
+    for project_id in project_ids:
+        if access[project_id] is None:
+            results[project_id] = {'outcome': 'not_found'}
+        elif not access[project_id]:
+            results[project_id] = {'outcome': 'permission_denied'}
+        else:
+            allowed.append(project_id)
+
+    for start in range(0, len(allowed), BULK_CHUNK_SIZE):
+        chunk = allowed[start:start + BULK_CHUNK_SIZE]
+
+        try:
+            results.update(apply_status_chunk(
+                db, chunk, new_status, from_status, req.auth.uid, user_name
+            ))
+        except Exception as e:
+            print(f"Error updating status of {len(chunk)} projects: {e}")
+            for project_id in chunk:
+                results[project_id] = {'outcome': 'failed', 'error': str(e)}
+
+    counts: Dict[str, int] = {}
+    for result in results.values():
+        counts[result['outcome']] = counts.get(result['outcome'], 0) + 1
+
+    return {
+        'success': True,
+        'results': [
+            {'project_id': project_id, **results[project_id]}
+            for project_id in project_ids
+        ],
+        'counts': counts
+    }
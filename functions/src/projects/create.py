@@ -4,9 +4,15 @@ Create Project Cloud Function
 
 from firebase_functions import https_fn
 from firebase_admin import firestore
+from ..utils.clients import get_db, count_round_trips
+from .aggregates import project_deltas, stage_project_stats
+from .status_history import stage_status_change
+from .acl import stage_project_acl
+from ..utils.side_effects import UnitOfWork
 
 
 @https_fn.on_call()
+@count_round_trips
 def create_project(req: https_fn.CallableRequest) -> dict:
     """
     Create a new project.
@@ -51,7 +57,7 @@ def create_project(req: https_fn.CallableRequest) -> dict:
             message='price must be a positive number'
         )
 
-    db = firestore.client()
+    db = get_db()
 
     try:
         # Create project document
@@ -64,11 +70,7 @@ def create_project(req: https_fn.CallableRequest) -> dict:
             'price': price,
             'date': data['date'],
             'status': 'draft',
-            'status_history': [{
-                'status': 'draft',
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                'updated_by': req.auth.uid
-            }],
+            'status_changed_at': firestore.SERVER_TIMESTAMP,
             'generated_docs': [],
             'extra_data': data.get('extra_data', {}),
             'created_by': req.auth.uid,
@@ -77,18 +79,22 @@ def create_project(req: https_fn.CallableRequest) -> dict:
             'shared_with': {}
         }
 
-        project_ref.set(project_data)
-
-        # Log activity
-        db.collection('activities').add({
-            'action': 'create_project',
-            'user_id': req.auth.uid,
-            'user_name': req.auth.token.get('name', 'Unknown'),
-            'resource_type': 'project',
-            'resource_id': project_ref.id,
-            'resource_name': data['project_name'],
-            'timestamp': firestore.SERVER_TIMESTAMP
-        })
+        # Project, access record, first history entry, dashboard aggregates
+        # and activity entry are written together
+        uow = UnitOfWork(db)
+        uow.set(project_ref, project_data)
+        stage_project_acl(uow, project_ref.id, project_data)
+        stage_status_change(uow, project_ref.id, 'draft', req.auth.uid)
+        stage_project_stats(uow, project_deltas(project_data))
+        uow.log_activity(
+            action='create_project',
+            user_id=req.auth.uid,
+            user_name=req.auth.token.get('name', 'Unknown'),
+            resource_type='project',
+            resource_id=project_ref.id,
+            resource_name=data['project_name']
+        )
+        uow.commit()
 
         return {
             'success': True,
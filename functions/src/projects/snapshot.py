@@ -0,0 +1,286 @@
+"""
+Standard Variable Snapshot
+
+Persists the computed standard variables on the project document so that a
+generation needs a single project read instead of project, company and
+contact reads plus a counter query.
+
+Project fields:
+    document_number: HIYES number, assigned once per project
+    standard_variables: ready-to-render standard variables (without the
+        created_at / updated_at timestamps, which are filled in at render time)
+
+Firestore triggers keep the snapshot fresh when the project, its company or
+its contact changes.
+"""
+
+from firebase_functions import firestore_fn
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from datetime import datetime
+from typing import Dict, Any
+
+from .variables import (
+    STANDARD_VARIABLES,
+    prepare_standard_variables,
+    company_variables,
+    contact_variables,
+)
+from ..utils.document_number import generate_document_number
+from ..utils.clients import get_db
+
+
+SNAPSHOT_FIELD = 'standard_variables'
+COUNTERS_COLLECTION = 'counters'
+
+# Variables filled in at render time rather than stored
+TIMESTAMP_VARIABLES = {'created_at', 'updated_at'}
+
+# Project fields the snapshot is computed from
+PROJECT_INPUT_FIELDS = ['project_name', 'price', 'date', 'company_ref', 'contact_ref']
+
+# Firestore batch write limit
+BATCH_SIZE = 500
+
+
+def is_snapshot_current(project_data: Dict[str, Any]) -> bool:
+    """
+    Check whether a project carries a complete standard variable snapshot.
+
+    Args:
+        project_data: Project data from Firestore
+
+    Returns:
+        True if the snapshot can be rendered as is
+    """
+    snapshot = project_data.get(SNAPSHOT_FIELD)
+    if not isinstance(snapshot, dict) or not project_data.get('document_number'):
+        return False
+
+    return (STANDARD_VARIABLES - TIMESTAMP_VARIABLES) <= snapshot.keys()
+
+
+def snapshot_inputs_changed(before: Dict[str, Any], after: Dict[str, Any]) -> bool:
+    """
+    Check whether a project update touched any field the snapshot uses.
+
+    Args:
+        before: Project data before the update
+        after: Project data after the update
+
+    Returns:
+        True if the snapshot must be recomputed
+    """
+    return any(before.get(field) != after.get(field) for field in PROJECT_INPUT_FIELDS)
+
+
+def _document_number_date(project_data: Dict[str, Any]) -> datetime:
+    """Parse the project date the same way prepare_standard_variables does."""
+    try:
+        return datetime.strptime(project_data.get('date', ''), '%Y-%m-%d')
+    except ValueError:
+        return datetime.now()
+
+
+def refresh_project_snapshot(db, project_ref, project_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Recompute and persist a project's standard variable snapshot.
+
+    The document number is assigned on the first refresh only, from a
+    per-date counter document seeded with the number of other projects on
+    the same date so existing numbering carries on. Number and snapshot are
+    written in one transaction. Nothing is written when the snapshot is
+    unchanged.
+
+    Args:
+        db: Firestore client
+        project_ref: Project document reference
+        project_data: Project data from Firestore
+
+    Returns:
+        The stored snapshot
+    """
+    company_data = db.document(project_data['company_ref']).get().to_dict() or {}
+    contact_data = db.document(project_data['contact_ref']).get().to_dict() or {}
+
+    def build_snapshot(document_number: str) -> Dict[str, str]:
+        variables = prepare_standard_variables(
+            project_data,
+            company_data,
+            contact_data,
+            db,
+            document_number=document_number
+        )
+        return {k: v for k, v in variables.items() if k not in TIMESTAMP_VARIABLES}
+
+    if project_data.get('document_number'):
+        snapshot = build_snapshot(project_data['document_number'])
+        # Writing an unchanged snapshot would only re-fire the project trigger
+        if snapshot != project_data.get(SNAPSHOT_FIELD):
+            project_ref.update({
+                SNAPSHOT_FIELD: snapshot,
+                'standard_variables_updated_at': firestore.SERVER_TIMESTAMP
+            })
+        return snapshot
+
+    date = _document_number_date(project_data)
+    date_str = date.strftime('%Y-%m-%d')
+    counter_ref = db.collection(COUNTERS_COLLECTION).document(f'document_number_{date_str}')
+    same_date_projects = (
+        db.collection('projects')
+        .where('date', '==', date_str)
+        .select([FieldPath.document_id()])
+    )
+
+    @firestore.transactional
+    def assign(transaction):
+        project_snapshot = project_ref.get(transaction=transaction)
+        stored = project_snapshot.to_dict() or {}
+        document_number = stored.get('document_number')
+
+        if not document_number:
+            counter_snapshot = counter_ref.get(transaction=transaction)
+            if counter_snapshot.exists:
+                last = counter_snapshot.get('last')
+            else:
+                # Seed in the transaction, so two first numbers of a date
+                # cannot both start from a stale count
+                last = sum(
+                    1 for snapshot in same_date_projects.get(transaction=transaction)
+                    if snapshot.id != project_ref.id
+                )
+            document_number = generate_document_number(date, last + 1)
+            transaction.set(counter_ref, {'last': last + 1, 'date': date_str}, merge=True)
+
+        snapshot = build_snapshot(document_number)
+        if document_number != stored.get('document_number') or snapshot != stored.get(SNAPSHOT_FIELD):
+            transaction.update(project_ref, {
+                'document_number': document_number,
+                SNAPSHOT_FIELD: snapshot,
+                'standard_variables_updated_at': firestore.SERVER_TIMESTAMP
+            })
+        return snapshot
+
+    return assign(db.transaction())
+
+
+def get_standard_variables(db, project_ref, project_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Get ready-to-render standard variables for a project.
+
+    Uses the stored snapshot when it is complete, otherwise computes and
+    stores it first.
+
+    Args:
+        db: Firestore client
+        project_ref: Project document reference
+        project_data: Project data from Firestore
+
+    Returns:
+        Dictionary of standard variables
+    """
+    if is_snapshot_current(project_data):
+        snapshot = project_data[SNAPSHOT_FIELD]
+    else:
+        snapshot = refresh_project_snapshot(db, project_ref, project_data)
+
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return {**snapshot, 'created_at': now, 'updated_at': now}
+
+
+def update_party_snapshots(db, ref_field: str, ref_path: str, variables: Dict[str, str]) -> int:
+    """
+    Write changed company/contact variables into every dependent snapshot.
+
+    Args:
+        db: Firestore client
+        ref_field: 'company_ref' or 'contact_ref'
+        ref_path: Firestore path of the changed company/contact
+        variables: Fresh company_variables() / contact_variables() output
+
+    Returns:
+        Number of projects updated
+    """
+    query = (
+        db.collection('projects')
+        .where(ref_field, '==', ref_path)
+        .select([FieldPath.document_id()])
+    )
+
+    updates = {f'{SNAPSHOT_FIELD}.{key}': value for key, value in variables.items()}
+    updates['standard_variables_updated_at'] = firestore.SERVER_TIMESTAMP
+
+    batch = db.batch()
+    pending = 0
+    updated = 0
+
+    for snapshot in query.stream():
+        batch.update(snapshot.reference, updates)
+        pending += 1
+        updated += 1
+
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return updated
+
+
+@firestore_fn.on_document_written(document='projects/{projectId}')
+def refresh_project_variables(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Compute the snapshot for new projects and recompute it when its inputs change.
+
+    The snapshot write re-fires this trigger; it returns without writing
+    because the inputs did not change and the snapshot is then current.
+    """
+    after = event.data.after
+    if after is None or not after.exists:
+        return
+
+    before_data = event.data.before.to_dict() if event.data.before and event.data.before.exists else {}
+    after_data = after.to_dict()
+
+    if is_snapshot_current(after_data) and not snapshot_inputs_changed(before_data, after_data):
+        return
+
+    try:
+        refresh_project_snapshot(get_db(), after.reference, after_data)
+    except Exception as e:
+        print(f"Error refreshing variables for project {event.params['projectId']}: {e}")
+
+
+@firestore_fn.on_document_updated(document='companies/{companyId}')
+def refresh_company_variables(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Push company changes into the snapshots of the company's projects.
+    """
+    before = company_variables(event.data.before.to_dict() or {})
+    after = company_variables(event.data.after.to_dict() or {})
+
+    if before == after:
+        return
+
+    company_path = f"companies/{event.params['companyId']}"
+    count = update_party_snapshots(get_db(), 'company_ref', company_path, after)
+    print(f"Refreshed variables of {count} projects for {company_path}")
+
+
+@firestore_fn.on_document_updated(document='contacts/{contactId}')
+def refresh_contact_variables(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Push contact changes into the snapshots of the contact's projects.
+    """
+    before = contact_variables(event.data.before.to_dict() or {})
+    after = contact_variables(event.data.after.to_dict() or {})
+
+    if before == after:
+        return
+
+    contact_path = f"contacts/{event.params['contactId']}"
+    count = update_party_snapshots(get_db(), 'contact_ref', contact_path, after)
+    print(f"Refreshed variables of {count} projects for {contact_path}")
@@ -0,0 +1,150 @@
+"""
+Project Status History
+
+Status changes are appended to a subcollection of the project instead of an
+array on the project document, so the project stays the same size however
+often its status changes:
+
+    projects/{project_id}/status_history/{entry_id}
+        status: new status
+        previous_status: status before the change (None on creation)
+        updated_by: user ID
+        timestamp: when the change was made
+
+Entries are never updated or deleted. The project itself only keeps the
+current `status` and `status_changed_at`. History is read newest first,
+one page at a time (get_project_status_history).
+"""
+
+from firebase_functions import https_fn
+from firebase_admin import firestore
+from typing import Dict, Any, Optional
+
+from ..utils.clients import get_db, count_round_trips
+
+
+HISTORY_SUBCOLLECTION = 'status_history'
+
+# Entries returned per page by default, and at most
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def history_collection(db, project_id: str):
+    """Return the status history collection of a project."""
+    return db.collection('projects').document(project_id).collection(HISTORY_SUBCOLLECTION)
+
+
+def stage_status_change(
+    uow,
+    project_id: str,
+    status: str,
+    updated_by: str,
+    previous_status: Optional[str] = None
+) -> None:
+    """
+    Stage a status history entry on a unit of work.
+
+    Args:
+        uow: UnitOfWork to stage the entry on
+        project_id: Project ID
+        status: New status
+        updated_by: User ID making the change
+        previous_status: Status before the change (None on creation)
+    """
+    uow.set(history_collection(uow.db, project_id).document(), {
+        'status': status,
+        'previous_status': previous_status,
+        'updated_by': updated_by,
+        'timestamp': firestore.SERVER_TIMESTAMP
+    })
+
+
+def _serialize_entry(snapshot) -> Dict[str, Any]:
+    entry = snapshot.to_dict()
+    timestamp = entry.get('timestamp')
+
+    return {
+        'id': snapshot.id,
+        'status': entry.get('status'),
+        'previous_status': entry.get('previous_status'),
+        'updated_by': entry.get('updated_by'),
+        'timestamp': timestamp.isoformat() if timestamp else None
+    }
+
+
+@https_fn.on_call()
+@count_round_trips
+def get_project_status_history(req: https_fn.CallableRequest) -> dict:
+    """
+    Get a page of a project's status history, newest first.
+
+    Request data:
+        project_id: str
+        page_size: int (optional, default DEFAULT_PAGE_SIZE)
+        page_token: str (optional, next_page_token of the previous page)
+
+    Returns:
+        dict with success, entries and next_page_token (None on the last page)
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    project_id = req.data.get('project_id')
+    page_token = req.data.get('page_token')
+
+    if not project_id:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message='project_id is required'
+        )
+
+    try:
+        page_size = int(req.data.get('page_size', DEFAULT_PAGE_SIZE))
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError()
+    except (ValueError, TypeError):
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=f'page_size must be between 1 and {MAX_PAGE_SIZE}'
+        )
+
+    db = get_db()
+
+    try:
+        collection = history_collection(db, project_id)
+        query = (
+            collection
+            .order_by('timestamp', direction=firestore.Query.DESCENDING)
+            .limit(page_size)
+        )
+
+        if page_token:
+            cursor = collection.document(page_token).get()
+            if not cursor.exists:
+                raise https_fn.HttpsError(
+                    code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+                    message='Invalid page_token'
+                )
+            query = query.start_after(cursor)
+
+        page = list(query.stream())
+
+        return {
+            'success': True,
+            'entries': [_serialize_entry(snapshot) for snapshot in page],
+            'next_page_token': page[-1].id if len(page) == page_size else None
+        }
+
+    except https_fn.HttpsError:
+        raise
+    except Exception as e:
+        print(f"Error reading status history: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f'Internal error: {str(e)}'
+        )
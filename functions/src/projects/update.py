@@ -0,0 +1,168 @@
+"""
+Update Project Cloud Function
+"""
+
+from firebase_functions import https_fn
+from firebase_admin import firestore
+from typing import Dict, Any
+import math
+from ..utils.clients import get_db, count_round_trips
+from .aggregates import AGGREGATE_FIELDS, merge_deltas, project_deltas, stage_project_stats
+from .acl import check_edit_access
+from ..utils.side_effects import UnitOfWork
+from ..documents.dependencies import stage_index_refs
+
+
+# Fields a project edit may change
+EDITABLE_FIELDS = ['project_name', 'company_ref', 'contact_ref', 'price', 'date', 'extra_data']
+
+# Project fields read by an edit
+PROJECT_UPDATE_FIELDS = ['project_name', 'contact_ref', *AGGREGATE_FIELDS]
+
+
+def validate_project_changes(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pick and validate the editable fields of a request.
+
+    Raises:
+        ValueError: A field is invalid or nothing is changed
+    """
+    changes = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+    if not changes:
+        raise ValueError('No editable fields given')
+
+    for field in ('project_name', 'company_ref', 'contact_ref', 'date'):
+        if field in changes and (not isinstance(changes[field], str) or not changes[field].strip()):
+            raise ValueError(f'{field} must be a non-empty string')
+
+    for field, collection in (('company_ref', 'companies'), ('contact_ref', 'contacts')):
+        if field in changes and not changes[field].startswith(f'{collection}/'):
+            raise ValueError(f'{field} must be a {collection}/<id> path')
+
+    if 'price' in changes:
+        try:
+            price = float(changes['price'])
+        except (ValueError, TypeError):
+            price = None
+        if price is None or not math.isfinite(price) or price <= 0:
+            raise ValueError('price must be a positive number')
+        changes['price'] = price
+
+    if 'extra_data' in changes and not isinstance(changes['extra_data'], dict):
+        raise ValueError('extra_data must be an object')
+
+    return changes
+
+
+@https_fn.on_call()
+@count_round_trips
+def update_project(req: https_fn.CallableRequest) -> dict:
+    """
+    Update a project's data. Changes to status, price, date or company
+    move the project in the dashboard aggregates in the same commit, and
+    a new company or contact is written to the document_index entries of
+    the project's generated documents.
+
+    Request data:
+        project_id: str
+        project_name, company_ref, contact_ref, price, date, extra_data:
+            fields to change (optional, at least one)
+
+    Returns:
+        dict with success status
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    project_id = req.data.get('project_id')
+    if not project_id:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message='project_id is required'
+        )
+
+    try:
+        changes = validate_project_changes(req.data)
+    except ValueError as e:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=str(e)
+        )
+
+    db = get_db()
+
+    try:
+        has_access = check_edit_access(db, project_id, req.auth.uid)
+
+        if has_access is None:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.NOT_FOUND,
+                message='Project not found'
+            )
+
+        if not has_access:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.PERMISSION_DENIED,
+                message='You do not have permission to update this project'
+            )
+
+        project_ref = db.collection('projects').document(project_id)
+
+        # The aggregates are moved from the values the project really had,
+        # read in the same transaction as the write
+        @firestore.transactional
+        def update(transaction):
+            project_doc = project_ref.get(field_paths=PROJECT_UPDATE_FIELDS, transaction=transaction)
+
+            if not project_doc.exists:
+                raise https_fn.HttpsError(
+                    code=https_fn.FunctionsErrorCode.NOT_FOUND,
+                    message='Project not found'
+                )
+
+            old_data = project_doc.to_dict()
+            new_data = {**old_data, **changes}
+
+            uow = UnitOfWork(db)
+            uow.update(project_ref, {**changes, 'updated_at': firestore.SERVER_TIMESTAMP})
+
+            # Re-renders triggered by company/contact edits must find the
+            # documents under the project's current references
+            refs = {
+                field: changes[field]
+                for field in ('company_ref', 'contact_ref')
+                if field in changes and changes[field] != old_data.get(field)
+            }
+            if refs:
+                stage_index_refs(db, project_id, refs, uow, transaction)
+
+            stage_project_stats(uow, merge_deltas(project_deltas(old_data, -1), project_deltas(new_data)))
+            uow.log_activity(
+                action='update_project',
+                user_id=req.auth.uid,
+                user_name=req.auth.token.get('name', 'Unknown'),
+                resource_type='project',
+                resource_id=project_id,
+                resource_name=new_data.get('project_name', ''),
+                details={'fields': sorted(changes)}
+            )
+            uow.commit(transaction)
+
+        update(db.transaction())
+
+        return {
+            'success': True
+        }
+
+    except https_fn.HttpsError:
+        raise
+    except Exception as e:
+        print(f"Error updating project: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f'Internal error: {str(e)}'
+        )
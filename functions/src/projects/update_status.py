@@ -4,6 +4,12 @@ Update Project Status Cloud Function
 
 from firebase_functions import https_fn
 from firebase_admin import firestore
+from typing import Dict, Any, List, Optional
+from ..utils.clients import get_db, count_round_trips
+from .aggregates import AGGREGATE_FIELDS, status_change_deltas, stage_project_stats
+from .acl import check_edit_access
+from .status_history import stage_status_change
+from ..utils.side_effects import UnitOfWork
 
 
 VALID_STATUSES = [
@@ -15,8 +21,65 @@ VALID_STATUSES = [
     'completed'
 ]
 
+# Project fields read by a status update
+STATUS_UPDATE_FIELDS = ['project_name', *AGGREGATE_FIELDS]
+
+
+def stage_status_update(
+    uow,
+    project_ref,
+    project_data: Dict[str, Any],
+    new_status: str,
+    user_id: str,
+    user_name: str,
+    stats: Optional[List[Dict[str, Any]]] = None
+) -> None:
+    """
+    Stage a status change: the project update, its history entry, the
+    dashboard aggregates and the activity entry are written together.
+
+    Args:
+        uow: UnitOfWork to stage the writes on
+        project_ref: Project document reference
+        project_data: Project fields (at least STATUS_UPDATE_FIELDS)
+        new_status: Status to move to
+        user_id: User making the change
+        user_name: Display name of the user
+        stats: List to collect the aggregate increments in instead of
+            staging them (for callers merging many changes into one write)
+    """
+    old_status = project_data.get('status')
+
+    uow.update(project_ref, {
+        'status': new_status,
+        'status_changed_at': firestore.SERVER_TIMESTAMP,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    stage_status_change(uow, project_ref.id, new_status, user_id, previous_status=old_status)
+
+    if old_status != new_status:
+        deltas = status_change_deltas(project_data, new_status)
+        if stats is None:
+            stage_project_stats(uow, deltas)
+        else:
+            stats.append(deltas)
+
+    uow.log_activity(
+        action='update_status',
+        user_id=user_id,
+        user_name=user_name,
+        resource_type='project',
+        resource_id=project_ref.id,
+        resource_name=project_data.get('project_name', ''),
+        details={
+            'old_status': old_status,
+            'new_status': new_status
+        }
+    )
+
 
 @https_fn.on_call()
+@count_round_trips
 def update_project_status(req: https_fn.CallableRequest) -> dict:
     """
     Update project status.
@@ -50,56 +113,49 @@ def update_project_status(req: https_fn.CallableRequest) -> dict:
             message=f'Invalid status. Must be one of: {", ".join(VALID_STATUSES)}'
         )
 
-    db = firestore.client()
+    db = get_db()
 
     try:
-        project_ref = db.collection('projects').document(project_id)
-        project_doc = project_ref.get()
+        # Permission comes from the cached access record, not the project
+        has_access = check_edit_access(db, project_id, req.auth.uid)
 
-        if not project_doc.exists:
+        if has_access is None:
             raise https_fn.HttpsError(
                 code=https_fn.FunctionsErrorCode.NOT_FOUND,
                 message='Project not found'
             )
 
-        project_data = project_doc.to_dict()
-
-        # Check permission (user must be owner or have member access)
-        created_by = project_data.get('created_by')
-        shared_with = project_data.get('shared_with', {})
-        user_role = shared_with.get(req.auth.uid)
-
-        if req.auth.uid != created_by and user_role not in ['member', 'owner']:
+        if not has_access:
             raise https_fn.HttpsError(
                 code=https_fn.FunctionsErrorCode.PERMISSION_DENIED,
                 message='You do not have permission to update this project'
             )
 
-        # Update status
-        project_ref.update({
-            'status': new_status,
-            'status_history': firestore.ArrayUnion([{
-                'status': new_status,
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                'updated_by': req.auth.uid
-            }]),
-            'updated_at': firestore.SERVER_TIMESTAMP
-        })
-
-        # Log activity
-        db.collection('activities').add({
-            'action': 'update_status',
-            'user_id': req.auth.uid,
-            'user_name': req.auth.token.get('name', 'Unknown'),
-            'resource_type': 'project',
-            'resource_id': project_id,
-            'resource_name': project_data.get('project_name', ''),
-            'details': {
-                'old_status': project_data.get('status'),
-                'new_status': new_status
-            },
-            'timestamp': firestore.SERVER_TIMESTAMP
-        })
+        project_ref = db.collection('projects').document(project_id)
+
+        # Read only the fields the update depends on, in the same transaction
+        # as the write, so the old status logged and removed from the
+        # aggregates is the one the project really had
+        @firestore.transactional
+        def update(transaction):
+            project_doc = project_ref.get(field_paths=STATUS_UPDATE_FIELDS, transaction=transaction)
+
+            if not project_doc.exists:
+                raise https_fn.HttpsError(
+                    code=https_fn.FunctionsErrorCode.NOT_FOUND,
+                    message='Project not found'
+                )
+
+            project_data = project_doc.to_dict()
+
+            uow = UnitOfWork(db)
+            stage_status_update(
+                uow, project_ref, project_data, new_status,
+                req.auth.uid, req.auth.token.get('name', 'Unknown')
+            )
+            uow.commit(transaction)
+
+        update(db.transaction())
 
         return {
             'success': True
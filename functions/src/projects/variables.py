@@ -5,15 +5,28 @@ Prepares standard variables from project, company, and contact data.
 """
 
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ..utils.document_number import generate_document_number, get_next_counter_for_date
 
 
+# Standard variables that are always available
+STANDARD_VARIABLES = {
+    'project_name', 'company_name', 'contact_name',
+    'price', 'price_before_tax', 'tax_amount',
+    'date', 'year', 'month', 'day',
+    'roc_year', 'roc_date',
+    'document_number', 'quotation_number', 'contract_number', 'invoice_number',
+    'contact_info', 'contact_email', 'contact_phone',
+    'company_address', 'created_at', 'updated_at'
+}
+
+
 def prepare_standard_variables(
     project: Dict[str, Any],
     company: Dict[str, Any],
     contact: Dict[str, Any],
-    db_client
+    db_client,
+    document_number: Optional[str] = None
 ) -> Dict[str, str]:
     """
     Prepare standard variables for document generation.
@@ -30,6 +43,8 @@ def prepare_standard_variables(
         company: Company data from Firestore
         contact: Contact data from Firestore
         db_client: Firestore client for counter queries
+        document_number: Already assigned document number (optional);
+            a new one is generated from the date counter when omitted
 
     Returns:
         Dictionary of standard variables
@@ -49,28 +64,21 @@ def prepare_standard_variables(
     tax_amount = price - price_before_tax
 
     # Generate document number
-    try:
-        counter = get_next_counter_for_date(db_client, date)
-        document_number = generate_document_number(date, counter)
-    except Exception as e:
-        print(f"Error generating document number: {e}")
-        document_number = "HIYES00AAA001"  # Fallback
+    if not document_number:
+        try:
+            counter = get_next_counter_for_date(db_client, date)
+            document_number = generate_document_number(date, counter)
+        except Exception as e:
+            print(f"Error generating document number: {e}")
+            document_number = "HIYES00AAA001"  # Fallback
 
     # ROC (Taiwan) calendar conversion
     roc_year = date.year - 1911
 
-    # Contact info (name + phone if available)
-    contact_phone = contact.get('phone', '')
-    contact_info = contact.get('contact_name', '')
-    if contact_phone:
-        contact_info = f"{contact_info} ({contact_phone})"
-
     # Prepare standard variables
     variables = {
         # Basic info
         'project_name': project.get('project_name', ''),
-        'company_name': company.get('company_name', ''),
-        'contact_name': contact.get('contact_name', ''),
 
         # Financial
         'price': f"{price:,.2f}",
@@ -93,15 +101,54 @@ def prepare_standard_variables(
         'contract_number': document_number,
         'invoice_number': document_number,
 
-        # Additional info
-        'contact_info': contact_info,
-        'contact_email': contact.get('email', ''),
-        'contact_phone': contact_phone,
-        'company_address': company.get('address', ''),
-
         # Timestamps
         'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+
+        # Company and contact info
+        **company_variables(company),
+        **contact_variables(contact),
     }
 
     return variables
+
+
+def company_variables(company: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Prepare the standard variables derived from company data.
+
+    Args:
+        company: Company data from Firestore
+
+    Returns:
+        Dictionary of company variables
+    """
+    return {
+        'company_name': company.get('company_name', ''),
+        'company_address': company.get('address', ''),
+    }
+
+
+def contact_variables(contact: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Prepare the standard variables derived from contact data.
+
+    Args:
+        contact: Contact data from Firestore
+
+    Returns:
+        Dictionary of contact variables
+    """
+
+    # Contact info (name + phone if available)
+    contact_phone = contact.get('phone', '')
+    contact_info = contact.get('contact_name', '')
+    if contact_phone:
+        contact_info = f"{contact_info} ({contact_phone})"
+
+    return {
+        'contact_name': contact.get('contact_name', ''),
+        'contact_info': contact_info,
+        'contact_email': contact.get('email', ''),
+        'contact_phone': contact_phone,
+    }
@@ -8,7 +8,6 @@ import tempfile
 import os
 from typing import Dict, Any
 from firebase_functions import https_fn, options
-from firebase_admin import storage, firestore
 from .document_processor import (
     extract_variables_from_docx,
     extract_variables_from_pdf,
@@ -17,6 +16,7 @@ from .document_processor import (
     generate_pdf_from_text,
     generate_html
 )
+from .utils.clients import get_db, get_bucket, count_round_trips
 
 
 @https_fn.on_call(
@@ -25,6 +25,7 @@ from .document_processor import (
         cors_methods=["post"]
     )
 )
+@count_round_trips
 def extract_template_variables(req: https_fn.CallableRequest) -> Dict[str, Any]:
     """
     Extract variables from uploaded template file
@@ -50,7 +51,7 @@ def extract_template_variables(req: https_fn.CallableRequest) -> Dict[str, Any]:
             )
 
         # Download file from Storage
-        bucket = storage.bucket()
+        bucket = get_bucket()
         # Extract path from URL
         file_path = file_url.split(f'{bucket.name}/')[1].split('?')[0]
         blob = bucket.blob(file_path)
@@ -95,6 +96,7 @@ def extract_template_variables(req: https_fn.CallableRequest) -> Dict[str, Any]:
         cors_methods=["post"]
     )
 )
+@count_round_trips
 def generate_document(req: https_fn.CallableRequest) -> Dict[str, Any]:
     """
     Generate document from template with variable values
@@ -124,7 +126,7 @@ def generate_document(req: https_fn.CallableRequest) -> Dict[str, Any]:
             )
 
         # Get template from Firestore
-        db = firestore.client()
+        db = get_db()
         template_ref = db.collection('templates').document(template_id)
         template_doc = template_ref.get()
 
@@ -136,7 +138,7 @@ def generate_document(req: https_fn.CallableRequest) -> Dict[str, Any]:
 
         template_data = template_doc.to_dict()
         source_type = template_data.get('source_type', 'text')
-        bucket = storage.bucket()
+        bucket = get_bucket()
 
         # Ensure output_name has correct extension
         if not output_name.endswith(f'.{output_format}'):
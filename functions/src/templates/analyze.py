@@ -3,26 +3,15 @@ Template Analysis Cloud Function
 """
 
 from firebase_functions import https_fn
-from firebase_admin import storage
-from docx import Document
 import tempfile
 
 from ..documents.placeholders import find_placeholders
-
-
-# Standard variables that are always available
-STANDARD_VARIABLES = {
-    'project_name', 'company_name', 'contact_name',
-    'price', 'price_before_tax', 'tax_amount',
-    'date', 'year', 'month', 'day',
-    'roc_year', 'roc_date',
-    'document_number', 'quotation_number', 'contract_number', 'invoice_number',
-    'contact_info', 'contact_email', 'contact_phone',
-    'company_address', 'created_at', 'updated_at'
-}
+from ..projects.variables import STANDARD_VARIABLES
+from ..utils.clients import get_bucket, count_round_trips
 
 
 @https_fn.on_call()
+@count_round_trips
 def analyze_template(req: https_fn.CallableRequest) -> dict:
     """
     Analyze a template file to extract variables.
@@ -52,13 +41,15 @@ def analyze_template(req: https_fn.CallableRequest) -> dict:
 
     try:
         # Download template
-        bucket = storage.bucket()
+        bucket = get_bucket()
         blob = bucket.blob(file_path)
 
         with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_file:
             blob.download_to_filename(temp_file.name)
             template_file = temp_file.name
 
+        from docx import Document
+
         try:
             # Load document and find placeholders
             doc = Document(template_file)
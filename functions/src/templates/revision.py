@@ -0,0 +1,486 @@
+"""
+Template Revision Fan-out
+
+Re-renders every generated document that references a template after the
+template has been revised. Jobs live in `template_revision_jobs/{job_id}`
+and are processed page by page:
+
+- documents are enumerated from the document_index with paginated queries
+- the template is downloaded and parsed once for the whole job
+- each page is rendered on a worker pool, with Storage and Firestore
+  writes rate-limited
+- progress and the pagination cursor are checkpointed after every page
+
+A worker stops before the function timeout and re-queues the job, which
+re-triggers the worker and resumes from the saved cursor. Jobs whose worker
+was killed without re-queueing are picked up by a scheduled sweep.
+
+A template has at most one active (queued or running) job. A revision
+requested while one is active bumps the job's `requested_revision`; the
+worker checks it before every page and, if the template changed again
+after it started, starts over with the new file.
+"""
+
+from firebase_functions import https_fn, firestore_fn, scheduler_fn
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, TYPE_CHECKING
+import io
+import time
+
+from ..documents.dependencies import INDEX_COLLECTION
+from ..documents.rerender import rerender_generated_document, commit_rerendered_docs
+from ..utils.rate_limit import RateLimiter
+from ..projects.acl import acl_record, can_edit
+from ..utils.clients import get_db, get_bucket, count_round_trips
+
+if TYPE_CHECKING:
+    from docx.document import Document
+
+
+JOBS_COLLECTION = 'template_revision_jobs'
+
+# Function timeout and the share of it spent rendering before re-queueing
+FUNCTION_TIMEOUT_SEC = 540
+WORK_BUDGET_SEC = 420
+
+# Index entries fetched per page
+PAGE_SIZE = 50
+
+# Parallel renders per worker
+MAX_WORKERS = 4
+
+# Write-rate limits (operations per second)
+STORAGE_WRITES_PER_SEC = 10
+FIRESTORE_WRITES_PER_SEC = 20
+
+# Running jobs without a heartbeat for this long are considered dead
+STALL_TIMEOUT = timedelta(seconds=FUNCTION_TIMEOUT_SEC + 60)
+
+
+def load_parsed_template(bucket, template_data: Dict[str, Any]) -> 'Document':
+    """
+    Download and parse a template once.
+
+    Args:
+        bucket: Storage bucket
+        template_data: Template data from Firestore
+
+    Returns:
+        Parsed python-docx Document
+    """
+    from docx import Document
+
+    content = bucket.blob(template_data['file_path']).download_as_bytes()
+    return Document(io.BytesIO(content))
+
+
+def _claim_job(db, job_ref) -> bool:
+    """Atomically move a job from 'queued' to 'running'."""
+
+    @firestore.transactional
+    def claim(transaction):
+        snapshot = job_ref.get(transaction=transaction)
+        if not snapshot.exists or snapshot.get('status') != 'queued':
+            return False
+
+        transaction.update(job_ref, {
+            'status': 'running',
+            'attempt': firestore.Increment(1),
+            'heartbeat_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        return True
+
+    return claim(db.transaction())
+
+
+def _render_project_page(db, bucket, template_id: str, template_data: Dict[str, Any],
+                         parsed_template, project_id: str, document_ids: List[str],
+                         storage_limiter: RateLimiter,
+                         firestore_limiter: RateLimiter) -> Dict[str, Any]:
+    """Re-render one project's documents from a page; returns progress counts."""
+
+    result = {'completed': 0, 'errors': []}
+
+    try:
+        project_ref = db.collection('projects').document(project_id)
+        project_doc = project_ref.get()
+
+        if not project_doc.exists:
+            raise Exception('Project not found')
+
+        generated_docs = project_doc.to_dict().get('generated_docs', [])
+        rendered = {}
+
+        for doc in generated_docs:
+            if doc['id'] not in document_ids or doc.get('template_id') != template_id:
+                continue
+
+            try:
+                storage_limiter.acquire()
+                rendered[doc['id']] = (doc, rerender_generated_document(
+                    bucket,
+                    project_id,
+                    doc,
+                    template_data,
+                    doc.get('generation_data', {}),
+                    'system:template_revision',
+                    parsed_template=parsed_template
+                ))
+
+            except Exception as e:
+                print(f"Error re-rendering {project_id}/{doc['id']}: {e}")
+                result['errors'].append({
+                    'project_id': project_id,
+                    'document_id': doc['id'],
+                    'error': str(e)
+                })
+
+        if rendered:
+            # Project update plus the cleanup tasks, merged transactionally
+            # with concurrent re-render jobs
+            firestore_limiter.acquire(2)
+            skipped = commit_rerendered_docs(db, project_ref, rendered, 'system:template_revision')
+            result['completed'] = len(rendered) - len(skipped)
+            for document_id in skipped:
+                result['errors'].append({
+                    'project_id': project_id,
+                    'document_id': document_id,
+                    'error': 'Document changed during re-render'
+                })
+
+    except Exception as e:
+        print(f"Error re-rendering project {project_id}: {e}")
+        result['completed'] = 0
+        result['errors'] = [{
+            'project_id': project_id,
+            'document_id': document_id,
+            'error': str(e)
+        } for document_id in document_ids]
+
+    return result
+
+
+def _complete_job(db, job_ref, revision: int) -> bool:
+    """Mark a job completed unless a newer revision was requested meanwhile."""
+
+    @firestore.transactional
+    def complete(transaction):
+        snapshot = job_ref.get(transaction=transaction)
+        if (snapshot.to_dict() or {}).get('requested_revision', 0) != revision:
+            return False
+
+        transaction.update(job_ref, {
+            'status': 'completed',
+            'finished_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        return True
+
+    return complete(db.transaction())
+
+
+def run_template_revision(db, bucket, job_ref, deadline: float) -> str:
+    """
+    Process a template revision job until it finishes or the deadline nears.
+
+    Args:
+        db: Firestore client
+        bucket: Storage bucket
+        job_ref: Job document reference (already claimed)
+        deadline: time.monotonic() value after which no new page is started
+
+    Returns:
+        Final job status: 'completed' or 'queued' (to be resumed)
+    """
+    job_data = job_ref.get().to_dict()
+    template_id = job_data['template_id']
+    revision = job_data.get('cursor_revision', 0)
+    cursor = job_data.get('cursor')
+    template_data = parsed_template = None
+
+    storage_limiter = RateLimiter(STORAGE_WRITES_PER_SEC)
+    firestore_limiter = RateLimiter(FIRESTORE_WRITES_PER_SEC)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while True:
+            if time.monotonic() >= deadline:
+                job_ref.update({
+                    'status': 'queued',
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                })
+                return 'queued'
+
+            if parsed_template is not None:
+                job_data = job_ref.get().to_dict()
+
+            requested = job_data.get('requested_revision', 0)
+            if requested != revision:
+                # Revised again since this job started: start over
+                revision, cursor, parsed_template = requested, None, None
+                firestore_limiter.acquire()
+                job_ref.update({
+                    'cursor': None,
+                    'cursor_revision': revision,
+                    'processed': 0,
+                    'completed': 0,
+                    'failed': 0,
+                    'errors': [],
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                })
+
+            if parsed_template is None:
+                template_doc = db.collection('templates').document(template_id).get()
+                if not template_doc.exists:
+                    raise Exception(f"Template {template_id} not found")
+
+                template_data = template_doc.to_dict()
+                parsed_template = load_parsed_template(bucket, template_data)
+
+            query = (
+                db.collection(INDEX_COLLECTION)
+                .where('template_id', '==', template_id)
+                .order_by(FieldPath.document_id())
+                .limit(PAGE_SIZE)
+            )
+            if cursor:
+                query = query.start_after({FieldPath.document_id(): cursor})
+
+            page = list(query.stream())
+            if page:
+                # Group the page by project so each project is written once
+                by_project = {}
+                for snapshot in page:
+                    entry = snapshot.to_dict()
+                    by_project.setdefault(entry['project_id'], []).append(entry['document_id'])
+
+                futures = [
+                    executor.submit(
+                        _render_project_page, db, bucket, template_id, template_data,
+                        parsed_template, project_id, document_ids,
+                        storage_limiter, firestore_limiter
+                    )
+                    for project_id, document_ids in by_project.items()
+                ]
+                results = [future.result() for future in futures]
+
+                completed = sum(r['completed'] for r in results)
+                errors = [error for r in results for error in r['errors']]
+                cursor = page[-1].id
+
+                # Checkpoint after every page
+                checkpoint = {
+                    'cursor': cursor,
+                    'processed': firestore.Increment(len(page)),
+                    'completed': firestore.Increment(completed),
+                    'failed': firestore.Increment(len(errors)),
+                    'heartbeat_at': firestore.SERVER_TIMESTAMP,
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                }
+                if errors:
+                    checkpoint['errors'] = firestore.ArrayUnion(errors)
+
+                firestore_limiter.acquire()
+                job_ref.update(checkpoint)
+
+            if len(page) < PAGE_SIZE and _complete_job(db, job_ref, revision):
+                return 'completed'
+
+
+def queue_template_revision(db, template_id: str, requested_by: str) -> str:
+    """
+    Request a revision of a template's documents.
+
+    Creates a job unless the template already has an active one. A queued
+    job that has not started yet renders the latest file anyway; a job
+    that has started is told to start over with the new file.
+
+    Args:
+        db: Firestore client
+        template_id: Template ID
+        requested_by: User ID or system identifier
+
+    Returns:
+        Job ID (new or the active job's)
+    """
+    collection = db.collection(JOBS_COLLECTION)
+
+    @firestore.transactional
+    def queue(transaction):
+        active = list(
+            collection
+            .where('template_id', '==', template_id)
+            .where('status', 'in', ['queued', 'running'])
+            .limit(1)
+            .get(transaction=transaction)
+        )
+
+        if active:
+            job = active[0].to_dict()
+            if job.get('status') != 'queued' or job.get('cursor') is not None:
+                transaction.update(active[0].reference, {
+                    'requested_revision': firestore.Increment(1),
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                })
+            return active[0].id
+
+        job_ref = collection.document()
+        transaction.set(job_ref, {
+            'template_id': template_id,
+            'status': 'queued',
+            'cursor': None,
+            'requested_revision': 0,
+            'cursor_revision': 0,
+            'attempt': 0,
+            'processed': 0,
+            'completed': 0,
+            'failed': 0,
+            'errors': [],
+            'requested_by': requested_by,
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        return job_ref.id
+
+    return queue(db.transaction())
+
+
+def can_revise(template_data: Dict[str, Any], auth) -> bool:
+    """Check whether a user may re-render a template's documents (owner, member or admin)."""
+    if (auth.token or {}).get('admin') is True:
+        return True
+
+    return can_edit(acl_record(template_data), auth.uid)
+
+
+@https_fn.on_call()
+@count_round_trips
+def start_template_revision(req: https_fn.CallableRequest) -> dict:
+    """
+    Re-render all documents generated from a template.
+
+    Request data:
+        template_id: str
+
+    Returns:
+        dict with success and job_id
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    template_id = req.data.get('template_id')
+
+    if not template_id:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message='template_id is required'
+        )
+
+    db = get_db()
+
+    try:
+        template_doc = db.collection('templates').document(template_id).get()
+        if not template_doc.exists:
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.NOT_FOUND,
+                message='Template not found'
+            )
+
+        if not can_revise(template_doc.to_dict(), req.auth):
+            raise https_fn.HttpsError(
+                code=https_fn.FunctionsErrorCode.PERMISSION_DENIED,
+                message='Only the template owner, its members or an admin can re-render its documents'
+            )
+
+        job_id = queue_template_revision(db, template_id, req.auth.uid)
+
+        return {
+            'success': True,
+            'job_id': job_id
+        }
+
+    except https_fn.HttpsError:
+        raise
+    except Exception as e:
+        print(f"Error starting template revision: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f'Internal error: {str(e)}'
+        )
+
+
+@firestore_fn.on_document_written(
+    document=f'{JOBS_COLLECTION}/{{jobId}}',
+    timeout_sec=FUNCTION_TIMEOUT_SEC
+)
+def process_template_revision(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Worker: process a queued (or re-queued) template revision job.
+    """
+    after = event.data.after
+    if after is None or not after.exists or after.get('status') != 'queued':
+        return
+
+    deadline = time.monotonic() + WORK_BUDGET_SEC
+    db = get_db()
+    job_ref = after.reference
+
+    if not _claim_job(db, job_ref):
+        return
+
+    try:
+        status = run_template_revision(db, get_bucket(), job_ref, deadline)
+        print(f"Template revision job {job_ref.id}: {status}")
+    except Exception as e:
+        print(f"Error processing template revision job {job_ref.id}: {e}")
+        job_ref.update({
+            'status': 'failed',
+            'error': str(e),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+
+@firestore_fn.on_document_updated(document='templates/{templateId}')
+def on_template_updated(event: firestore_fn.Event[firestore_fn.Change[firestore_fn.DocumentSnapshot]]) -> None:
+    """
+    Start a revision job when a template's file or version changes.
+    """
+    before = event.data.before.to_dict() or {}
+    after = event.data.after.to_dict() or {}
+
+    if (before.get('file_path') == after.get('file_path')
+            and before.get('version') == after.get('version')):
+        return
+
+    template_id = event.params['templateId']
+    job_id = queue_template_revision(get_db(), template_id, 'system:template_updated')
+    print(f"Template revision job {job_id} covers template {template_id}")
+
+
+@scheduler_fn.on_schedule(schedule='every 10 minutes')
+def resume_stalled_template_revisions(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Re-queue running jobs whose worker hit the function timeout.
+    """
+    db = get_db()
+    stalled_before = datetime.now(timezone.utc) - STALL_TIMEOUT
+
+    query = (
+        db.collection(JOBS_COLLECTION)
+        .where('status', '==', 'running')
+        .where('heartbeat_at', '<', stalled_before)
+    )
+
+    for snapshot in query.stream():
+        print(f"Resuming stalled template revision job {snapshot.id}")
+        snapshot.reference.update({
+            'status': 'queued',
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
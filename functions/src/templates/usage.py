@@ -0,0 +1,179 @@
+"""
+Template Usage Counters
+
+Counts how often each template is used to generate documents. A single
+counter field on a popular template would exceed Firestore's sustained
+write rate for one document under parallel generation, so increments are
+spread over shard documents:
+
+    templates/{template_id}/usage_shards/{0..NUM_SHARDS-1}
+        count: uses not yet compacted into the template
+
+The total is the template's `usage_count` plus the sum of its shards. A
+daily job compacts the shards into `usage_count` in a transaction, so
+no increment is lost or counted twice.
+"""
+
+from firebase_functions import https_fn, scheduler_fn
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from typing import Dict, List
+import random
+
+from ..utils.clients import get_db, count_round_trips
+
+
+SHARDS_SUBCOLLECTION = 'usage_shards'
+
+# Each shard sustains roughly one write per second
+NUM_SHARDS = 10
+
+# Template IDs accepted by one get_template_usage call
+MAX_USAGE_TEMPLATES = 50
+
+
+def usage_shard_ref(db, template_id: str, shard: int = None):
+    """Return a usage shard of a template (a random one by default)."""
+    if shard is None:
+        shard = random.randrange(NUM_SHARDS)
+
+    return (
+        db.collection('templates')
+        .document(template_id)
+        .collection(SHARDS_SUBCOLLECTION)
+        .document(str(shard))
+    )
+
+
+def stage_usage_increment(uow, template_id: str, count: int = 1) -> None:
+    """
+    Stage a usage increment on a random shard.
+
+    Args:
+        uow: UnitOfWork to stage the increment on
+        template_id: Template ID
+        count: Number of uses
+    """
+    uow.increment(usage_shard_ref(uow.db, template_id), 'count', count)
+
+
+def get_template_usage(db, template_id: str) -> int:
+    """
+    Read a template's total usage: compacted count plus pending shards.
+
+    Args:
+        db: Firestore client
+        template_id: Template ID
+
+    Returns:
+        Total usage count (0 for unknown templates)
+    """
+    template_ref = db.collection('templates').document(template_id)
+    template_doc = template_ref.get()
+    base = (template_doc.to_dict() or {}).get('usage_count', 0) if template_doc.exists else 0
+
+    result = template_ref.collection(SHARDS_SUBCOLLECTION).sum('count', alias='total').get()
+    pending = result[0][0].value or 0
+
+    return int(base + pending)
+
+
+def compact_template_usage(db, template_id: str) -> int:
+    """
+    Fold a template's shards into its usage_count.
+
+    Args:
+        db: Firestore client
+        template_id: Template ID
+
+    Returns:
+        Number of uses moved from the shards
+    """
+    template_ref = db.collection('templates').document(template_id)
+    shard_refs = [usage_shard_ref(db, template_id, shard) for shard in range(NUM_SHARDS)]
+
+    @firestore.transactional
+    def compact(transaction):
+        shards = [
+            snapshot for snapshot in db.get_all(shard_refs, transaction=transaction)
+            if snapshot.exists
+        ]
+        total = sum(snapshot.to_dict().get('count', 0) for snapshot in shards)
+
+        if total:
+            transaction.update(template_ref, {
+                'usage_count': firestore.Increment(total),
+                'usage_compacted_at': firestore.SERVER_TIMESTAMP
+            })
+        for snapshot in shards:
+            transaction.delete(snapshot.reference)
+
+        return total
+
+    return compact(db.transaction())
+
+
+@https_fn.on_call()
+@count_round_trips
+def get_template_usage_counts(req: https_fn.CallableRequest) -> dict:
+    """
+    Get usage counts for templates.
+
+    Request data:
+        template_ids: list[str]
+
+    Returns:
+        dict with success and usage: {template_id: count}
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    template_ids: List[str] = req.data.get('template_ids', [])
+
+    if not template_ids or len(template_ids) > MAX_USAGE_TEMPLATES:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INVALID_ARGUMENT,
+            message=f'template_ids must list 1 to {MAX_USAGE_TEMPLATES} templates'
+        )
+
+    db = get_db()
+
+    try:
+        usage: Dict[str, int] = {
+            template_id: get_template_usage(db, template_id)
+            for template_id in dict.fromkeys(template_ids)
+        }
+
+        return {
+            'success': True,
+            'usage': usage
+        }
+
+    except Exception as e:
+        print(f"Error reading template usage: {e}")
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.INTERNAL,
+            message=f'Internal error: {str(e)}'
+        )
+
+
+@scheduler_fn.on_schedule(schedule='every day 03:00', timezone='Asia/Taipei')
+def compact_template_usage_counters(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Compact every template's usage shards into its usage_count.
+    """
+    db = get_db()
+    templates = db.collection('templates').select([FieldPath.document_id()]).stream()
+
+    compacted = 0
+    for snapshot in templates:
+        try:
+            compacted += compact_template_usage(db, snapshot.id)
+        except Exception as e:
+            print(f"Error compacting usage of template {snapshot.id}: {e}")
+
+    print(f"Compacted {compacted} template use(s)")
@@ -0,0 +1,190 @@
+"""
+Activity Log Partitions and Rollups
+
+Activity entries are partitioned by month, so feeds and audit queries only
+scan the months they ask for:
+
+    activity_log/{YYYY-MM}/entries/{entry_id}
+        action, user_id, user_name, resource_type, resource_id,
+        resource_name, details, timestamp
+        project_id: project the action concerns (if any)
+        day: YYYY-MM-DD (Taiwan time)
+        expire_at: when the Firestore TTL policy deletes the entry
+
+Raw entries expire after RETENTION. Before that, an hourly job rolls each
+day up into per-user and per-project counts, which dashboards read instead
+of the raw entries:
+
+    activity_rollups/{day}_{scope}_{subject_id}
+        day, scope: 'user' | 'project', subject_id
+        total: number of activities
+        actions: {action: count}
+
+Rollups are recomputed from the day's entries, so re-running a day is
+harmless.
+"""
+
+from firebase_functions import scheduler_fn
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from .clients import get_db
+
+
+ACTIVITY_LOG_COLLECTION = 'activity_log'
+ENTRIES_SUBCOLLECTION = 'entries'
+ROLLUPS_COLLECTION = 'activity_rollups'
+
+# Days and months follow Taiwan time (UTC+8, no daylight saving)
+ACTIVITY_TIMEZONE = timezone(timedelta(hours=8))
+
+# How long raw entries are kept before the TTL policy deletes them
+RETENTION = timedelta(days=90)
+
+# Entries read per page when rolling up a day
+ROLLUP_PAGE_SIZE = 1000
+
+# Firestore batch write limit
+MAX_BATCH_WRITES = 500
+
+
+def partition_id(moment: datetime) -> str:
+    """Return the month partition (YYYY-MM) for a moment."""
+    return moment.astimezone(ACTIVITY_TIMEZONE).strftime('%Y-%m')
+
+
+def day_id(moment: datetime) -> str:
+    """Return the day (YYYY-MM-DD) for a moment."""
+    return moment.astimezone(ACTIVITY_TIMEZONE).strftime('%Y-%m-%d')
+
+
+def entries_collection(db, partition: str):
+    """Return the entries collection of a month partition."""
+    return (
+        db.collection(ACTIVITY_LOG_COLLECTION)
+        .document(partition)
+        .collection(ENTRIES_SUBCOLLECTION)
+    )
+
+
+def new_entry(db, moment: Optional[datetime] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Allocate an activity entry in the partition for a moment.
+
+    Args:
+        db: Firestore client
+        moment: Time of the activity (default now)
+
+    Returns:
+        (entry reference, partitioning fields to store on the entry)
+    """
+    moment = moment or datetime.now(timezone.utc)
+
+    ref = entries_collection(db, partition_id(moment)).document()
+    return ref, {
+        'day': day_id(moment),
+        'expire_at': moment + RETENTION
+    }
+
+
+def rollup_id(day: str, scope: str, subject_id: str) -> str:
+    """Return the activity_rollups ID for a day, scope and subject."""
+    return f"{day}_{scope}_{subject_id}"
+
+
+def compute_rollups(day: str, entries: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Count one day's activities per user and per project.
+
+    Args:
+        day: Day being rolled up (YYYY-MM-DD)
+        entries: The day's activity entries
+
+    Returns:
+        dict of rollup ID -> rollup data
+    """
+    rollups = {}
+
+    for entry in entries:
+        action = entry.get('action') or entry.get('type') or 'unknown'
+
+        subjects = [('user', entry.get('user_id')), ('project', entry.get('project_id'))]
+        for scope, subject_id in subjects:
+            if not subject_id:
+                continue
+
+            key = rollup_id(day, scope, subject_id)
+            rollup = rollups.setdefault(key, {
+                'day': day,
+                'scope': scope,
+                'subject_id': subject_id,
+                'total': 0,
+                'actions': {}
+            })
+            rollup['total'] += 1
+            rollup['actions'][action] = rollup['actions'].get(action, 0) + 1
+
+    return rollups
+
+
+def rollup_day(db, day: str) -> int:
+    """
+    Recompute the rollups of one day from its raw entries.
+
+    Args:
+        db: Firestore client
+        day: Day to roll up (YYYY-MM-DD)
+
+    Returns:
+        Number of rollup documents written
+    """
+    base_query = (
+        entries_collection(db, day[:7])
+        .where('day', '==', day)
+        .select(['action', 'type', 'user_id', 'project_id'])
+        .order_by(FieldPath.document_id())
+        .limit(ROLLUP_PAGE_SIZE)
+    )
+
+    entries = []
+    cursor = None
+
+    while True:
+        query = base_query
+        if cursor:
+            query = query.start_after({FieldPath.document_id(): cursor})
+
+        page = list(query.stream())
+        entries.extend(snapshot.to_dict() for snapshot in page)
+
+        if len(page) < ROLLUP_PAGE_SIZE:
+            break
+        cursor = page[-1].id
+
+    rollups = list(compute_rollups(day, entries).items())
+
+    for start in range(0, len(rollups), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for key, rollup in rollups[start:start + MAX_BATCH_WRITES]:
+            batch.set(db.collection(ROLLUPS_COLLECTION).document(key), {
+                **rollup,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+        batch.commit()
+
+    return len(rollups)
+
+
+@scheduler_fn.on_schedule(schedule='every 1 hours', timezone='Asia/Taipei')
+def rollup_activities(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Refresh today's activity rollups and finalize yesterday's.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+
+    for day in (day_id(now - timedelta(days=1)), day_id(now)):
+        count = rollup_day(db, day)
+        print(f"Activity rollups for {day}: {count} document(s)")
@@ -0,0 +1,315 @@
+"""
+Firebase Clients
+
+Initializes Firebase Admin once per process and hands out warm, shared
+Firestore and Storage clients, so handlers, batch workers and scripts
+reuse connections instead of creating clients per request.
+
+- Firestore talks gRPC: one HTTP/2 channel multiplexes concurrent calls,
+  so a single shared client serves all worker threads.
+- Storage talks HTTP/1.1: its session keeps a keep-alive connection pool
+  sized for our batch paths (re-render and template revision workers),
+  instead of the requests default of 10 connections.
+
+Every Storage HTTP request is counted by the session's adapter. The
+Firestore client offers no public hook below its API, so get_db() returns
+the client behind a thin wrapper that counts calls to the methods that
+make a round trip (reads, queries, writes, batch and transaction commits).
+Wrap a handler with @count_round_trips (or use track_round_trips()) to see
+how many round trips one request made; process-wide totals are in
+round_trip_totals().
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+import firebase_admin
+from firebase_admin import firestore, storage
+from google.auth.credentials import with_scopes_if_required
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import storage as cloud_storage
+from requests.adapters import HTTPAdapter
+
+
+# Storage HTTP connection pool, sized for the batch workers' concurrency
+STORAGE_POOL_CONNECTIONS = 4
+STORAGE_POOL_SIZE = 16
+
+SERVICES = ('firestore', 'storage')
+
+# Firestore methods that make a round trip, by class. Transactions are
+# begun and committed by @firestore.transactional through _begin/_commit.
+FIRESTORE_ROUND_TRIP_METHODS = {
+    'Client': {'get_all', 'collections'},
+    'DocumentReference': {'get', 'set', 'create', 'update', 'delete', 'collections'},
+    'CollectionReference': {'get', 'stream', 'add', 'list_documents'},
+    'Query': {'get', 'stream'},
+    'CollectionGroup': {'get', 'stream'},
+    'AggregationQuery': {'get', 'stream'},
+    'WriteBatch': {'commit'},
+    'Transaction': {'get', 'get_all', '_begin', '_commit', '_rollback'},
+}
+
+# Further Firestore classes wrapped so the objects they hand out are counted
+_FIRESTORE_WRAPPED_CLASSES = set(FIRESTORE_ROUND_TRIP_METHODS) | {'DocumentSnapshot', 'BulkWriter'}
+
+_lock = threading.Lock()
+_db = None
+_bucket = None
+
+_request_round_trips: contextvars.ContextVar[Optional[Dict[str, int]]] = (
+    contextvars.ContextVar('round_trips', default=None)
+)
+_total_round_trips = {service: 0 for service in SERVICES}
+
+
+def record_round_trip(service: str) -> None:
+    """Count one round trip for the current request and the process."""
+    counts = _request_round_trips.get()
+    if counts is not None:
+        counts[service] += 1
+
+    with _lock:
+        _total_round_trips[service] += 1
+
+
+def round_trip_totals() -> Dict[str, int]:
+    """Return round trips made by this process since it started."""
+    with _lock:
+        return dict(_total_round_trips)
+
+
+@contextmanager
+def track_round_trips():
+    """
+    Count round trips made inside the block.
+
+    Example:
+        with track_round_trips() as counts:
+            ...
+        print(counts['firestore'], counts['storage'])
+    """
+    counts = {service: 0 for service in SERVICES}
+    token = _request_round_trips.set(counts)
+    try:
+        yield counts
+    finally:
+        _request_round_trips.reset(token)
+
+
+def count_round_trips(func):
+    """Decorator: log the Firestore / Storage round trips a handler made."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track_round_trips() as counts:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                print(f"[round-trips] {func.__name__}: "
+                      f"firestore={counts['firestore']} storage={counts['storage']}")
+
+    return wrapper
+
+
+def _unwrap(value):
+    """Replace counting wrappers with the Firestore objects they wrap."""
+    if isinstance(value, CountingFirestore):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _unwrap(item) for key, item in value.items()}
+    return value
+
+
+def _wrap(value):
+    """Wrap Firestore objects (and iterables of them) for counting."""
+    if isinstance(value, types.GeneratorType):
+        return (_wrap(item) for item in value)
+    if isinstance(value, list):
+        return [_wrap(item) for item in value]
+    if (type(value).__name__ in _FIRESTORE_WRAPPED_CLASSES
+            and type(value).__module__.startswith('google.cloud.firestore')):
+        return CountingFirestore(value)
+    return value
+
+
+class CountingFirestore:
+    """
+    Wrapper around a Firestore client (or an object it returned) counting
+    round trips.
+
+    Attribute access and calls are passed through; Firestore objects in the
+    results are wrapped in turn, and wrappers passed as arguments are
+    unwrapped, so the library only ever sees its own objects.
+    """
+
+    __slots__ = ('_target', '_round_trip_methods')
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(
+            self, '_round_trip_methods',
+            FIRESTORE_ROUND_TRIP_METHODS.get(type(target).__name__, ())
+        )
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return _wrap(value)
+
+        counted = name in self._round_trip_methods
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            if counted:
+                record_round_trip('firestore')
+            return _wrap(value(*_unwrap(args), **_unwrap(kwargs)))
+
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f'CountingFirestore({self._target!r})'
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    """Pooled HTTP adapter counting every Storage request."""
+
+    def send(self, request, **kwargs):
+        record_round_trip('storage')
+        return super().send(request, **kwargs)
+
+
+def get_app() -> firebase_admin.App:
+    """
+    Get the default Firebase app, initializing it on first use.
+
+    Returns:
+        The default firebase_admin App
+    """
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        with _lock:
+            try:
+                return firebase_admin.get_app()
+            except ValueError:
+                return firebase_admin.initialize_app()
+
+
+def _create_db(app: firebase_admin.App):
+    """Create the shared, round-trip counting Firestore client for an app."""
+    return CountingFirestore(firestore.client(app))
+
+
+def _create_bucket(app: firebase_admin.App):
+    """Create the shared default bucket with a pooled HTTP session."""
+    bucket_name = app.options.get('storageBucket')
+
+    # The emulator and unset buckets are handled by firebase_admin itself
+    if os.environ.get('STORAGE_EMULATOR_HOST') or os.environ.get('FIREBASE_STORAGE_EMULATOR_HOST') \
+            or not bucket_name:
+        return storage.bucket(app=app)
+
+    credentials = with_scopes_if_required(
+        app.credential.get_credential(), cloud_storage.Client.SCOPE
+    )
+
+    session = AuthorizedSession(credentials)
+    adapter = _CountingHTTPAdapter(
+        pool_connections=STORAGE_POOL_CONNECTIONS,
+        pool_maxsize=STORAGE_POOL_SIZE
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    client = cloud_storage.Client(
+        project=app.project_id,
+        credentials=credentials,
+        _http=session
+    )
+    return client.bucket(bucket_name)
+
+
+def get_db():
+    """
+    Get the shared Firestore client.
+
+    Returns:
+        google.cloud.firestore.Client, wrapped in CountingFirestore
+    """
+    global _db
+
+    if _db is None:
+        app = get_app()
+        with _lock:
+            if _db is None:
+                _db = _create_db(app)
+
+    return _db
+
+
+def get_bucket():
+    """
+    Get the shared default Storage bucket.
+
+    Returns:
+        google.cloud.storage.Bucket
+    """
+    global _bucket
+
+    if _bucket is None:
+        app = get_app()
+        with _lock:
+            if _bucket is None:
+                _bucket = _create_bucket(app)
+
+    return _bucket
+
+
+def check_health() -> Dict[str, Any]:
+    """
+    Check that the shared clients can reach Firestore and Storage.
+
+    Each check is one round trip: a read of a (normally missing) Firestore
+    document and a metadata lookup of a (normally missing) Storage object.
+    Errors are logged, not returned.
+
+    Returns:
+        dict with ok, and ok / latency_ms per service
+    """
+    checks = {
+        'firestore': lambda: get_db().collection('_health').document('ping').get(),
+        'storage': lambda: get_bucket().get_blob('_health/ping'),
+    }
+
+    result = {'ok': True}
+
+    for service, check in checks.items():
+        start = time.perf_counter()
+        try:
+            check()
+            result[service] = {'ok': True}
+        except Exception as e:
+            print(f"Health check: {service} unreachable: {e}")
+            result[service] = {'ok': False}
+            result['ok'] = False
+        result[service]['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    return result
@@ -0,0 +1,145 @@
+"""
+Cold-Start Instrumentation
+
+Measures how long each Cloud Function takes to import and checks it against
+a per-function budget.
+
+- At runtime, src.main imports each function's module through timed_import();
+  set AUTODOCGEN_IMPORT_TIMING=1 to log the import time and any heavy
+  document libraries it pulled in.
+- `python -m src.utils.cold_start` (run from functions/) imports every
+  function in a fresh interpreter, the way a cold instance does, and
+  reports the time against COLD_START_BUDGET_MS. Exits with status 1 if a
+  function is over budget.
+"""
+
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+
+IMPORT_TIMING_ENV = 'AUTODOCGEN_IMPORT_TIMING'
+
+# Libraries only document rendering / analysis should pay for
+HEAVY_MODULES = ('docx', 'PyPDF2', 'reportlab')
+
+# Import-time budget per function (ms, fresh interpreter, including the
+# Firebase Admin / Firestore SDK imports every function shares, which cost
+# roughly 500-600 ms on their own)
+DEFAULT_BUDGET_MS = 900
+
+# Functions whose modules pull in more of the package get a little more
+COLD_START_BUDGET_MS = {
+    'process_rerender_job': 1000,
+    'on_company_updated': 1000,
+    'on_contact_updated': 1000,
+    'process_generation_jobs': 1000,
+    'resume_generation_jobs': 1000,
+    'start_template_revision': 1000,
+    'process_template_revision': 1000,
+    'on_template_updated': 1000,
+    'resume_stalled_template_revisions': 1000,
+}
+
+FUNCTIONS_DIR = Path(__file__).resolve().parents[2]
+
+
+def loaded_heavy_modules() -> List[str]:
+    """Return the heavy document libraries already imported in this process."""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def timed_import(function_name: str, module_name: str, package: str):
+    """
+    Import a function's module, logging the cost when instrumentation is on.
+
+    Args:
+        function_name: Cloud Function being loaded
+        module_name: Module to import (may be relative)
+        package: Package for relative imports
+
+    Returns:
+        The imported module
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(module_name, package)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if os.environ.get(IMPORT_TIMING_ENV):
+        heavy = ', '.join(loaded_heavy_modules()) or 'none'
+        print(f"[cold-start] {function_name}: imported {module_name} in "
+              f"{elapsed_ms:.0f} ms (heavy modules: {heavy})")
+
+    return module
+
+
+_MEASURE_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import src.main
+getattr(src.main, sys.argv[1])
+elapsed_ms = (time.perf_counter() - start) * 1000
+from src.utils.cold_start import loaded_heavy_modules
+print(json.dumps({"import_ms": elapsed_ms, "heavy_modules": loaded_heavy_modules()}))
+'''
+
+
+def measure_function(function_name: str) -> Dict[str, Any]:
+    """
+    Import one function in a fresh interpreter and measure it.
+
+    Args:
+        function_name: Cloud Function name
+
+    Returns:
+        dict with import_ms, heavy_modules, budget_ms and within_budget
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', _MEASURE_SCRIPT, function_name],
+        cwd=FUNCTIONS_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+
+    result = json.loads(output.strip().splitlines()[-1])
+    budget = COLD_START_BUDGET_MS.get(function_name, DEFAULT_BUDGET_MS)
+    result['budget_ms'] = budget
+    result['within_budget'] = result['import_ms'] <= budget
+
+    return result
+
+
+def main() -> int:
+    """Measure every function and report against its budget."""
+    from ..main import FUNCTION_MODULES
+
+    print(f"{'function':<36} {'import ms':>10} {'budget':>8}  heavy modules")
+    print("-" * 76)
+
+    over_budget = []
+    for function_name in FUNCTION_MODULES:
+        result = measure_function(function_name)
+        status = "" if result['within_budget'] else "  OVER BUDGET"
+        heavy = ', '.join(result['heavy_modules']) or '-'
+        print(f"{function_name:<36} {result['import_ms']:>10.0f} "
+              f"{result['budget_ms']:>8}  {heavy}{status}")
+
+        if not result['within_budget']:
+            over_budget.append(function_name)
+
+    if over_budget:
+        print(f"\n✗ Over budget: {', '.join(over_budget)}")
+        return 1
+
+    print("\n✓ All functions within their cold-start budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
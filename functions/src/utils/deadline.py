@@ -0,0 +1,72 @@
+"""
+Time Budget
+
+Tracks how much of a function's time budget is left, so a handler can stop
+starting new work while there is still time to commit what has finished.
+"""
+
+import time
+from typing import Optional
+
+
+class TimeBudget:
+    """
+    Remaining-time tracker for a unit of work repeated within a deadline.
+
+    The next unit may start only if the time left, minus a reserve kept for
+    committing results, covers the longest unit seen so far (or an initial
+    estimate before any unit has finished) times a safety factor.
+
+    Example:
+        budget = TimeBudget(60, reserve_sec=10, initial_estimate_sec=5)
+        for item in items:
+            if not budget.can_start():
+                break
+            with budget.measure():
+                process(item)
+    """
+
+    def __init__(self, total_sec: float, reserve_sec: float = 0,
+                 initial_estimate_sec: float = 0, safety_factor: float = 1.5,
+                 start: Optional[float] = None):
+        """
+        Args:
+            total_sec: Total time budget
+            reserve_sec: Time kept back for committing results
+            initial_estimate_sec: Expected duration of one unit
+            safety_factor: Multiplier applied to the expected unit duration
+            start: time.monotonic() value the budget started at (default now)
+        """
+        self.deadline = (time.monotonic() if start is None else start) + total_sec
+        self.reserve_sec = reserve_sec
+        self.safety_factor = safety_factor
+        self.longest_sec = initial_estimate_sec
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline."""
+        return self.deadline - time.monotonic()
+
+    def can_start(self) -> bool:
+        """Whether another unit is expected to finish before the reserve."""
+        return self.remaining() - self.reserve_sec >= self.longest_sec * self.safety_factor
+
+    def record(self, duration_sec: float) -> None:
+        """Record the duration of a finished unit."""
+        self.longest_sec = max(self.longest_sec, duration_sec)
+
+    def measure(self):
+        """Context manager recording the duration of the enclosed unit."""
+        return _Measure(self)
+
+
+class _Measure:
+    def __init__(self, budget: TimeBudget):
+        self.budget = budget
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.budget.record(time.monotonic() - self.start)
+        return False
@@ -172,7 +172,7 @@ def is_valid_document_number(document_number: str) -> bool:
     return bool(re.match(pattern, document_number))
 
 
-async def get_next_counter_for_date(firestore_client, date: datetime) -> int:
+def get_next_counter_for_date(firestore_client, date: datetime) -> int:
     """
     Get the next available counter for a specific date
 
@@ -0,0 +1,38 @@
+"""
+Health Check Function
+
+Reports whether this instance's shared Firestore and Storage clients can
+reach their services, with per-service latency. Only administrators (the
+`admin` custom claim) may call it; failures are logged, not returned.
+"""
+
+from firebase_functions import https_fn
+
+from .clients import check_health, round_trip_totals
+
+
+@https_fn.on_call()
+def health_check(req: https_fn.CallableRequest) -> dict:
+    """
+    Check Firestore and Storage connectivity.
+
+    Returns:
+        dict with ok, and ok / latency_ms per service
+    """
+
+    if not req.auth:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.UNAUTHENTICATED,
+            message='Authentication required'
+        )
+
+    if (req.auth.token or {}).get('admin') is not True:
+        raise https_fn.HttpsError(
+            code=https_fn.FunctionsErrorCode.PERMISSION_DENIED,
+            message='Administrator access required'
+        )
+
+    result = check_health()
+    print(f"[health] ok={result['ok']} round-trips={round_trip_totals()}")
+
+    return result
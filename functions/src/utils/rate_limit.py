@@ -0,0 +1,58 @@
+"""
+Rate Limiter
+
+Token-bucket rate limiter shared by worker threads, used to keep bulk jobs
+below Firestore and Storage write-rate limits.
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Example:
+        limiter = RateLimiter(rate=20)   # 20 operations per second
+        limiter.acquire()                # blocks until a token is available
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Maximum tokens held at once (defaults to one second's worth)
+        """
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}. Must be positive.")
+
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> None:
+        """
+        Take tokens from the bucket, sleeping until enough are available.
+
+        Args:
+            tokens: Number of tokens to take
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait)
@@ -0,0 +1,158 @@
+"""
+Streaming Row Readers
+
+Read records from JSON arrays, JSON Lines and CSV text streams one at a
+time, so imports of large files never hold the whole file in memory.
+
+Every reader yields (row_number, row) pairs:
+    JSON array: position in the array (1-based)
+    JSON Lines / CSV: line number in the file
+
+A JSON Lines record that cannot be parsed is yielded as a ValueError
+instead of a dict, so one bad line does not stop the import. A JSON array
+cannot be resynchronized after a syntax error, so that raises.
+
+The command line tool (main.py) reads its input files with these readers
+too, so they must only use the standard library.
+"""
+
+import csv
+import json
+from typing import Any, Dict, Iterator, TextIO, Tuple, Union
+
+
+FORMATS = ('json', 'jsonl', 'csv')
+
+# Characters read from the stream at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+Row = Union[Dict[str, Any], ValueError]
+
+
+def detect_format(name: str) -> str:
+    """Guess the input format from a file name (JSON by default)."""
+    lowered = name.lower()
+
+    if lowered.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if lowered.endswith('.csv'):
+        return 'csv'
+    return 'json'
+
+
+def iter_json_array(stream: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield the elements of a top-level JSON array without reading it whole.
+
+    Raises:
+        ValueError: If the input is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        """Append the next chunk, dropping what has been consumed."""
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError('Input is not a JSON array')
+    pos += 1
+
+    index = 0
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError('Unterminated JSON array')
+        if buffer[pos] == ']':
+            return
+
+        if index:
+            if buffer[pos] != ',':
+                raise ValueError(f'Expected "," after element {index}')
+            pos += 1
+            skip_whitespace()
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # The element may continue in the next chunk
+                if eof or not fill():
+                    raise ValueError(f'Invalid JSON in element {index + 1}: {e.msg}')
+                continue
+
+            # A value running up to the end of the buffer (e.g. a number)
+            # may continue in the next chunk
+            complete = end < len(buffer) and (buffer[end].isspace() or buffer[end] in ',]')
+            if not complete and not eof and fill():
+                continue
+            break
+
+        pos = end
+        index += 1
+        yield index, item
+
+
+def iter_json_lines(stream: TextIO) -> Iterator[Tuple[int, Row]]:
+    """Yield one record per non-blank line of a JSON Lines stream."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f'Invalid JSON: {e.msg}')
+
+
+def iter_csv_rows(stream: TextIO) -> Iterator[Tuple[int, Row]]:
+    """
+    Yield the rows of a CSV stream with a header line as dicts.
+
+    Header names and values are stripped; empty cells are left out.
+    """
+    reader = csv.DictReader(stream)
+
+    for row in reader:
+        record = {
+            key.strip(): value.strip()
+            for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()
+        }
+        if record:
+            yield reader.line_num, record
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Row]]:
+    """
+    Yield (row_number, row) pairs from a stream in one of FORMATS.
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt == 'json':
+        return iter_json_array(stream)
+    if fmt == 'jsonl':
+        return iter_json_lines(stream)
+    if fmt == 'csv':
+        return iter_csv_rows(stream)
+
+    raise ValueError(f'Unknown format: {fmt}. Must be one of: {", ".join(FORMATS)}')
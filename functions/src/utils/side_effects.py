@@ -0,0 +1,298 @@
+"""
+Deferred Side Effects
+
+Handlers collect their secondary writes (activity entries, cleanup of
+replaced Storage files) in a SideEffects buffer and flush it once after the
+primary write has committed. The whole buffer goes out as one batched
+write, so a caller pays one round trip for its side effects however many
+it has, and a blob deletion never runs before the write that replaces it.
+
+flush() is synchronous: it runs before the caller returns. Cloud Functions
+may throttle CPU once a response is sent, so nothing is written after it.
+Callable handlers therefore stage their side effects on a UnitOfWork
+(below), which commits them with the primary write at no extra round trip;
+flush() is for background workers and for handlers whose primary work is
+not a single commit.
+
+Cleanup work itself is not done in the request: the buffer only records it
+in the `cleanup_tasks` collection, and a trigger carries it out after the
+response. Failed tasks are retried with exponential backoff by a scheduled
+sweep, which also picks up tasks whose trigger never ran.
+
+    cleanup_tasks/{task_id}
+        type: 'delete_blob'
+        path: Storage path
+        status: 'pending' | 'retry' | 'done' | 'failed'
+        attempts, last_error, next_attempt_at
+
+UnitOfWork extends the buffer with a request's primary writes (document
+sets/updates and counter increments) and commits everything in one
+atomic batch, so the main mutation and its audit entry land together.
+"""
+
+from firebase_functions import firestore_fn, scheduler_fn
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from .activity_log import new_entry
+from .clients import get_db, get_bucket
+
+
+CLEANUP_COLLECTION = 'cleanup_tasks'
+
+# Firestore batch write limit
+MAX_BATCH_WRITES = 500
+
+# Cleanup retries: attempts before giving up, and the first retry delay
+MAX_CLEANUP_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(minutes=1)
+
+# Pending tasks not picked up by their trigger within this time are swept
+TRIGGER_GRACE = timedelta(minutes=10)
+
+
+class SideEffects:
+    """Secondary writes of one request, committed together by flush()."""
+
+    def __init__(self, db):
+        self.db = db
+        # (operation, document reference, data); operation is 'set',
+        # 'merge' (set with merge=True) or 'update'
+        self._writes: List[Tuple[str, Any, Dict[str, Any]]] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def log_activity(
+        self,
+        action: str,
+        user_id: str,
+        user_name: str,
+        resource_type: str,
+        resource_id: str,
+        resource_name: str,
+        details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Buffer an activity entry in the current month's partition."""
+        ref, partition_fields = new_entry(self.db)
+
+        if resource_type == 'project':
+            project_id = resource_id
+        else:
+            project_id = (details or {}).get('project_id')
+
+        entry = {
+            **partition_fields,
+            'project_id': project_id,
+            'action': action,
+            'user_id': user_id,
+            'user_name': user_name,
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            'resource_name': resource_name,
+            'timestamp': firestore.SERVER_TIMESTAMP
+        }
+        if details is not None:
+            entry['details'] = details
+
+        self._writes.append(('set', ref, entry))
+
+    def delete_blob(self, path: str, reason: str = '') -> None:
+        """Queue deletion of a Storage file that is no longer referenced."""
+        if not path:
+            return
+
+        self._writes.append(('set', self.db.collection(CLEANUP_COLLECTION).document(), {
+            'type': 'delete_blob',
+            'path': path,
+            'reason': reason,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': datetime.now(timezone.utc) + TRIGGER_GRACE,
+            'created_at': firestore.SERVER_TIMESTAMP
+        }))
+
+    def flush(self) -> int:
+        """
+        Commit the buffered writes in as few batches as possible.
+
+        Runs synchronously, one round trip per batch. Side effects never
+        fail the request that produced them: errors are logged and the
+        buffer is cleared either way.
+
+        Returns:
+            Number of writes committed
+        """
+        writes, self._writes = self._writes, []
+        committed = 0
+
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            chunk = writes[start:start + MAX_BATCH_WRITES]
+            batch = self._batch(chunk)
+
+            try:
+                batch.commit()
+                committed += len(chunk)
+            except Exception as e:
+                print(f"Warning: Could not write {len(chunk)} side effect(s): {e}")
+
+        return committed
+
+    def _batch(self, writes):
+        """Build a write batch from buffered writes."""
+        batch = self.db.batch()
+        self._apply(batch, writes)
+        return batch
+
+    @staticmethod
+    def _apply(batch, writes) -> None:
+        """Stage buffered writes on a batch or transaction."""
+        for operation, ref, data in writes:
+            if operation == 'update':
+                batch.update(ref, data)
+            else:
+                batch.set(ref, data, merge=(operation == 'merge'))
+
+
+class UnitOfWork(SideEffects):
+    """
+    All writes of one request, committed atomically by commit().
+
+    Example:
+        uow = UnitOfWork(db)
+        uow.update(project_ref, {'status': 'completed'})
+        uow.log_activity(...)
+        uow.commit()
+    """
+
+    def set(self, ref, data: Dict[str, Any], merge: bool = False) -> None:
+        """Stage a document set."""
+        self._writes.append(('merge' if merge else 'set', ref, data))
+
+    def update(self, ref, data: Dict[str, Any]) -> None:
+        """Stage a document update (the document must exist)."""
+        self._writes.append(('update', ref, data))
+
+    def increment(self, ref, field: str, amount: int = 1) -> None:
+        """Stage a counter increment, creating the document if needed."""
+        self._writes.append(('merge', ref, {
+            field: firestore.Increment(amount),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }))
+
+    def commit(self, transaction=None) -> int:
+        """
+        Commit every staged write in a single batch.
+
+        Unlike flush(), failures propagate: either all writes land or none.
+
+        Args:
+            transaction: Firestore transaction to stage the writes on instead
+                (optional); they are then committed with the transaction
+
+        Returns:
+            Number of writes committed
+
+        Raises:
+            ValueError: If more writes are staged than one batch allows
+        """
+        writes, self._writes = self._writes, []
+
+        if len(writes) > MAX_BATCH_WRITES:
+            raise ValueError(
+                f'Unit of work has {len(writes)} writes; a batch allows {MAX_BATCH_WRITES}'
+            )
+
+        if transaction is not None:
+            self._apply(transaction, writes)
+        elif writes:
+            self._batch(writes).commit()
+
+        return len(writes)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt after `attempts` failures."""
+    return RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0))
+
+
+def run_cleanup_task(bucket, task_ref, task: Dict[str, Any]) -> str:
+    """
+    Carry out one cleanup task and record the outcome.
+
+    Args:
+        bucket: Storage bucket
+        task_ref: Task document reference
+        task: Task data
+
+    Returns:
+        New task status
+    """
+    if task.get('status') not in ('pending', 'retry'):
+        return task.get('status')
+
+    try:
+        if task.get('type') != 'delete_blob':
+            raise ValueError(f"Unknown cleanup task type: {task.get('type')}")
+
+        try:
+            bucket.blob(task['path']).delete()
+        except NotFound:
+            pass
+
+        task_ref.update({
+            'status': 'done',
+            'finished_at': firestore.SERVER_TIMESTAMP
+        })
+        return 'done'
+
+    except Exception as e:
+        attempts = task.get('attempts', 0) + 1
+        status = 'failed' if attempts >= MAX_CLEANUP_ATTEMPTS else 'retry'
+        print(f"Cleanup task {task_ref.id} attempt {attempts} failed: {e}")
+
+        task_ref.update({
+            'status': status,
+            'attempts': attempts,
+            'last_error': str(e),
+            'next_attempt_at': datetime.now(timezone.utc) + retry_delay(attempts)
+        })
+        return status
+
+
+@firestore_fn.on_document_created(document=f'{CLEANUP_COLLECTION}/{{taskId}}')
+def process_cleanup_task(event: firestore_fn.Event[firestore_fn.DocumentSnapshot]) -> None:
+    """
+    Run a newly queued cleanup task.
+    """
+    if event.data is None:
+        return
+
+    run_cleanup_task(get_bucket(), event.data.reference, event.data.to_dict())
+
+
+@scheduler_fn.on_schedule(schedule='every 10 minutes')
+def retry_cleanup_tasks(event: scheduler_fn.ScheduledEvent) -> None:
+    """
+    Retry failed cleanup tasks whose backoff has elapsed, and run pending
+    tasks their trigger missed.
+    """
+    db = get_db()
+    bucket = get_bucket()
+
+    query = (
+        db.collection(CLEANUP_COLLECTION)
+        .where('status', 'in', ['pending', 'retry'])
+        .where('next_attempt_at', '<=', datetime.now(timezone.utc))
+        .limit(MAX_BATCH_WRITES)
+    )
+
+    outcomes = {}
+    for snapshot in query.stream():
+        status = run_cleanup_task(bucket, snapshot.reference, snapshot.to_dict())
+        outcomes[status] = outcomes.get(status, 0) + 1
+
+    if outcomes:
+        print(f"Cleanup sweep: {outcomes}")
@@ -38,6 +38,12 @@ def test_imports():
         from src.utils.document_number import generate_document_number
         print("  ✓ document number module")
 
+        from src.documents.rerender import process_rerender_job, on_company_updated
+        print("  ✓ rerender module")
+
+        from src.templates.revision import process_template_revision
+        print("  ✓ template revision module")
+
         print("\n✓ All imports successful!")
         return True
 
@@ -154,6 +160,1134 @@ def test_placeholder_regex():
         return False
 
 
+def test_dependency_index():
+    """Test re-render dependency detection"""
+    print("\nTesting dependency index...")
+
+    try:
+        from src.documents.dependencies import (
+            CONTACT_FIELD_VARIABLES,
+            COMPANY_FIELD_VARIABLES,
+            changed_variables,
+            template_variable_names,
+        )
+
+        before = {'contact_name': '王小明', 'phone': '0912-000-000', 'email': 'a@b.c'}
+        after = {**before, 'phone': '0912-111-111'}
+        affected = changed_variables(CONTACT_FIELD_VARIABLES, before, after)
+        assert affected == {'contact_phone', 'contact_info'}, f"Got {affected}"
+
+        unchanged = changed_variables(COMPANY_FIELD_VARIABLES, {'address': 'A'}, {'address': 'A'})
+        assert unchanged == set(), f"Got {unchanged}"
+
+        names = template_variable_names({'variables': {'standard': ['price'], 'extra': ['note']}})
+        assert names == ['note', 'price'], f"Got {names}"
+
+        print("  ✓ Changed fields map to affected variables")
+
+        from src.documents.dependencies import stage_index_refs
+
+        class Snapshot:
+            def __init__(self, path):
+                self.reference = path
+
+        class Query:
+            def __init__(self, filters=()):
+                self.filters = filters
+
+            def where(self, *condition):
+                return Query(self.filters + (condition,))
+
+            def get(self, transaction=None):
+                assert self.filters == (('project_id', '==', 'P1'),) and transaction == 'txn'
+                return [Snapshot('document_index/P1_d1'), Snapshot('document_index/P1_d2')]
+
+        class Db:
+            def collection(self, name):
+                assert name == 'document_index'
+                return Query()
+
+        class Batch:
+            def __init__(self):
+                self.updates = {}
+
+            def update(self, ref, data):
+                self.updates[ref] = data
+
+        batch = Batch()
+        count = stage_index_refs(Db(), 'P1', {'company_ref': 'companies/C2'}, batch, 'txn')
+        assert count == 2 and sorted(batch.updates) == ['document_index/P1_d1', 'document_index/P1_d2']
+        assert batch.updates['document_index/P1_d1']['company_ref'] == 'companies/C2'
+        assert 'contact_ref' not in batch.updates['document_index/P1_d1']
+        print("  ✓ Project reference changes are written to its index entries")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_rerender_merge():
+    """Test that re-rendered entries merge into the current generated_docs"""
+    print("\nTesting re-render merge...")
+
+    try:
+        from src.documents.rerender import merge_rerendered_docs
+
+        d1 = {'id': 'd1', 'file_path': 'documents/P1/a_1.docx'}
+        d2 = {'id': 'd2', 'file_path': 'documents/P1/b_1.docx'}
+        rendered = {
+            'd1': (d1, {**d1, 'file_path': 'documents/P1/a_2.docx'}),
+            'd2': (d2, {**d2, 'file_path': 'documents/P1/b_2.docx'}),
+        }
+
+        # d2 was re-rendered by another worker; d3 was generated meanwhile
+        d2_other = {**d2, 'file_path': 'documents/P1/b_9.docx'}
+        d3 = {'id': 'd3', 'file_path': 'documents/P1/c_1.docx'}
+        merged, applied = merge_rerendered_docs([d1, d2_other, d3], rendered)
+
+        assert applied == ['d1'], f"Got {applied}"
+        assert [doc['file_path'] for doc in merged] == [
+            'documents/P1/a_2.docx', 'documents/P1/b_9.docx', 'documents/P1/c_1.docx'
+        ], merged
+        print("  ✓ Concurrent additions and re-renders are kept")
+
+        merged, applied = merge_rerendered_docs([d2], rendered)
+        assert applied == ['d2'] and merged == [rendered['d2'][1]]
+        print("  ✓ Removed documents are not resurrected")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_template_revision_access():
+    """Test who may start a template revision"""
+    print("\nTesting template revision access...")
+
+    try:
+        from types import SimpleNamespace
+        from src.templates.revision import can_revise
+
+        template = {'created_by': 'u1', 'shared_with': {'u2': 'member', 'u3': 'viewer'}}
+
+        def auth(uid, **claims):
+            return SimpleNamespace(uid=uid, token=claims)
+
+        assert can_revise(template, auth('u1'))
+        assert can_revise(template, auth('u2'))
+        assert not can_revise(template, auth('u3'))
+        assert not can_revise(template, auth('u4'))
+        print("  ✓ Owner and members allowed, viewers and others denied")
+
+        assert can_revise({}, auth('u4', admin=True))
+        assert not can_revise({}, auth('u4', admin='true'))
+        print("  ✓ Admin claim allowed on templates without an owner")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_rate_limiter():
+    """Test token-bucket rate limiting"""
+    print("\nTesting rate limiter...")
+
+    try:
+        import time
+        from src.utils.rate_limit import RateLimiter
+
+        limiter = RateLimiter(rate=100, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        elapsed = time.monotonic() - start
+
+        # First token is immediate, the next five wait ~10ms each
+        assert elapsed >= 0.04, f"Expected throttling, took {elapsed:.3f}s"
+
+        print(f"  ✓ 6 acquisitions at 100/s took {elapsed:.3f}s")
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_variable_snapshot():
+    """Test standard variable snapshot validity checks"""
+    print("\nTesting variable snapshot...")
+
+    try:
+        from src.projects.variables import prepare_standard_variables
+        from src.projects.snapshot import (
+            TIMESTAMP_VARIABLES,
+            is_snapshot_current,
+            refresh_project_snapshot,
+            snapshot_inputs_changed,
+        )
+
+        project = {'project_name': '測試', 'price': 10500, 'date': '2025-10-28'}
+        variables = prepare_standard_variables(
+            project, {'company_name': 'ACME'}, {'contact_name': '王小明'},
+            db_client=None, document_number='HIYES25JBB001'
+        )
+        assert variables['document_number'] == 'HIYES25JBB001'
+        assert variables['price_before_tax'] == '10,000.00'
+
+        snapshot = {k: v for k, v in variables.items() if k not in TIMESTAMP_VARIABLES}
+        stored = {**project, 'document_number': 'HIYES25JBB001', 'standard_variables': snapshot}
+        assert is_snapshot_current(stored)
+        assert not is_snapshot_current(project)
+
+        assert snapshot_inputs_changed(stored, {**stored, 'price': 21000})
+        assert not snapshot_inputs_changed(stored, {**stored, 'status': 'completed'})
+
+        print("  ✓ Snapshot completeness and invalidation detected")
+
+        class Party:
+            def __init__(self, data):
+                self.data = data
+
+            def get(self):
+                return self
+
+            def to_dict(self):
+                return self.data
+
+        class DB:
+            def document(self, path):
+                return Party({'company_name': 'ACME'} if path.startswith('companies/') else {'contact_name': '王小明'})
+
+        class ProjectRef:
+            updates = []
+
+            def update(self, data):
+                self.updates.append(data)
+
+        stored = {**stored, 'company_ref': 'companies/C1', 'contact_ref': 'contacts/K1'}
+        refresh_project_snapshot(DB(), ProjectRef(), stored)
+        assert ProjectRef.updates == [], ProjectRef.updates
+        refresh_project_snapshot(DB(), ProjectRef(), {**stored, 'price': 21000})
+        assert len(ProjectRef.updates) == 1
+        print("  ✓ Unchanged snapshots are not written back")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_lazy_imports():
+    """Test that functions do not import document libraries at cold start"""
+    print("\nTesting lazy imports...")
+
+    try:
+        from src.utils.cold_start import measure_function
+
+        for function_name in ['update_project_status', 'create_project', 'generate_documents']:
+            result = measure_function(function_name)
+            assert not result['heavy_modules'], \
+                f"{function_name} imported {result['heavy_modules']} at startup"
+            print(f"  ✓ {function_name}: {result['import_ms']:.0f} ms, no document libraries")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_round_trip_counters():
+    """Test per-request round trip counters"""
+    print("\nTesting round trip counters...")
+
+    try:
+        from src.utils.clients import (
+            record_round_trip, track_round_trips, count_round_trips, round_trip_totals
+        )
+
+        totals_before = round_trip_totals()
+
+        with track_round_trips() as outer:
+            record_round_trip('firestore')
+            with track_round_trips() as inner:
+                record_round_trip('storage')
+                record_round_trip('firestore')
+
+        assert outer == {'firestore': 1, 'storage': 0}, outer
+        assert inner == {'firestore': 1, 'storage': 1}, inner
+        print("  ✓ Nested requests are counted separately")
+
+        @count_round_trips
+        def handler():
+            record_round_trip('storage')
+            return 'ok'
+
+        assert handler() == 'ok'
+        assert handler.__name__ == 'handler'
+
+        totals = round_trip_totals()
+        assert totals['firestore'] - totals_before['firestore'] == 2
+        assert totals['storage'] - totals_before['storage'] == 2
+        print("  ✓ Process totals include every request")
+
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import firestore as cloud_firestore
+        from src.utils.clients import CountingFirestore
+
+        db = CountingFirestore(cloud_firestore.Client(project='demo', credentials=AnonymousCredentials()))
+        with track_round_trips() as counts:
+            ref = db.collection('projects').document('P1')
+            batch = db.batch()
+            batch.set(ref, {'status': 'draft'})
+        assert isinstance(ref, CountingFirestore) and ref.path == 'projects/P1'
+        assert ref == db.document('projects/P1')
+        assert counts['firestore'] == 0, counts
+        print("  ✓ Building references and batches makes no round trip")
+
+        class DocumentReference:
+            path = 'projects/P1'
+
+            def get(self, transaction=None):
+                return transaction
+
+            def update(self, data):
+                return data
+
+        wrapped = CountingFirestore(DocumentReference())
+        with track_round_trips() as counts:
+            assert wrapped.get(transaction=CountingFirestore('T')) == 'T'
+            wrapped.update({'status': 'completed'})
+            assert wrapped.path == 'projects/P1'
+        assert counts['firestore'] == 2, counts
+        print("  ✓ Firestore round trips counted through the client wrapper")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_generation_job_queue():
+    """Test generation job scheduling with the in-process queue"""
+    print("\nTesting generation job queue...")
+
+    try:
+        from src.documents.jobs import (
+            InMemoryJobQueue, new_generation_job, drain, LANE_INTERACTIVE, LANE_BULK
+        )
+
+        queue = InMemoryJobQueue()
+        bulk_ids = [
+            queue.enqueue(new_generation_job('alice', 'Alice', f'P{i}', ['T1', 'T2']))
+            for i in range(3)
+        ]
+        bob_bulk = queue.enqueue(new_generation_job('bob', 'Bob', 'P9', ['T1', 'T2']))
+        interactive = queue.enqueue(new_generation_job('carol', 'Carol', 'P5', ['T1']))
+
+        assert queue.get(interactive)['lane'] == LANE_INTERACTIVE
+        assert queue.get(bob_bulk)['lane'] == LANE_BULK
+
+        order = []
+
+        def handler(job_id, job_data, report):
+            order.append(job_id)
+            for template_id in job_data['template_ids']:
+                report(template_id, {'status': 'done', 'document_id': f'DOC-{template_id}'})
+
+        assert drain(queue, handler, max_workers=1) == 5
+
+        # Interactive first, then bob's job ahead of alice's second and third
+        assert order == [interactive, bulk_ids[0], bob_bulk, bulk_ids[1], bulk_ids[2]], order
+        print("  ✓ Interactive lane first, bulk shared fairly between users")
+
+        job = queue.get(bob_bulk)
+        assert job['status'] == 'completed'
+        assert job['completed'] == 2 and job['failed'] == 0
+        assert job['progress']['T2'] == {'status': 'done', 'document_id': 'DOC-T2'}
+        print("  ✓ Per-template progress recorded")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_generation_time_budget():
+    """Test the render time budget and continuation tokens"""
+    print("\nTesting generation time budget...")
+
+    try:
+        import time
+        from src.utils.deadline import TimeBudget
+        from src.documents.generate import encode_continuation, decode_continuation
+
+        budget = TimeBudget(1.0, reserve_sec=0.4, initial_estimate_sec=0.1)
+        assert budget.can_start()
+
+        with budget.measure():
+            time.sleep(0.3)
+        # ~0.7s left minus the 0.4s reserve is less than 1.5 x 0.3s
+        assert not budget.can_start()
+        print("  ✓ Stops starting work when the next unit would overrun")
+
+        token = encode_continuation('PRJ-1', ['T2', 'T3'])
+        assert decode_continuation(token) == {'project_id': 'PRJ-1', 'template_ids': ['T2', 'T3']}
+
+        import base64
+        import json
+        forged = [
+            base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+            for payload in [
+                {'v': 1, 'project_id': 'PRJ-1', 'template_ids': 'T2'},
+                {'v': 1, 'project_id': 'PRJ-1', 'template_ids': [{'id': 'T2'}]},
+                {'v': 1, 'project_id': ['PRJ-1'], 'template_ids': ['T2']},
+            ]
+        ]
+        for bad in ['not-a-token', encode_continuation('PRJ-1', []), 123, *forged]:
+            try:
+                decode_continuation(bad)
+                raise AssertionError(f"Accepted invalid token {bad!r}")
+            except ValueError:
+                pass
+        print("  ✓ Continuation tokens round-trip and reject bad input")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_cleanup_tasks():
+    """Test cleanup task retries"""
+    print("\nTesting cleanup tasks...")
+
+    try:
+        from datetime import timedelta
+        from src.utils.side_effects import run_cleanup_task, retry_delay, MAX_CLEANUP_ATTEMPTS
+
+        assert retry_delay(1) == timedelta(minutes=1)
+        assert retry_delay(3) == timedelta(minutes=4)
+
+        class TaskRef:
+            id = 'task-1'
+
+            def __init__(self):
+                self.updates = []
+
+            def update(self, data):
+                self.updates.append(data)
+
+        class Blob:
+            def __init__(self, fail):
+                self.fail = fail
+
+            def delete(self):
+                if self.fail:
+                    raise IOError('storage unavailable')
+
+        class Bucket:
+            def __init__(self, fail):
+                self.fail = fail
+
+            def blob(self, path):
+                return Blob(self.fail)
+
+        task = {'type': 'delete_blob', 'path': 'documents/P1/old.docx', 'status': 'pending', 'attempts': 0}
+
+        ref = TaskRef()
+        assert run_cleanup_task(Bucket(fail=True), ref, task) == 'retry'
+        assert ref.updates[-1]['attempts'] == 1
+
+        last = {**task, 'status': 'retry', 'attempts': MAX_CLEANUP_ATTEMPTS - 1}
+        assert run_cleanup_task(Bucket(fail=True), ref, last) == 'failed'
+        print("  ✓ Failures are retried, then given up")
+
+        assert run_cleanup_task(Bucket(fail=False), ref, task) == 'done'
+        assert run_cleanup_task(Bucket(fail=False), ref, {**task, 'status': 'done'}) == 'done'
+        print("  ✓ Successful and finished tasks are marked done")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_unit_of_work():
+    """Test that a unit of work commits all writes in one batch"""
+    print("\nTesting unit of work...")
+
+    try:
+        from datetime import datetime, timezone
+        from src.utils.side_effects import UnitOfWork, MAX_BATCH_WRITES
+        from src.utils.activity_log import partition_id
+
+        class Batch:
+            def __init__(self, db):
+                self.db = db
+                self.ops = []
+
+            def set(self, ref, data, merge=False):
+                self.ops.append(('merge' if merge else 'set', ref))
+
+            def update(self, ref, data):
+                self.ops.append(('update', ref))
+
+            def commit(self):
+                self.db.commits.append(self.ops)
+
+        class Ref(str):
+            def document(self, doc_id='auto'):
+                return Ref(f"{self}/{doc_id}")
+
+            def collection(self, name):
+                return Ref(f"{self}/{name}")
+
+        class DB:
+            def __init__(self):
+                self.commits = []
+
+            def batch(self):
+                return Batch(self)
+
+            def collection(self, name):
+                return Ref(name)
+
+        db = DB()
+        uow = UnitOfWork(db)
+        uow.update('projects/P1', {'status': 'completed'})
+        uow.increment('templates/T1', 'usage_count')
+        uow.log_activity('update_status', 'u1', 'User', 'project', 'P1', 'Project 1')
+        assert uow.commit() == 3
+
+        month = partition_id(datetime.now(timezone.utc))
+        assert db.commits == [[
+            ('update', 'projects/P1'),
+            ('merge', 'templates/T1'),
+            ('set', f'activity_log/{month}/entries/auto'),
+        ]], db.commits
+        print("  ✓ Project write, counter and activity share one commit")
+
+        for i in range(MAX_BATCH_WRITES + 1):
+            uow.set(f'projects/P{i}', {})
+        try:
+            uow.commit()
+            raise AssertionError('Oversized unit of work was committed')
+        except ValueError:
+            pass
+        assert len(db.commits) == 1
+        print("  ✓ Oversized units of work are rejected, not split")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_activity_rollups():
+    """Test activity partitioning and daily rollups"""
+    print("\nTesting activity rollups...")
+
+    try:
+        from datetime import datetime, timezone
+        from src.utils.activity_log import partition_id, day_id, compute_rollups, rollup_id
+
+        # 2024-01-31 17:30 UTC is already February 1st in Taiwan
+        moment = datetime(2024, 1, 31, 17, 30, tzinfo=timezone.utc)
+        assert partition_id(moment) == '2024-02'
+        assert day_id(moment) == '2024-02-01'
+        print("  ✓ Entries are partitioned by Taiwan month and day")
+
+        rollups = compute_rollups('2024-02-01', [
+            {'action': 'update_status', 'user_id': 'u1', 'project_id': 'P1'},
+            {'action': 'update_status', 'user_id': 'u1', 'project_id': 'P2'},
+            {'action': 'generate_documents', 'user_id': 'u2', 'project_id': 'P1'},
+            {'type': 'user_login', 'user_id': 'u2'},
+        ])
+
+        user1 = rollups[rollup_id('2024-02-01', 'user', 'u1')]
+        assert user1['total'] == 2 and user1['actions'] == {'update_status': 2}
+        project1 = rollups[rollup_id('2024-02-01', 'project', 'P1')]
+        assert project1['total'] == 2
+        assert project1['actions'] == {'update_status': 1, 'generate_documents': 1}
+        assert rollups[rollup_id('2024-02-01', 'user', 'u2')]['actions']['user_login'] == 1
+        assert len(rollups) == 4
+        print("  ✓ Per-user and per-project daily counts")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_template_usage_shards():
+    """Test that template usage increments are spread over shards"""
+    print("\nTesting template usage shards...")
+
+    try:
+        from src.templates.usage import stage_usage_increment, NUM_SHARDS
+
+        class Ref(str):
+            def document(self, doc_id='auto'):
+                return Ref(f"{self}/{doc_id}")
+
+            def collection(self, name):
+                return Ref(f"{self}/{name}")
+
+        class UnitOfWork:
+            def __init__(self):
+                self.db = self
+                self.increments = []
+
+            def collection(self, name):
+                return Ref(name)
+
+            def increment(self, ref, field, amount=1):
+                self.increments.append((ref, field, amount))
+
+        uow = UnitOfWork()
+        for _ in range(200):
+            stage_usage_increment(uow, 'T1', 2)
+
+        shards = {ref for ref, _, _ in uow.increments}
+        valid = {f'templates/T1/usage_shards/{i}' for i in range(NUM_SHARDS)}
+        assert shards <= valid, shards - valid
+        assert len(shards) > 1
+        assert sum(amount for _, _, amount in uow.increments) == 400
+        assert all(field == 'count' for _, field, _ in uow.increments)
+        print(f"  ✓ 200 increments spread over {len(shards)} shards, none lost")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_project_aggregates():
+    """Test materialized project aggregate deltas"""
+    print("\nTesting project aggregates...")
+
+    try:
+        from src.projects.aggregates import (
+            compute_project_stats, status_change_deltas, merge_deltas
+        )
+
+        projects = [
+            {'status': 'draft', 'price': 1000, 'date': '2024-05-01', 'company_ref': 'companies/C1'},
+            {'status': 'completed', 'price': '2500', 'date': '2024-05-20', 'company_ref': 'companies/C1'},
+            {'status': 'draft', 'price': None, 'date': '2024-06-02', 'company_ref': 'companies/C2'},
+        ]
+
+        stats = compute_project_stats(projects)
+        assert stats['all']['count'] == 3
+        assert stats['all']['revenue'] == 3500
+        assert stats['status_draft']['count'] == 2
+        assert stats['month_2024-05']['by_status']['completed'] == {'count': 1, 'revenue': 2500}
+        assert stats['company_C1']['revenue'] == 3500
+        print("  ✓ Counts and revenue per status, month and company")
+
+        deltas = status_change_deltas(projects[0], 'completed')
+        assert deltas['status_draft'] == {'status': 'draft', 'count': -1, 'revenue': -1000}
+        assert deltas['status_completed']['count'] == 1
+        assert deltas['all']['count'] == 0
+        assert deltas['all']['by_status']['draft']['count'] == -1
+
+        moved = merge_deltas(stats, deltas)
+        assert moved['status_draft']['count'] == 1
+        assert moved['all']['count'] == 3
+        assert moved['month_2024-05']['by_status']['draft'] == {'count': 0, 'revenue': 0}
+        assert moved['month_2024-05']['by_status']['completed'] == {'count': 2, 'revenue': 3500}
+        print("  ✓ Status change moves a project without changing totals")
+
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import firestore as cloud_firestore
+        from src.projects.aggregates import NUM_SHARDS, read_project_stats, stats_ref
+
+        client = cloud_firestore.Client(project='demo', credentials=AnonymousCredentials())
+        assert stats_ref(client, 'all', 3).path == 'project_stats/all/stats_shards/3'
+        assert stats_ref(client, 'month_2024-05').parent.id == 'stats_shards'
+        assert int(stats_ref(client, 'status_draft').id) in range(NUM_SHARDS)
+        assert stats_ref(client, 'company_C1').path == 'project_stats/company_C1'
+
+        class Snapshot:
+            def __init__(self, data):
+                self.exists = data is not None
+                self._data = data
+
+            def to_dict(self):
+                return dict(self._data)
+
+        stored = {
+            'project_stats/all': {'count': 3, 'revenue': 3500, 'by_status': {'draft': {'count': 2, 'revenue': 1000}}, 'updated_at': 'ts'},
+            'project_stats/all/stats_shards/0': {'count': 1, 'revenue': 500, 'by_status': {'draft': {'count': 1, 'revenue': 500}}},
+            'project_stats/all/stats_shards/7': {'count': -1, 'revenue': -1000, 'by_status': {'draft': {'count': -1, 'revenue': -1000}}},
+        }
+
+        class Db:
+            def collection(self, name):
+                return client.collection(name)
+
+            def get_all(self, refs):
+                return [Snapshot(stored.get(ref.path)) for ref in refs]
+
+        total = read_project_stats(Db(), 'all')
+        assert total == {'count': 3, 'revenue': 3000, 'by_status': {'draft': {'count': 2, 'revenue': 500}}}
+        assert read_project_stats(Db(), 'company_C9') == {}
+        print("  ✓ Hot stats are sharded and read back as document plus shards")
+
+        from src.projects.aggregates import project_deltas
+        from src.projects.update import validate_project_changes
+
+        changes = validate_project_changes({'price': '3000', 'date': '2024-06-10', 'status': 'completed'})
+        assert changes == {'price': 3000.0, 'date': '2024-06-10'}
+        for invalid in ({}, {'price': 'inf'}, {'price': 0}, {'company_ref': 'C1'}, {'project_name': ' '}):
+            try:
+                validate_project_changes(invalid)
+                raise AssertionError(f'{invalid} accepted')
+            except ValueError:
+                pass
+
+        edited = {**projects[0], **changes}
+        moved = merge_deltas(stats, project_deltas(projects[0], -1), project_deltas(edited))
+        assert moved['all']['count'] == 3
+        assert moved['all']['revenue'] == 5500
+        assert moved['month_2024-05']['count'] == 1
+        assert moved['month_2024-06']['by_status']['draft'] == {'count': 2, 'revenue': 3000}
+        assert moved['status_draft']['revenue'] == 3000
+        print("  ✓ Project edits move price and date between aggregates")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_status_history():
+    """Test that status changes are appended to the history subcollection"""
+    print("\nTesting status history...")
+
+    try:
+        from datetime import datetime, timezone
+        from src.projects.status_history import stage_status_change, _serialize_entry
+
+        class Ref(str):
+            def document(self, doc_id='auto'):
+                return Ref(f"{self}/{doc_id}")
+
+            def collection(self, name):
+                return Ref(f"{self}/{name}")
+
+        class UnitOfWork:
+            def __init__(self):
+                self.db = self
+                self.writes = []
+
+            def collection(self, name):
+                return Ref(name)
+
+            def set(self, ref, data, merge=False):
+                self.writes.append((ref, data, merge))
+
+        uow = UnitOfWork()
+        stage_status_change(uow, 'P1', 'completed', 'u1', previous_status='draft')
+
+        ref, entry, merge = uow.writes[0]
+        assert ref == 'projects/P1/status_history/auto'
+        assert not merge
+        assert entry['status'] == 'completed' and entry['previous_status'] == 'draft'
+        assert entry['updated_by'] == 'u1'
+        print("  ✓ Status change staged as a new history document")
+
+        class Snapshot:
+            id = 'E1'
+
+            def to_dict(self):
+                return {
+                    'status': 'completed',
+                    'previous_status': 'draft',
+                    'updated_by': 'u1',
+                    'timestamp': datetime(2024, 5, 1, tzinfo=timezone.utc)
+                }
+
+        serialized = _serialize_entry(Snapshot())
+        assert serialized['id'] == 'E1'
+        assert serialized['timestamp'] == '2024-05-01T00:00:00+00:00'
+        print("  ✓ History entries serialized with ISO timestamps")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_project_acl_cache():
+    """Test that project permission checks are served from the access cache"""
+    print("\nTesting project access cache...")
+
+    try:
+        from src.projects import acl
+
+        class Snapshot:
+            def __init__(self, data):
+                self.exists = data is not None
+                self._data = data
+                self.update_time = 1
+
+            def to_dict(self):
+                return dict(self._data)
+
+        class Doc:
+            def __init__(self, db, path):
+                self.db, self.path = db, path
+
+            def get(self, field_paths=None):
+                self.db.reads.append(self.path)
+                return Snapshot(self.db.docs.get(self.path))
+
+            def create(self, data):
+                self.db.docs[self.path] = data
+
+        class Collection:
+            def __init__(self, db, name):
+                self.db, self.name = db, name
+
+            def document(self, doc_id):
+                return Doc(self.db, f"{self.name}/{doc_id}")
+
+        class DB:
+            def __init__(self):
+                self.docs = {}
+                self.reads = []
+
+            def collection(self, name):
+                return Collection(self, name)
+
+        db = DB()
+        db.docs['projects/P1'] = {'created_by': 'u1', 'shared_with': {'u2': 'viewer'}}
+        acl._cache.clear()
+
+        assert acl.check_edit_access(db, 'P1', 'u1') is True
+        assert db.docs['project_acl/P1']['created_by'] == 'u1'
+        print("  ✓ Missing access record backfilled from the project")
+
+        db.reads.clear()
+        assert acl.check_edit_access(db, 'P1', 'u1') is True
+        assert db.reads == []
+        print("  ✓ Warm permission check needs no read")
+
+        assert acl.check_edit_access(db, 'P1', 'u2') is False
+        db.docs['project_acl/P1']['shared_with'] = {'u2': 'member'}
+        assert acl.check_edit_access(db, 'P1', 'u2') is True
+        print("  ✓ Denials rechecked, so new members are not blocked by the cache")
+
+        assert acl.check_edit_access(db, 'missing', 'u1') is None
+        acl._cache.clear()
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_bulk_status_update():
+    """Test bulk status classification and merged aggregate increments"""
+    print("\nTesting bulk status update...")
+
+    try:
+        from src.projects.bulk_status import classify_status_update
+        from src.projects.update_status import stage_status_update
+        from src.projects.aggregates import merge_deltas
+
+        assert classify_status_update(None, 'completed') == 'not_found'
+        assert classify_status_update({'status': 'draft'}, 'completed', 'pending_payment') == 'status_mismatch'
+        assert classify_status_update({'status': 'completed'}, 'completed') == 'unchanged'
+        assert classify_status_update({'status': 'pending_invoice'}, 'pending_payment', 'pending_invoice') == 'updated'
+        print("  ✓ Outcomes classified per project")
+
+        class Ref(str):
+            @property
+            def id(self):
+                return self.split('/')[-1]
+
+            def document(self, doc_id='auto'):
+                return Ref(f"{self}/{doc_id}")
+
+            def collection(self, name):
+                return Ref(f"{self}/{name}")
+
+        class UnitOfWork:
+            def __init__(self):
+                self.db = self
+                self.writes = []
+
+            def collection(self, name):
+                return Ref(name)
+
+            def set(self, ref, data, merge=False):
+                self.writes.append(('set', ref))
+
+            def update(self, ref, data):
+                self.writes.append(('update', ref))
+
+            def log_activity(self, **kwargs):
+                self.writes.append(('activity', kwargs['resource_id']))
+
+        uow = UnitOfWork()
+        stats = []
+        for i in range(3):
+            project = {'status': 'pending_invoice', 'price': 100, 'date': '2024-05-01'}
+            stage_status_update(
+                uow, Ref(f'projects/P{i}'), project, 'pending_payment', 'u1', 'User', stats=stats
+            )
+
+        assert len(uow.writes) == 9
+        assert not any(ref.startswith('project_stats') for _, ref in uow.writes)
+        merged = merge_deltas(*stats)
+        assert merged['status_pending_invoice']['count'] == -3
+        assert merged['status_pending_payment']['revenue'] == 300
+        assert merged['all']['count'] == 0
+        print("  ✓ Aggregate increments merged across the chunk")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_project_import():
+    """Test streaming project import parsing and name resolution"""
+    print("\nTesting project import...")
+
+    try:
+        import io
+        from src.projects.bulk_import import run_project_import, NameIndex
+        from src.utils.row_streams import iter_rows
+
+        index = NameIndex()
+        index.add_company('海宇國際股份有限公司', 'companies/C1')
+        index.add_contact('楊立豪', 'companies/C1', 'contacts/K1')
+        assert index.company(' 海宇國際股份有限公司 ') == 'companies/C1'
+        assert index.company('ＡＢＣ　Co') is None
+        index.add_company('ABC Co', 'companies/C2')
+        assert index.company('ＡＢＣ　co') == 'companies/C2'
+        print("  ✓ Names matched across full-width forms, spacing and case")
+
+        class Snapshot:
+            def __init__(self, path, data):
+                self.reference = type('Ref', (), {'path': path})()
+                self._data = data
+
+            def to_dict(self):
+                return self._data
+
+        class Query:
+            def __init__(self, docs):
+                self.docs = docs
+
+            def stream(self):
+                return iter(self.docs)
+
+        class Collection:
+            def __init__(self, name, docs):
+                self.name, self.docs = name, docs
+
+            def select(self, fields):
+                return Query(self.docs)
+
+            def document(self):
+                return type('Ref', (), {'path': f'{self.name}/new', 'id': 'new'})()
+
+        class DB:
+            data = {
+                'companies': [Snapshot('companies/C1', {'company_name': '海宇國際股份有限公司'})],
+                'contacts': [Snapshot('contacts/K1', {'contact_name': '楊立豪', 'company_ref': 'companies/C1'})],
+            }
+
+            def collection(self, name):
+                return Collection(name, self.data.get(name, []))
+
+        source = io.StringIO(
+            '[{"project_name": "佳群心天際", "company_name": "海宇國際股份有限公司", '
+            '"contacts": "楊立豪", "date": "2025-04-18", "price": 35000, "contact_date": "2025-04-10"},'
+            '{"project_name": "B", "company_name": "Unknown Ltd", "contacts": "X", "date": "2025-04-18", "price": 1},'
+            '{"project_name": "C", "company_name": "海宇國際股份有限公司", "contacts": "楊立豪", "date": "18/04/2025", "price": 1},'
+            '{"project_name": "D", "company_name": "海宇國際股份有限公司", "contacts": "楊立豪", "date": "2025-04-18", "price": 0}]'
+        )
+        report = run_project_import(DB(), iter_rows(source, 'json'), 'u1', dry_run=True)
+
+        assert report['rows'] == 4
+        assert report['imported'] == 1
+        assert [error['row'] for error in report['errors']] == [2, 3, 4]
+        assert 'Unknown company' in report['errors'][0]['error']
+        assert report['aborted'] is None
+        print("  ✓ Valid rows accepted, invalid rows reported with row numbers")
+
+        source = io.StringIO('project_name,company_name,contacts,date,price\nE,New Co,Amy,2025-05-01,"1,200"\n')
+        report = run_project_import(DB(), iter_rows(source, 'csv'), 'u1', create_missing=True, dry_run=True)
+        assert report['imported'] == 1 and report['created_companies'] == 1 and report['created_contacts'] == 1
+        print("  ✓ CSV rows imported, missing companies and contacts created on request")
+
+        report = run_project_import(DB(), iter_rows(io.StringIO('[{"project_name": 1}, {'), 'json'), 'u1', dry_run=True)
+        assert report['rows'] == 1 and report['aborted']
+        print("  ✓ Malformed file stops the import with a report")
+
+        source = io.StringIO('project_name,company_name,contacts,date,price\n'
+                             'F,海宇國際股份有限公司,楊立豪,2025-05-01,inf\n'
+                             'G,海宇國際股份有限公司,楊立豪,2025-05-01,nan\n')
+        report = run_project_import(DB(), iter_rows(source, 'csv'), 'u1', dry_run=True)
+        assert report['imported'] == 0 and [error['row'] for error in report['errors']] == [2, 3]
+        print("  ✓ Non-finite prices rejected")
+
+        from src.projects.bulk_import import parse_project_row
+        row = {'project_name': 'K', 'company_name': 'ABC Co', 'contacts': '', 'date': '2024-08-05', 'price': 10}
+        try:
+            parse_project_row(row)
+            raise AssertionError('row without contacts accepted')
+        except ValueError:
+            pass
+        assert parse_project_row(row, require_contact=False)['contact_name'] == ''
+        print("  ✓ Rows without contacts accepted only when allowed")
+
+        from types import SimpleNamespace
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import firestore as cloud_firestore
+        from src.projects.acl import ACL_COLLECTION
+
+        client = cloud_firestore.Client(project='demo', credentials=AnonymousCredentials())
+
+        class Writer:
+            """BulkWriter that fails the new company, the first access record and the second project"""
+
+            def __init__(self):
+                self.queued, self.written, self.projects = [], [], 0
+                self.acl_failed = False
+
+            def on_write_result(self, callback):
+                self.on_result = callback
+
+            def on_write_error(self, callback):
+                self.on_error = callback
+
+            def set(self, ref, data, merge=False):
+                self.queued.append((ref, data))
+
+            def fails(self, ref):
+                collection = ref.parent.id
+                if collection == 'projects':
+                    self.projects += 1
+                    return self.projects == 2
+                if collection == ACL_COLLECTION and not self.acl_failed:
+                    self.acl_failed = True
+                    return True
+                return collection == 'companies'
+
+            def flush(self):
+                for ref, data in self.queued:
+                    if not self.fails(ref):
+                        self.written.append((ref, data))
+                        self.on_result(ref, None, self)
+                        continue
+                    attempts = 1
+                    while self.on_error(SimpleNamespace(
+                            attempts=attempts, message='unavailable', operation=SimpleNamespace(reference=ref)), self):
+                        attempts += 1
+                self.queued = []
+
+            close = flush
+
+        class WriteCollection(Collection):
+            def document(self, *args):
+                return client.collection(self.name).document(*args)
+
+        class WriteDB(DB):
+            def __init__(self):
+                self.writer = Writer()
+
+            def collection(self, name):
+                return WriteCollection(name, self.data.get(name, []))
+
+            def bulk_writer(self):
+                return self.writer
+
+        db = WriteDB()
+        source = io.StringIO('project_name,company_name,contacts,date,price\n'
+                             'H,New Co,Amy,2025-05-01,100\n'
+                             'I,海宇國際股份有限公司,楊立豪,2025-05-01,200\n'
+                             'J,海宇國際股份有限公司,楊立豪,2025-05-01,300\n')
+        report = run_project_import(db, iter_rows(source, 'csv'), 'u1', create_missing=True)
+
+        assert report['imported'] == 2 and report['failed'] == 2
+        assert [error['row'] for error in report['errors']] == [2, 3]
+        assert report['errors'][0]['error'].startswith('Write failed for companies/')
+        assert report['errors'][1]['error'].startswith('Write failed for projects/')
+        stats_count = sum(
+            data['count'].value for ref, data in db.writer.written
+            if ref.path.startswith('project_stats/all/') and 'count' in data
+        )
+        assert stats_count == 2
+        print("  ✓ Failed company, access record and project writes reported once per row")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -165,6 +1299,24 @@ def main():
         test_document_number_generation,
         test_status_validation,
         test_placeholder_regex,
+        test_dependency_index,
+        test_rerender_merge,
+        test_template_revision_access,
+        test_rate_limiter,
+        test_variable_snapshot,
+        test_lazy_imports,
+        test_round_trip_counters,
+        test_generation_job_queue,
+        test_generation_time_budget,
+        test_cleanup_tasks,
+        test_unit_of_work,
+        test_activity_rollups,
+        test_template_usage_shards,
+        test_project_aggregates,
+        test_status_history,
+        test_project_acl_cache,
+        test_bulk_status_update,
+        test_project_import,
     ]
 
     results = []
@@ -1,10 +1,31 @@
-import json
+import argparse
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
 from datetime import datetime
-from docx import Document
 import os
 import shutil
 import sys
 
+# 輸入的串流讀取器與 Cloud Functions 的專案匯入共用同一份
+# （functions/src/utils/row_streams.py）
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'functions'))
+
+from cli.inputs import FORMATS, detect_format, find_input_file, input_files, read_projects
+from cli.ledger import NumberingLedger
+from cli.archive import ZipOutput
+from cli.manifest import RunManifest, sha256_bytes, sha256_file, sha256_json
+from cli.registry import Registry
+from cli.watch import FolderWatcher, file_signature, wait_until_settled
+from render_service.client import RenderClient
+
+# 每隔多少筆記錄打印一次進度
+PROGRESS_INTERVAL = 100
+
+# 並行模式下每個進程最多排隊的項目數
+JOBS_IN_FLIGHT = 4
+
 def generate_code(date, counter):
     year = date.strftime("%y")
     month = chr(64 + date.month)
@@ -16,57 +37,148 @@ def generate_code(date, counter):
     serial_number = f'{counter:03}'
     return f'HIYES{year}{month}{day}{serial_number}'
 
-def process_contact(contact_name):
-    if not contact_name:
-        return ""  # 如果 contact_name 為空，直接返回空字符串
+def prepare_project(project, registry, assign_code, today_str):
+    """驗證單一項目並以 assign_code(date_str, date) 分配編號，返回填入模板的資料；驗證失敗時返回 None"""
+    # 檢查必要字段
+    required_fields = ["project_name", "company_name", "price"]
+    missing_fields = [key for key in required_fields if key not in project]
+    if missing_fields:
+        print(f"錯誤: 項目缺少必要字段: {', '.join(missing_fields)}")
+        return None
     
-    contacts_file = 'config/contacts.json'
+    print(f"尋找公司: {project['company_name']}")
+    company_info = registry.company(project["company_name"])
+    if not company_info:
+        print(f"錯誤: 在 companies.json 中找不到匹配的公司: {project['company_name']}")
+        print(f"可用的公司: {registry.company_names()}")
+        return None
     
-    # 檢查聯繫人文件是否存在
-    if not os.path.exists(contacts_file):
-        print(f"錯誤: 找不到聯繫人文件 {contacts_file}")
-        return contact_name
-        
-    # 讀取聯繫人文件
-    try:
-        with open(contacts_file, 'r', encoding='utf-8') as file:
-            contacts = json.load(file)
-    except Exception as e:
-        print(f"錯誤: 無法讀取聯繫人文件: {e}")
-        return contact_name
+    print(f"找到公司信息: {company_info['companyName']}")
     
-    # 查找匹配的聯繫人
-    for contact in contacts:
-        if contact['name'] == contact_name:
-            return f"{contact['name']} TEL: {contact['phone']}"
+    # 檢查公司配置中的必要字段
+    company_required_fields = ["companyHead", "taxID", "address"]
+    company_missing_fields = [field for field in company_required_fields if field not in company_info]
+    if company_missing_fields:
+        print(f"錯誤: 公司 '{company_info['companyName']}' 缺少必要字段: {', '.join(company_missing_fields)}")
+        return None
     
-    # 如果沒有找到匹配的聯繫人，創建新的對象
-    new_contact = {"name": contact_name, "phone": ""}
-    contacts.append(new_contact)
+    date_str = project.get("date", today_str)
+    try:
+        date = datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError as e:
+        print(f"錯誤: 日期格式不正確: {date_str}, {str(e)}")
+        return None
     
-    # 將更新後的聯繫人列表寫回文件
+    # 使用 contact_date 如果存在，否則使用當前日期
     try:
-        with open(contacts_file, 'w', encoding='utf-8') as file:
-            json.dump(contacts, file, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"警告: 無法更新聯繫人文件: {e}")
+        now = datetime.strptime(project.get("contact_date", today_str), "%Y-%m-%d")
+        now_year = now.year - 1911
+        now_month = now.month
+        now_day = now.day
+    except ValueError as e:
+        print(f"錯誤: contact_date 格式不正確: {project.get('contact_date', today_str)}, {str(e)}")
+        return None
+
+    try:
+        price = float(project["price"])  # 確保 price 是數字
+        untaxed = round(price / 1.05)
+        taxes = round(price - untaxed)
+    except (TypeError, ValueError) as e:
+        print(f"錯誤: price 不是有效的數字: {project['price']}, {str(e)}")
+        return None
+
+    # 全部驗證通過後才分配編號，無效的記錄不佔用帳本中的編號
+    code = assign_code(date_str, date)
+
+    # 處理聯繫人信息
+    processed_contacts = registry.contact(project.get("contacts", ""))
     
-    return contact_name
+    return {
+        "project_name": project["project_name"],
+        "company_name": project["company_name"],
+        "contacts": processed_contacts,
+        "date": date_str,
+        "price": f'{price:,}',
+        "untaxed": f'{untaxed:,}',
+        "taxes": f'{taxes:,}',
+        "company_head": company_info["companyHead"],
+        "taxID": company_info["taxID"],
+        "company_address": company_info["address"],
+        "code": code,
+        "now_year": now_year,
+        "now_month": now_month,
+        "now_day": now_day,
+        "company_info": f'{project["company_name"]} {company_info["taxID"]}'
+    }
+
+def render_project(processed_data, template_paths, output_path, in_memory=False, render_url=None):
+    """
+    用每個模板生成一個項目的文檔，返回成功生成的文件列表；
+    in_memory 時不寫出文件，返回 [(文件名, 文檔內容 bytes)]
+    """
+    generated = []
+    print(f'開始生成文檔: {processed_data["project_name"]}')
+    for template_path in template_paths:
+        if 'template2' in template_path:
+            doc_type = '合約'
+        else:
+            doc_type = '報價單'
+        try:
+            if in_memory:
+                file_name = document_name(processed_data, doc_type)
+                generated.append((file_name, render_document_bytes(template_path, processed_data, render_url)))
+                print(f"成功生成文檔: {file_name}")
+            else:
+                output_file = generate_document(template_path, processed_data, output_path, doc_type, render_url)
+                print(f"成功生成文檔: {output_file}")
+                generated.append(output_file)
+        except Exception as e:
+            print(f"錯誤: 生成文檔時出錯: {template_path}, {str(e)}")
+    return generated
+
+def render_project_job(processed_data, template_paths, output_path, in_memory=False, render_url=None):
+    """在子進程中生成文檔，並收集輸出讓主進程按順序打印"""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        generated = render_project(processed_data, template_paths, output_path, in_memory, render_url)
+    return generated, buffer.getvalue()
+
+def code_assigner(manifest, ledger, index, project):
+    """返回項目的編號分配函數：輸入未變時沿用執行紀錄中的編號，否則由編號帳本分配並記錄"""
+    project_sha256 = sha256_json(project)
+
+    def assign_code(date_str, date):
+        code = manifest.recorded_code(index, project_sha256)
+        if code is None:
+            serial = ledger.next_serial(date_str)
+            code = generate_code(date, serial)
+            ledger.issue(code, date_str, serial, project.get("project_name"), project.get("company_name"),
+                         manifest.output_path)
+            manifest.record_code(index, project_sha256, date_str, serial, code)
+        return code
+
+    return assign_code
+
+def process_projects(input_projects, registry, template_paths, output_base_path, jobs=1, fresh=False,
+                     input_sha256=None, ledger=None, zip_path=None, zip_manifest=False, executor=None,
+                     render_url=None):
+    """
+    逐筆處理項目並生成文檔；input_projects 可以是列表或串流讀取的記錄
+    (見 cli.inputs.read_projects)，無法解析的記錄以 ValueError 表示。
+    沒有提供編號帳本時，編號只在本次執行中從 001 開始遞增。
+    zip_path 不是 None 時所有文檔寫入同一個壓縮檔 (空字串表示使用預設路徑
+    output/YYYY-MM-DD/documents-HHMMSS.zip)，zip_manifest 另外寫入 manifest.csv。
+    並行模式可傳入常駐的 executor，否則每次建立新的進程池。
+    render_url 指定時文檔由 render server 生成 (見 render_service)。
+    """
+    if ledger is None:
+        ledger = NumberingLedger(':memory:')
 
-def process_projects(input_projects, companies_config, template_paths, output_base_path):
-    date_counters = {}
     today = datetime.now()
     today_str = today.strftime("%Y-%m-%d")
     output_path = os.path.join(output_base_path, today_str)
 
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
-    
-    print(f"開始處理 {len(input_projects)} 個項目")
-    
-    if len(input_projects) == 0:
-        print("錯誤: 沒有找到任何項目，請檢查 projects.json 是否為空")
-        return False
+    print("開始處理項目")
     
     # 檢查模板是否存在
     for template_path in template_paths:
@@ -74,113 +186,180 @@ def process_projects(input_projects, companies_config, template_paths, output_ba
             print(f"錯誤: 模板文件不存在: {template_path}")
             return False
     
-    processed_count = 0
-    for idx, project in enumerate(input_projects):
-        print(f"\n處理項目 #{idx+1}: {project.get('project_name', '未命名')}")
-        
-        # 檢查必要字段
-        required_fields = ["project_name", "company_name", "price"]
-        missing_fields = [key for key in required_fields if key not in project]
-        if missing_fields:
-            print(f"錯誤: 項目缺少必要字段: {', '.join(missing_fields)}")
-            continue
-        
-        print(f"尋找公司: {project['company_name']}")
-        company_info = next((c for c in companies_config if c["companyName"] == project["company_name"]), None)
-        if not company_info:
-            print(f"錯誤: 在 companies.json 中找不到匹配的公司: {project['company_name']}")
-            print(f"可用的公司: {[c.get('companyName', '') for c in companies_config]}")
-            continue
-        
-        print(f"找到公司信息: {company_info['companyName']}")
-        
-        # 檢查公司配置中的必要字段
-        company_required_fields = ["companyHead", "taxID", "address"]
-        company_missing_fields = [field for field in company_required_fields if field not in company_info]
-        if company_missing_fields:
-            print(f"錯誤: 公司 '{company_info['companyName']}' 缺少必要字段: {', '.join(company_missing_fields)}")
-            continue
-        
-        date_str = project.get("date", today_str)
-        try:
-            date = datetime.strptime(date_str, "%Y-%m-%d")
-        except ValueError as e:
-            print(f"錯誤: 日期格式不正確: {date_str}, {str(e)}")
-            continue
-        
-        if date_str not in date_counters:
-            date_counters[date_str] = 1
+    # 同一個輸入上次中斷時的紀錄：沿用編號與輸出目錄，略過已完成的項目
+    template_hashes = {os.path.basename(path): sha256_file(path) for path in template_paths}
+    if input_sha256 is None:
+        input_sha256 = sha256_json(input_projects)
+    manifest = RunManifest(output_base_path, output_path, template_hashes, input_sha256, fresh=fresh)
+    output_path = manifest.output_path
+    if manifest.invalidated:
+        print(f"警告: 執行紀錄與輸入內容不符，不沿用: {manifest.path}")
+    if manifest.resumed:
+        print(f"從上次中斷的執行紀錄繼續: {manifest.path} (輸出目錄: {output_path})")
+
+    archive = None
+    if zip_path is not None:
+        archive = ZipOutput(zip_path or os.path.join(output_path, f'documents-{today.strftime("%H%M%S")}.zip'),
+                            manifest_csv=zip_manifest)
+        print(f"文檔將寫入壓縮檔: {archive.path}")
+
+    def record_rendered(idx, processed_data, data_sha256, generated):
+        if archive is not None:
+            names = archive.add_project(processed_data, generated)
+            outputs = [
+                {'file': name, 'sha256': sha256_bytes(content), 'archive': os.path.basename(archive.path)}
+                for name, (_, content) in zip(names, generated)
+            ]
         else:
-            date_counters[date_str] += 1
-        
-        code = generate_code(date, date_counters[date_str])
-        
-        # 使用 contact_date 如果存在，否則使用當前日期
-        try:
-            now = datetime.strptime(project.get("contact_date", today_str), "%Y-%m-%d")
-            now_year = now.year - 1911
-            now_month = now.month
-            now_day = now.day
-        except ValueError as e:
-            print(f"錯誤: contact_date 格式不正確: {project.get('contact_date', today_str)}, {str(e)}")
-            continue
+            outputs = [manifest.output_entry(path) for path in generated]
 
-        try:
-            price = float(project["price"])  # 確保 price 是數字
-            untaxed = round(price / 1.05)
-            taxes = round(price - untaxed)
-        except (TypeError, ValueError) as e:
-            print(f"錯誤: price 不是有效的數字: {project['price']}, {str(e)}")
-            continue
-
-        # 處理聯繫人信息
-        processed_contacts = process_contact(project.get("contacts", ""))
-        
-        processed_data = {
-            "project_name": project["project_name"],
-            "company_name": project["company_name"],
-            "contacts": processed_contacts,
-            "date": date_str,
-            "price": f'{price:,}',
-            "untaxed": f'{untaxed:,}',
-            "taxes": f'{taxes:,}',
-            "company_head": company_info["companyHead"],
-            "taxID": company_info["taxID"],
-            "company_address": company_info["address"],
-            "code": code,
-            "now_year": now_year,
-            "now_month": now_month,
-            "now_day": now_day,
-            "company_info": f'{project["company_name"]} {company_info["taxID"]}'
-        }
-
-        print(f'開始生成文檔: {project["project_name"]}')
-        for template_path in template_paths:
-            if 'template2' in template_path:
-                doc_type = '合約'
-            else:
-                doc_type = '報價單'
+        # 只有所有模板都成功時才記錄為已完成，下次執行會補生成缺少的文檔
+        if len(generated) == len(template_paths):
+            manifest.record_done(idx, processed_data['code'], data_sha256, outputs)
+        return len(generated)
+
+    skipped_count = 0
+    record_count = 0
+    read_error = None
+
+    def prepare_record(idx, project):
+        """驗證一筆記錄並分配編號，返回 (processed_data, data_sha256, 略過的文檔數)"""
+        if isinstance(project, ValueError):
+            print(f"\n錯誤: 無法解析記錄 #{idx+1}: {project}")
+            return None, None, 0
+
+        print(f"\n處理項目 #{idx+1}: {project.get('project_name', '未命名')}")
+        processed_data = prepare_project(project, registry, code_assigner(manifest, ledger, idx, project), today_str)
+        if processed_data is None:
+            return None, None, 0
+
+        # 壓縮檔每次重新寫出，不略過上次已生成的項目
+        data_sha256 = sha256_json(processed_data)
+        completed = None if archive is not None else manifest.completed_outputs(idx, data_sha256)
+        if completed is not None:
+            print(f"略過已完成的項目: {processed_data['project_name']} ({processed_data['code']})")
+            return None, None, len(completed)
+
+        return processed_data, data_sha256, 0
+
+    def pending_projects():
+        """
+        按輸入順序驗證項目並分配編號，產生 (idx, processed_data, data_sha256, skipped, log)；
+        processed_data 為 None 的記錄不需要生成文檔。驗證時的輸出收集在 log 中，
+        由 report() 在輪到該記錄時打印，並行模式下才能與生成結果一起按輸入順序輸出。
+        """
+        nonlocal record_count, read_error
+        records = iter(input_projects)
+        while True:
             try:
-                output_file = generate_document(template_path, processed_data, output_path, doc_type)
-                print(f"成功生成文檔: {output_file}")
-                processed_count += 1
-            except Exception as e:
-                print(f"錯誤: 生成文檔時出錯: {template_path}, {str(e)}")
+                project = next(records, None)
+            except ValueError as e:
+                # JSON 陣列的語法錯誤無法跳過，停止讀取
+                read_error = e
+                yield None, None, None, 0, f"\n錯誤: 無法繼續讀取輸入文件: {e}\n"
+                return
+            if project is None:
+                return
+
+            idx = record_count
+            record_count += 1
+            log = io.StringIO()
+            with redirect_stdout(log):
+                processed_data, data_sha256, skipped = prepare_record(idx, project)
+            yield idx, processed_data, data_sha256, skipped, log.getvalue()
+
+    def report(idx, skipped, log):
+        """打印一筆記錄的進度與驗證輸出，此時之前的記錄都已生成完畢"""
+        nonlocal skipped_count
+        if idx is not None and (idx + 1) % PROGRESS_INTERVAL == 0:
+            print(f"\n進度: 已讀取 {idx+1} 筆記錄，已生成 {processed_count + skipped_count} 個文檔")
+        print(log, end='')
+        skipped_count += skipped
+
+    processed_count = 0
+    try:
+        if jobs <= 1:
+            for idx, processed_data, data_sha256, skipped, log in pending_projects():
+                report(idx, skipped, log)
+                if processed_data is None:
+                    continue
+                generated = render_project(processed_data, template_paths, output_path, archive is not None, render_url)
+                processed_count += record_rendered(idx, processed_data, data_sha256, generated)
+        else:
+            # 編號與聯繫人按輸入順序在主進程中處理，只有文檔生成交給進程池。
+            # 每筆記錄的驗證輸出與生成結果在輪到它時一起打印，與依序執行的輸出相同；
+            # 限制進行中的記錄數，讀取輸入時記憶體用量不隨項目數增長
+            in_flight = deque()
+
+            def collect():
+                idx, processed_data, data_sha256, skipped, log, future = in_flight.popleft()
+                report(idx, skipped, log)
+                if future is None:
+                    return 0
+                try:
+                    generated, output = future.result()
+                except Exception as e:
+                    print(f"錯誤: 生成文檔時出錯: {processed_data['project_name']}, {str(e)}")
+                    return 0
+                print(output, end='')
+                return record_rendered(idx, processed_data, data_sha256, generated)
+
+            with nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=jobs) as pool:
+                for idx, processed_data, data_sha256, skipped, log in pending_projects():
+                    future = None
+                    if processed_data is not None:
+                        future = pool.submit(
+                            render_project_job, processed_data, template_paths, output_path,
+                            archive is not None, render_url
+                        )
+                    in_flight.append((idx, processed_data, data_sha256, skipped, log, future))
+                    if len(in_flight) >= jobs * JOBS_IN_FLIGHT:
+                        processed_count += collect()
+                
+                while in_flight:
+                    processed_count += collect()
+    except BaseException:
+        manifest.close()
+        if archive is not None:
+            archive.discard()
+        raise
+    
+    if archive is not None:
+        archive_file = archive.close()
+        if archive_file:
+            print(f"\n已寫入壓縮檔: {archive_file} ({archive.document_count} 個文檔)")
+    
+    processed_count += skipped_count
+    if record_count == 0 and read_error is None:
+        manifest.close()
+        print("錯誤: 沒有找到任何項目，請檢查輸入文件是否為空")
+        return False
+    
+    print(f"\n共讀取 {record_count} 筆記錄")
+    if read_error is not None:
+        manifest.close()
+        print(f"錯誤: 輸入文件格式不正確，已生成 {processed_count} 個文檔；修正後的輸入視為新的執行，會重新分配編號")
+        return False
     
     if processed_count == 0:
+        manifest.close()
         print("\n警告: 沒有成功生成任何文檔!")
         return False
     else:
+        manifest.complete()
         print(f"\n處理完成! 成功生成 {processed_count} 個文檔")
+        if skipped_count:
+            print(f"其中 {skipped_count} 個文檔為上次執行已生成")
         return True
 
-def move_projects_file(output_base_path):
+def move_projects_file(projects_file):
+    """將輸入文件移動到同目錄下的日期文件夾 (例如 input/YYYY-MM-DD/)"""
     today_str = datetime.now().strftime("%Y-%m-%d")
-    input_folder = os.path.join(os.path.dirname(__file__), 'input')
-    projects_file = os.path.join(input_folder, 'projects.json')
+    input_folder = os.path.dirname(projects_file)
+    file_name = os.path.basename(projects_file)
     
     if not os.path.exists(projects_file):
-        print(f"警告: 找不到原始 projects.json 文件，無法移動")
+        print(f"警告: 找不到原始 {file_name} 文件，無法移動")
         return
     
     # 創建目標文件夾（如果不存在）
@@ -188,17 +367,23 @@ def move_projects_file(output_base_path):
     if not os.path.exists(target_folder):
         os.makedirs(target_folder)
     
-    # 移動文件
-    target_file = os.path.join(target_folder, 'projects.json')
+    # 移動文件；同一天已有同名文件時加上時間，避免覆蓋先前的輸入
+    target_file = os.path.join(target_folder, file_name)
+    if os.path.exists(target_file):
+        stem, ext = os.path.splitext(file_name)
+        target_file = os.path.join(target_folder, f'{stem}-{datetime.now().strftime("%H%M%S")}{ext}')
     try:
         shutil.move(projects_file, target_file)
-        print(f'已將 projects.json 移動到 {target_file}')
+        print(f'已將 {file_name} 移動到 {target_file}')
     except Exception as e:
-        print(f"錯誤: 移動 projects.json 文件時出錯: {str(e)}")
+        print(f"錯誤: 移動 {file_name} 文件時出錯: {str(e)}")
+
+def document_name(data, doc_type):
+    return f'{data["project_name"]}_{doc_type}.docx'
 
-def generate_document(template_path, data, output_path, doc_type):
-    doc = Document(template_path)
-    placeholders = {
+def template_variables(data):
+    """模板中的佔位符與替換文字"""
+    return {
         "project_name": data["project_name"],
         "company_name": data["company_name"],
         "contacts": data["contacts"],
@@ -215,57 +400,165 @@ def generate_document(template_path, data, output_path, doc_type):
         "code": data["code"],
         "company_info": data["company_info"]
     }
-    
-    for placeholder, text in placeholders.items():
-        replace_text(doc, placeholder, text)
-    
-    output_file = os.path.join(output_path, f'{data["project_name"]}_{doc_type}.docx')
-    doc.save(output_file)
+
+def render_document_bytes(template_path, data, render_url=None):
+    """生成一份文檔的內容；提供 render_url 時交給 render server 生成"""
+    variables = template_variables(data)
+    if render_url:
+        content, log = RenderClient(render_url).render(template_path, variables)
+        print(log, end='')
+        return content
+
+    # python-docx 只在本地生成時才載入，使用 render server 時可以立即啟動
+    from render_service.documents import document_bytes, render_document
+    return document_bytes(render_document(template_path, variables))
+
+def generate_document(template_path, data, output_path, doc_type, render_url=None):
+    content = render_document_bytes(template_path, data, render_url)
+    output_file = os.path.join(output_path, document_name(data, doc_type))
+    with open(output_file, 'wb') as file:
+        file.write(content)
     return output_file
 
-def replace_text(doc, placeholder, text):
-    replacements_made = False
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='根據 input/projects.json 生成報價單與合約')
+    parser.add_argument('--input', '-i',
+                        help='輸入文件 (預設: input/ 中的 projects.json、projects.jsonl 或 projects.csv)')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='輸入格式 (預設: 依副檔名判斷)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='並行生成文檔的進程數 (預設: 1，0 表示使用所有 CPU 核心)')
+    parser.add_argument('--fresh', action='store_true',
+                        help='忽略上次中斷的執行紀錄，重新分配編號並生成所有文檔')
+    parser.add_argument('--zip', nargs='?', const='', metavar='PATH',
+                        help='將所有文檔寫入單一壓縮檔 (預設: output/YYYY-MM-DD/documents-HHMMSS.zip)')
+    parser.add_argument('--zip-manifest', action='store_true',
+                        help='在壓縮檔中加入彙整所有項目的 manifest.csv')
+    parser.add_argument('--ledger', default=os.path.join(os.path.dirname(__file__), 'config', 'numbering.sqlite3'),
+                        help='編號帳本文件 (預設: config/numbering.sqlite3)')
+    parser.add_argument('--lookup', metavar='CODE',
+                        help='查詢編號的發出紀錄後結束')
+    parser.add_argument('--watch', action='store_true',
+                        help='常駐模式: 監視 input/ 並自動處理新放入的輸入文件')
+    parser.add_argument('--render-server', nargs='?', const='', metavar='URL',
+                        help='交給 render server 生成文檔 (預設: $AUTODOCGEN_RENDER_URL 或 http://127.0.0.1:8765)')
+    args = parser.parse_args(argv)
+
+    if args.jobs < 0:
+        parser.error('--jobs 不能是負數')
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.watch and args.input:
+        parser.error('--watch 監視 input/ 目錄，不能與 --input 一起使用')
+
+    return args
+
+def lookup_code(ledger_path, code):
+    if not os.path.exists(ledger_path):
+        print(f"錯誤: 找不到編號帳本 {ledger_path}")
+        return False
+
+    ledger = NumberingLedger(ledger_path)
+    try:
+        record = ledger.lookup(code)
+    finally:
+        ledger.close()
+
+    if record is None:
+        print(f"編號帳本中沒有 {code}")
+        return False
+
+    for key, value in record.items():
+        print(f"{key}: {value}")
+    return True
+
+def run_input_file(projects_file, input_format, registry, ledger, template_paths, output_base_path, args,
+                   executor=None):
+    """讀取並處理一個輸入文件，成功時移動到日期文件夾；返回是否成功"""
+    # 逐筆讀取並處理專案，新聯繫人在結束時一次寫回，沒用完的預留編號歸還帳本
+    print(f"讀取輸入文件: {projects_file} ({input_format})")
+    if args.jobs > 1:
+        print(f"使用 {args.jobs} 個進程並行生成文檔")
+    try:
+        with open(projects_file, 'r', encoding='utf-8-sig', newline='') as file:
+            success = process_projects(
+                read_projects(file, input_format), registry, template_paths, output_base_path,
+                jobs=args.jobs, fresh=args.fresh, input_sha256=sha256_file(projects_file), ledger=ledger,
+                zip_path=args.zip, zip_manifest=args.zip_manifest, executor=executor,
+                render_url=args.render_server
+            )
+    finally:
+        ledger.release_unused()
+        registry.save()
     
-    def replace_in_paragraph(paragraph):
-        nonlocal replacements_made
-        if placeholder in paragraph.text:
-            inline = paragraph.runs
-            replacements = []
-            for i in range(len(inline)):
-                if placeholder in inline[i].text:
-                    replacements.append((i, inline[i].text.replace(placeholder, text)))
-                    replacements_made = True
-            for i, new_text in replacements:
-                inline[i].text = new_text
-            full_text = ''.join([run.text for run in inline])
-            if placeholder in full_text:
-                new_text = full_text.replace(placeholder, text)
-                for i in range(len(inline)):
-                    if i == 0:
-                        inline[i].text = new_text
-                    else:
-                        inline[i].text = ''
-                replacements_made = True
-
-    for p in doc.paragraphs:
-        replace_in_paragraph(p)
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    replace_in_paragraph(paragraph)
-
-    for section in doc.sections:
-        for header in section.header.paragraphs:
-            replace_in_paragraph(header)
-        for footer in section.footer.paragraphs:
-            replace_in_paragraph(footer)
+    # 只有在成功生成文件時才移動輸入文件
+    if success:
+        move_projects_file(projects_file)
+        return True
+    else:
+        print(f"因為未能成功完成文件生成，保留 {os.path.basename(projects_file)} 在原位置")
+        return False
+
+def watch_input(input_dir, config_dir, registry, ledger, template_paths, output_base_path, args, watcher=None):
+    """
+    常駐模式：監視 input/，有新的輸入文件時立即處理
+
+    模板、公司與聯繫人登記表、編號帳本與並行模式的進程池都保持載入狀態；
+    配置文件被修改時重新載入登記表。處理失敗的文件保留在原位置，修改後才會
+    再次處理。watcher 預設為監視 input_dir 的 FolderWatcher。
+    """
+    watcher = watcher or FolderWatcher(input_dir)
+    failed = {}
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
     
-    if not replacements_made:
-        print(f"警告: 未找到佔位符 '{placeholder}' 或未進行任何替換")
+    # 本地生成時預先解析模板
+    if not args.render_server:
+        from render_service.documents import load_template
+        for template_path in template_paths:
+            load_template(template_path)
+    
+    print(f"常駐模式: 監視 {input_dir} ({watcher.mode})，按 Ctrl+C 結束")
+    try:
+        while True:
+            for projects_file in input_files(input_dir):
+                signature = wait_until_settled(projects_file)
+                if signature is None or failed.get(projects_file) == signature:
+                    continue
+                
+                if registry.is_stale():
+                    print("配置文件已更新，重新載入公司與聯繫人")
+                    registry = Registry.load(config_dir)
+                
+                print(f"\n{'=' * 60}\n{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 發現輸入文件: {projects_file}")
+                try:
+                    success = run_input_file(
+                        projects_file, args.format or detect_format(projects_file), registry, ledger,
+                        template_paths, output_base_path, args, executor=executor
+                    )
+                except Exception as e:
+                    print(f"發生未預期的錯誤: {str(e)}")
+                    success = False
+                
+                if success:
+                    failed.pop(projects_file, None)
+                else:
+                    failed[projects_file] = file_signature(projects_file)
+                    print("修改輸入文件後會重新處理")
+            
+            watcher.wait()
+    except KeyboardInterrupt:
+        print("\n結束常駐模式")
+        return True
+    finally:
+        watcher.close()
+        if executor is not None:
+            executor.shutdown()
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.lookup:
+        return lookup_code(args.ledger, args.lookup)
 
-def main():
     try:
         # 檢查必要的文件
         config_dir = os.path.join(os.path.dirname(__file__), 'config')
@@ -283,10 +576,13 @@ def main():
             print(f"錯誤: 找不到 input 目錄")
             return False
         
-        projects_file = os.path.join(input_dir, 'projects.json')
-        if not os.path.exists(projects_file):
-            print(f"錯誤: 找不到 projects.json 文件")
-            return False
+        if not args.watch:
+            projects_file = args.input or find_input_file(input_dir)
+            if not projects_file or not os.path.exists(projects_file):
+                print(f"錯誤: 找不到輸入文件 {args.input or '(projects.json / projects.jsonl / projects.csv)'}")
+                return False
+            projects_file = os.path.abspath(projects_file)
+            input_format = args.format or detect_format(projects_file)
         
         templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
         if not os.path.exists(templates_dir):
@@ -294,11 +590,7 @@ def main():
             return False
         
         # 讀取配置文件
-        with open(companies_file, 'r', encoding='utf-8') as file:
-            companies_config = json.load(file)
-        
-        with open(projects_file, 'r', encoding='utf-8') as file:
-            input_projects = json.load(file)
+        registry = Registry.load(config_dir)
 
         base_dir = os.path.dirname(__file__)
         template_paths = [
@@ -310,16 +602,23 @@ def main():
         if not os.path.exists(output_base_path):
             os.makedirs(output_base_path)
 
-        # 處理專案
-        success = process_projects(input_projects, companies_config, template_paths, output_base_path)
-        
-        # 只有在成功生成文件時才移動 projects.json
-        if success:
-            move_projects_file(output_base_path)
-            return True
-        else:
-            print("因為沒有成功生成任何文件，保留 projects.json 在原位置")
-            return False
+        # render server 沒有執行時改為本地生成
+        if args.render_server is not None:
+            client = RenderClient(args.render_server or None)
+            if client.available():
+                args.render_server = client.url
+                print(f"使用 render server 生成文檔: {client.url}")
+            else:
+                args.render_server = None
+                print(f"警告: 無法連線到 render server {client.url}，改為本地生成文檔")
+
+        ledger = NumberingLedger(args.ledger)
+        try:
+            if args.watch:
+                return watch_input(input_dir, config_dir, registry, ledger, template_paths, output_base_path, args)
+            return run_input_file(projects_file, input_format, registry, ledger, template_paths, output_base_path, args)
+        finally:
+            ledger.close()
     
     except Exception as e:
         print(f"發生未預期的錯誤: {str(e)}")
@@ -0,0 +1,9 @@
+"""
+本地文檔生成服務
+
+常駐的 render server 保持模板已解析，main.py 與 web_platform 透過 client
+把「模板 + 變數 → 文檔」交給它處理，自己不必載入 python-docx：
+
+    python -m render_service            # 啟動服務 (預設 http://127.0.0.1:8765)
+    python main.py --render-server      # CLI 使用服務生成文檔
+"""
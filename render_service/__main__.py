@@ -0,0 +1,61 @@
+"""
+啟動 render server
+
+    python -m render_service [--port 8765] [--workers N] [--template-dir DIR ...]
+"""
+
+import argparse
+import os
+import sys
+
+from .server import DEFAULT_HOST, DEFAULT_PORT, RenderServer
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 預設允許使用的模板目錄: CLI 的 templates/ 與 web_platform 上傳的模板
+DEFAULT_TEMPLATE_DIRS = [
+    os.path.join(BASE_DIR, 'templates'),
+    os.path.join(BASE_DIR, 'web_platform', 'uploads')
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地文檔生成服務 (render server)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'監聽位址 (預設: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'監聽埠 (預設: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='生成文檔的工作進程數 (預設: CPU 核心數)')
+    parser.add_argument('--max-pending', type=int,
+                        help='同時處理中的請求上限，超過時回應 503 (預設: 工作進程數 × 4)')
+    parser.add_argument('--template-dir', action='append', default=[],
+                        help='額外允許使用的模板目錄 (可重複指定)')
+    args = parser.parse_args(argv)
+
+    if args.host not in ('127.0.0.1', 'localhost', '::1'):
+        print(f"警告: render server 沒有身分驗證，監聽 {args.host} 可能讓其他機器存取模板")
+
+    server = RenderServer(
+        (args.host, args.port),
+        DEFAULT_TEMPLATE_DIRS + args.template_dir,
+        workers=args.workers,
+        max_pending=args.max_pending
+    )
+
+    print(f"Render server 已啟動: http://{args.host}:{args.port}")
+    print(f"工作進程: {server.workers}，同時處理上限: {server.max_pending}")
+    print(f"允許的模板目錄: {', '.join(server.template_roots)}")
+    print("按 Ctrl+C 結束")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n結束 render server")
+    finally:
+        server.server_close()
+
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,84 @@
+"""
+Render server client
+
+只使用標準庫，載入時不需要 python-docx，呼叫端可以立即啟動。服務忙碌
+(503) 時依 Retry-After 等待後重試。
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+# 未指定網址時讀取的環境變數
+URL_ENV = 'AUTODOCGEN_RENDER_URL'
+
+# 服務忙碌時的最多重試次數
+MAX_RETRIES = 30
+
+
+class RenderServiceError(Exception):
+    """Render server 無法使用或拒絕請求"""
+
+
+class RenderClient:
+    def __init__(self, url=None, timeout=60, max_retries=MAX_RETRIES):
+        self.url = (url or os.environ.get(URL_ENV) or DEFAULT_URL).rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def available(self, timeout=0.5):
+        """服務是否正在執行"""
+        try:
+            with urllib.request.urlopen(f'{self.url}/health', timeout=timeout) as response:
+                return json.loads(response.read()).get('status') == 'ok'
+        except (OSError, ValueError):
+            return False
+
+    def _post(self, path, payload):
+        """送出 JSON 請求，返回 (內容 bytes, 回應標頭)"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+        for attempt in range(self.max_retries + 1):
+            request = urllib.request.Request(
+                f'{self.url}{path}', data=body, method='POST',
+                headers={'Content-Type': 'application/json; charset=utf-8'}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return response.read(), response.headers
+            except urllib.error.HTTPError as e:
+                if e.code == 503 and attempt < self.max_retries:
+                    time.sleep(float(e.headers.get('Retry-After') or 1))
+                    continue
+                try:
+                    message = json.loads(e.read()).get('error')
+                except ValueError:
+                    message = None
+                raise RenderServiceError(f'{e.code}: {message or e.reason}')
+            except OSError as e:
+                raise RenderServiceError(f'無法連線到 render server {self.url}: {e}')
+
+        raise RenderServiceError('render server 持續忙碌')
+
+    def render(self, template_path, variables):
+        """
+        生成文檔
+
+        Returns:
+            (文檔內容 bytes, 生成過程的警告文字)
+        """
+        content, headers = self._post('/render', {
+            'template': os.path.abspath(template_path),
+            'variables': variables
+        })
+        return content, json.loads(headers.get('X-Render-Log') or '""')
+
+    def placeholders(self, template_path):
+        """返回模板中 {{欄位}} 格式的佔位符列表"""
+        content, _ = self._post('/placeholders', {'template': os.path.abspath(template_path)})
+        return json.loads(content)['placeholders']
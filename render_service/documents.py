@@ -0,0 +1,125 @@
+"""
+python-docx 文檔生成
+
+main.py 在本地生成時與 render server 的工作進程共用這裡的函數。模板解析
+一次後快取在進程中，之後每次生成只複製已解析的文件。
+"""
+
+import copy
+import io
+import os
+import re
+from contextlib import redirect_stdout
+
+from docx import Document
+
+
+# 已解析的模板: 路徑 -> (修改時間, Document)
+_template_cache = {}
+
+
+def load_template(template_path):
+    """返回模板的副本；模板只在第一次使用或文件更新後才重新解析"""
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _template_cache.get(template_path)
+    if cached is None or cached[0] != mtime:
+        cached = _template_cache[template_path] = (mtime, Document(template_path))
+    return copy.deepcopy(cached[1])
+
+
+def render_document(template_path, variables):
+    """以 {佔位符: 文字} 替換模板內容，返回 python-docx 文件"""
+    doc = load_template(template_path)
+    for placeholder, text in variables.items():
+        replace_text(doc, placeholder, text)
+    return doc
+
+
+def replace_text(doc, placeholder, text):
+    replacements_made = False
+    
+    def replace_in_paragraph(paragraph):
+        nonlocal replacements_made
+        if placeholder in paragraph.text:
+            inline = paragraph.runs
+            replacements = []
+            for i in range(len(inline)):
+                if placeholder in inline[i].text:
+                    replacements.append((i, inline[i].text.replace(placeholder, text)))
+                    replacements_made = True
+            for i, new_text in replacements:
+                inline[i].text = new_text
+            full_text = ''.join([run.text for run in inline])
+            if placeholder in full_text:
+                new_text = full_text.replace(placeholder, text)
+                for i in range(len(inline)):
+                    if i == 0:
+                        inline[i].text = new_text
+                    else:
+                        inline[i].text = ''
+                replacements_made = True
+
+    for p in doc.paragraphs:
+        replace_in_paragraph(p)
+
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    replace_in_paragraph(paragraph)
+
+    for section in doc.sections:
+        for header in section.header.paragraphs:
+            replace_in_paragraph(header)
+        for footer in section.footer.paragraphs:
+            replace_in_paragraph(footer)
+    
+    if not replacements_made:
+        print(f"警告: 未找到佔位符 '{placeholder}' 或未進行任何替換")
+
+
+def document_bytes(doc):
+    """將 python-docx 文件存為 bytes"""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def render_job(template_path, variables):
+    """生成文檔並收集過程中的警告，返回 (文檔內容 bytes, 輸出文字)"""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        content = document_bytes(render_document(template_path, variables))
+    return content, buffer.getvalue()
+
+
+def extract_placeholders(docx_path):
+    """找出 web_platform 模板中 {{欄位}} 格式的佔位符"""
+    doc = Document(docx_path)
+    placeholders = set()
+
+    def find_placeholders_in_text(text):
+        # 目前假設佔位符格式為 {{欄位}} 或直接欄位名
+        # 支援 {{欄位}} 格式
+        matches = re.findall(r'{{(.*?)}}', text)
+        placeholders.update([m.strip() for m in matches if m.strip()])
+        # 也可加入直接字串匹配，視需求調整
+        # matches2 = re.findall(r'\b\w+\b', text)
+        # placeholders.update(matches2)
+
+    for p in doc.paragraphs:
+        find_placeholders_in_text(p.text)
+
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for p in cell.paragraphs:
+                    find_placeholders_in_text(p.text)
+
+    for section in doc.sections:
+        for p in section.header.paragraphs:
+            find_placeholders_in_text(p.text)
+        for p in section.footer.paragraphs:
+            find_placeholders_in_text(p.text)
+
+    return placeholders
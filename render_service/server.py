@@ -0,0 +1,210 @@
+"""
+Render server
+
+只監聽本機 (loopback) 的 HTTP 服務，文檔在常駐的工作進程池中生成，每個
+工作進程保留自己已解析的模板：
+
+    GET  /health        {"status": "ok", "workers": N, "pending": k, "max_pending": m}
+    POST /render        {"template": 路徑, "variables": {佔位符: 文字}}
+                        → .docx 內容；生成過程的警告在 X-Render-Log 標頭 (JSON，
+                          過長時截斷)
+    POST /placeholders  {"template": 路徑} → {"placeholders": [...]}
+
+同時處理中的請求超過 max_pending 時立即回應 503 與 Retry-After，由 client
+稍後重試，服務不會無限制地堆積工作。只接受位於 template_roots 之下的模板。
+
+Host 標頭必須是 127.0.0.1 或 localhost 加上服務的連接埠，避免網頁透過 DNS
+rebinding 存取本機服務；POST 請求必須是 application/json，瀏覽器不經 CORS
+預檢就能送出的表單請求會被拒絕。
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .documents import extract_placeholders, render_job
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 每個工作進程最多排隊的請求數
+PENDING_PER_WORKER = 4
+
+# 請求內容的上限 (bytes)
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# X-Render-Log 標頭的上限 (bytes)；http.client 拒絕超過 64 KiB 的標頭行
+MAX_LOG_HEADER_BYTES = 32 * 1024
+
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+class ServerBusy(Exception):
+    """同時處理中的請求已達上限"""
+
+
+def placeholders_job(template_path):
+    return sorted(extract_placeholders(template_path))
+
+
+def log_header(log):
+    """生成過程的警告轉為 X-Render-Log 標頭值，過長時只保留開頭"""
+    value = json.dumps(log)
+    if len(value) <= MAX_LOG_HEADER_BYTES:
+        return value
+
+    # JSON 跳脫後每個字元最多 6 bytes (\uXXXX)
+    keep = MAX_LOG_HEADER_BYTES // 6 - 100
+    return json.dumps(f'{log[:keep]}\n... (警告過長，已截斷 {len(log) - keep} 個字元)\n')
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, template_roots, workers=None, max_pending=None):
+        super().__init__(address, RenderRequestHandler)
+        self.template_roots = [os.path.realpath(root) for root in template_roots]
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * PENDING_PER_WORKER
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        port = self.server_address[1]
+        self.allowed_hosts = {f'{host}:{port}' for host in ('127.0.0.1', 'localhost', self.server_address[0])}
+
+    def resolve_template(self, template_path):
+        """返回允許使用的模板實際路徑，否則返回 None"""
+        if not isinstance(template_path, str) or not template_path.endswith('.docx'):
+            return None
+
+        path = os.path.realpath(template_path)
+        if not any(os.path.commonpath([path, root]) == root for root in self.template_roots):
+            return None
+        return path if os.path.isfile(path) else None
+
+    def run_job(self, fn, *args):
+        """
+        在進程池中執行工作並等待結果
+
+        Raises:
+            ServerBusy: 同時處理中的請求已達 max_pending
+        """
+        if not self.slots.acquire(blocking=False):
+            raise ServerBusy()
+
+        with self.pending_lock:
+            self.pending += 1
+        try:
+            return self.pool.submit(fn, *args).result()
+        finally:
+            with self.pending_lock:
+                self.pending -= 1
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'AutoDocGenRender/1.0'
+
+    def log_message(self, format, *args):
+        # 只記錄錯誤，不逐一打印請求
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def check_host(self):
+        """Host 不是本機服務的位址時回應 403，返回是否可以繼續處理"""
+        if (self.headers.get('Host') or '').lower() in self.server.allowed_hosts:
+            return True
+        self.send_json(403, {'error': f'Host not allowed: {self.headers.get("Host")}'})
+        return False
+
+    def do_GET(self):
+        if not self.check_host():
+            return
+
+        if self.path != '/health':
+            self.send_json(404, {'error': f'Unknown path: {self.path}'})
+            return
+
+        self.send_json(200, {
+            'status': 'ok',
+            'workers': self.server.workers,
+            'pending': self.server.pending,
+            'max_pending': self.server.max_pending
+        })
+
+    def do_POST(self):
+        if not self.check_host():
+            return
+
+        if self.path not in ('/render', '/placeholders'):
+            self.send_json(404, {'error': f'Unknown path: {self.path}'})
+            return
+
+        if self.headers.get_content_type() != 'application/json':
+            self.send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_REQUEST_BYTES:
+            self.send_json(413 if length else 400, {'error': 'Invalid request size'})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {'error': 'Request body must be JSON'})
+            return
+
+        template_path = self.server.resolve_template(request.get('template'))
+        if template_path is None:
+            self.send_json(403, {'error': f'Template not allowed or not found: {request.get("template")}'})
+            return
+
+        try:
+            if self.path == '/render':
+                variables = request.get('variables')
+                if not isinstance(variables, dict):
+                    self.send_json(400, {'error': 'variables must be an object'})
+                    return
+                result = self.server.run_job(
+                    render_job, template_path, {str(key): str(value) for key, value in variables.items()}
+                )
+            else:
+                result = self.server.run_job(placeholders_job, template_path)
+        except ServerBusy:
+            self.send_json(503, {'error': 'Render server is busy'}, headers={'Retry-After': '1'})
+            return
+        except Exception as e:
+            print(f"錯誤: 處理 {self.path} 時出錯: {template_path}, {str(e)}")
+            self.send_json(500, {'error': str(e)})
+            return
+
+        if self.path == '/placeholders':
+            self.send_json(200, {'placeholders': result})
+            return
+
+        content, log = result
+        self.send_response(200)
+        self.send_header('Content-Type', DOCX_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(content)))
+        # 標頭只能是 ASCII，警告以 JSON 跳脫後傳回
+        self.send_header('X-Render-Log', log_header(log))
+        self.end_headers()
+        self.wfile.write(content)
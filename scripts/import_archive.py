@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Legacy Archive Import Script
+Imports the projects of every dated CLI run folder (input/YYYY-MM-DD/
+projects.json) into Firestore and links each one to the documents the run
+generated (output/YYYY-MM-DD/{project_name}_{報價單|合約}.docx/.pdf).
+
+Reruns are safe and cheap: project IDs are derived from a hash of the run
+date and the project row, files are stored under their content hash and
+uploaded only if missing, and records already in Firestore are skipped.
+Documents added to an output folder later are appended to the existing
+project. Rows without contacts are linked to a placeholder contact of
+their company (PLACEHOLDER_CONTACT), created when first needed.
+
+Usage:
+    python scripts/import_archive.py --user <uid> [--dry-run]
+    python scripts/import_archive.py --user <uid> --create-missing --workers 16
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add functions directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from google.api_core.exceptions import PreconditionFailed
+    from src.projects.acl import ACL_COLLECTION, acl_record
+    from src.projects.aggregates import add_deltas, project_deltas, stats_ref, stats_writes
+    from src.projects.bulk_import import NameIndex, parse_project_row
+    from src.projects.status_history import history_collection
+    from src.projects.update_status import VALID_STATUSES
+    from src.utils.clients import get_db, get_bucket
+    from src.utils.row_streams import iter_json_array
+    from src.utils.side_effects import UnitOfWork
+except ImportError:
+    print("❌ Required packages not installed.")
+    print("Please install: pip install -r functions/requirements.txt")
+    sys.exit(1)
+
+
+project_root = Path(__file__).parent.parent
+
+RUN_FOLDER = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Document types the CLI generated, as they appear in output file names
+DOC_TYPES = ('報價單', '合約')
+DOC_EXTENSIONS = {
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.pdf': 'application/pdf',
+}
+
+# Run dates are Taiwan dates
+ARCHIVE_TIMEZONE = timezone(timedelta(hours=8))
+
+# Contact given to archive rows without contacts, one per company
+PLACEHOLDER_CONTACT = '未指定聯絡人'
+
+# Staged writes after which a batch is committed; leaves room for the
+# batch's aggregate increments under the 500-write limit
+BATCH_FLUSH_AT = 250
+
+
+def sha256_file(path: Path) -> str:
+    """Hash a file in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def legacy_project_id(run_date: str, row: dict) -> str:
+    """Derive a stable project ID from the run date and the project row."""
+    content = json.dumps({'run': run_date, 'row': row}, sort_keys=True, ensure_ascii=False)
+    return 'legacy-' + hashlib.sha256(content.encode('utf-8')).hexdigest()[:20]
+
+
+def find_outputs(output_folder: Path, project_name: str) -> list:
+    """List the generated documents of a project in a run's output folder."""
+    files = []
+    for doc_type in DOC_TYPES:
+        for extension in DOC_EXTENSIONS:
+            path = output_folder / f'{project_name}_{doc_type}{extension}'
+            if path.is_file():
+                files.append((doc_type, path))
+    return files
+
+
+class ArchiveImport:
+    """Plans, uploads and records the import of one run folder at a time."""
+
+    def __init__(self, db, bucket, user_id, status, create_missing, dry_run, workers):
+        self.db = db
+        self.bucket = bucket
+        self.user_id = user_id
+        self.status = status
+        self.create_missing = create_missing
+        self.dry_run = dry_run
+        self.workers = workers
+        self.index = NameIndex.load(db)
+
+        self.counts = {
+            'projects_created': 0,
+            'projects_updated': 0,
+            'projects_skipped': 0,
+            'files_uploaded': 0,
+            'files_skipped': 0,
+            'errors': 0,
+        }
+        self._lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def error(self, where: str, message: str) -> None:
+        self.count('errors')
+        print(f"   ⚠️  {where}: {message}")
+
+    def resolve(self, parsed: dict, uow: UnitOfWork) -> tuple:
+        """Resolve company and contact refs, creating them if allowed."""
+        company_path = self.index.company(parsed['company_name'])
+        if not company_path:
+            if not self.create_missing:
+                raise ValueError(f"Unknown company: {parsed['company_name']}")
+            ref = self.db.collection('companies').document()
+            uow.set(ref, {
+                'company_name': parsed['company_name'],
+                'created_at': firestore.SERVER_TIMESTAMP,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            self.index.add_company(parsed['company_name'], ref.path)
+            company_path = ref.path
+
+        placeholder = parsed['contact_name'] == PLACEHOLDER_CONTACT
+        contact_path = self.index.contact(parsed['contact_name'], company_path)
+        if not contact_path:
+            if not self.create_missing and not placeholder:
+                raise ValueError(f"Unknown contact: {parsed['contact_name']}")
+            ref = self.db.collection('contacts').document()
+            uow.set(ref, {
+                'contact_name': parsed['contact_name'],
+                'company_ref': company_path,
+                'email': '',
+                'phone': '',
+                'placeholder': placeholder,
+                'created_at': firestore.SERVER_TIMESTAMP,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            self.index.add_contact(parsed['contact_name'], company_path, ref.path)
+            contact_path = ref.path
+
+        return company_path, contact_path
+
+    def plan_folder(self, run_date: str) -> list:
+        """
+        Read a run's projects and work out what is missing in Firestore.
+
+        Returns:
+            list of dicts with project_id, parsed (the validated row), exists
+            (project already in Firestore) and files still to record
+        """
+        input_file = project_root / 'input' / run_date / 'projects.json'
+        output_folder = project_root / 'output' / run_date
+
+        if input_file.stat().st_size == 0:
+            return []
+
+        rows = []
+        with open(input_file, 'r', encoding='utf-8-sig') as stream:
+            for number, row in iter_json_array(stream):
+                try:
+                    # The CLI dated projects without a date with the run date
+                    parsed = parse_project_row(
+                        {**row, 'date': row.get('date') or run_date} if isinstance(row, dict) else row,
+                        require_contact=False
+                    )
+                except ValueError as e:
+                    self.error(f"{run_date} #{number}", str(e))
+                    continue
+                if not parsed['contact_name']:
+                    parsed['contact_name'] = PLACEHOLDER_CONTACT
+                rows.append((legacy_project_id(run_date, row), parsed))
+
+        refs = [self.db.collection('projects').document(project_id) for project_id, _ in rows]
+        existing = {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in self.db.get_all(refs, field_paths=['generated_docs'])
+            if snapshot.exists
+        }
+
+        plan = []
+        for project_id, parsed in rows:
+            recorded = {
+                doc.get('content_hash')
+                for doc in (existing.get(project_id) or {}).get('generated_docs', [])
+            }
+
+            files = []
+            for doc_type, path in find_outputs(output_folder, parsed['project_name']):
+                content_hash = sha256_file(path)
+                if content_hash not in recorded:
+                    files.append((doc_type, path, content_hash))
+
+            if project_id in existing and not files:
+                self.counts['projects_skipped'] += 1
+                continue
+
+            # Check names before uploading anything for a new project
+            if project_id not in existing and not self.create_missing:
+                company_path = self.index.company(parsed['company_name'])
+                placeholder = parsed['contact_name'] == PLACEHOLDER_CONTACT
+                if not company_path or not (placeholder or self.index.contact(parsed['contact_name'], company_path)):
+                    self.error(
+                        f"{run_date} {parsed['project_name']}",
+                        f"Unknown company or contact: {parsed['company_name']} / {parsed['contact_name']}"
+                    )
+                    continue
+
+            plan.append({
+                'project_id': project_id,
+                'parsed': parsed,
+                'exists': project_id in existing,
+                'files': files
+            })
+
+        return plan
+
+    def upload(self, project_id: str, path: Path, content_hash: str) -> dict:
+        """Upload one output file unless an identical one is stored."""
+        storage_path = f"documents/{project_id}/legacy_{content_hash[:16]}{path.suffix}"
+        blob = self.bucket.blob(storage_path)
+
+        try:
+            blob.upload_from_filename(
+                str(path),
+                content_type=DOC_EXTENSIONS[path.suffix],
+                if_generation_match=0
+            )
+            self.count('files_uploaded')
+        except PreconditionFailed:
+            # Uploaded by an earlier run
+            self.count('files_skipped')
+
+        return {
+            'storage_path': storage_path,
+            'file_size': path.stat().st_size
+        }
+
+    def doc_info(self, doc_type: str, path: Path, content_hash: str, stored: dict, created_at) -> dict:
+        return {
+            'id': f"LEGACY-{content_hash[:8]}",
+            'template_id': None,
+            'template_name': doc_type,
+            'file_url': f"gs://{self.bucket.name}/{stored['storage_path']}",
+            'file_path': stored['storage_path'],
+            'file_name': path.name,
+            'file_size': stored['file_size'],
+            'content_hash': content_hash,
+            'created_at': created_at,
+            'created_by': self.user_id,
+            'source': 'legacy_archive'
+        }
+
+    def import_folder(self, run_date: str) -> None:
+        plan = self.plan_folder(run_date)
+        if not plan:
+            return
+
+        if self.dry_run:
+            for item in plan:
+                action = 'update' if item['exists'] else 'create'
+                self.counts[f'projects_{action}d'] += 1
+                self.counts['files_uploaded'] += len(item['files'])
+            return
+
+        # Upload every missing file of the run in parallel
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                (item['project_id'], content_hash): executor.submit(
+                    self.upload, item['project_id'], path, content_hash
+                )
+                for item in plan
+                for _, path, content_hash in item['files']
+            }
+
+        run_time = datetime.strptime(run_date, '%Y-%m-%d').replace(tzinfo=ARCHIVE_TIMEZONE)
+
+        uow = UnitOfWork(self.db)
+        stats = {}
+
+        def commit():
+            nonlocal uow, stats
+            for key, increments in stats_writes(stats):
+                uow.set(stats_ref(self.db, key), increments, merge=True)
+            uow.commit()
+            uow = UnitOfWork(self.db)
+            stats = {}
+
+        for item in plan:
+            project_id = item['project_id']
+            project_ref = self.db.collection('projects').document(project_id)
+
+            docs = []
+            for doc_type, path, content_hash in item['files']:
+                try:
+                    stored = futures[(project_id, content_hash)].result()
+                except Exception as e:
+                    self.error(f"{run_date} {path.name}", f"Upload failed: {e}")
+                    continue
+                docs.append(self.doc_info(doc_type, path, content_hash, stored, run_time))
+
+            if item['exists']:
+                if docs:
+                    uow.update(project_ref, {
+                        'generated_docs': firestore.ArrayUnion(docs),
+                        'updated_at': firestore.SERVER_TIMESTAMP
+                    })
+                    self.counts['projects_updated'] += 1
+            else:
+                parsed = item['parsed']
+                try:
+                    company_path, contact_path = self.resolve(parsed, uow)
+                except ValueError as e:
+                    self.error(f"{run_date} {parsed['project_name']}", str(e))
+                    continue
+
+                project_data = {
+                    'project_name': parsed['project_name'],
+                    'company_ref': company_path,
+                    'contact_ref': contact_path,
+                    'price': parsed['price'],
+                    'date': parsed['date'],
+                    'status': self.status,
+                    'status_changed_at': run_time,
+                    'generated_docs': docs,
+                    'extra_data': parsed['extra_data'],
+                    'legacy_run': run_date,
+                    'created_by': self.user_id,
+                    'created_at': run_time,
+                    'updated_at': firestore.SERVER_TIMESTAMP,
+                    'shared_with': {}
+                }
+
+                uow.set(project_ref, project_data)
+                uow.set(self.db.collection(ACL_COLLECTION).document(project_id), {
+                    **acl_record(project_data),
+                    'project_updated_at': firestore.SERVER_TIMESTAMP
+                })
+                uow.set(history_collection(self.db, project_id).document('legacy_0000'), {
+                    'status': self.status,
+                    'previous_status': None,
+                    'updated_by': self.user_id,
+                    'timestamp': run_time
+                })
+                add_deltas(stats, project_deltas(project_data))
+                self.counts['projects_created'] += 1
+
+            if len(uow) >= BATCH_FLUSH_AT:
+                commit()
+
+        commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import the legacy input/ and output/ run folders')
+    parser.add_argument('--user', required=True, help='User ID recorded as the projects\' creator')
+    parser.add_argument('--status', default='completed', choices=VALID_STATUSES,
+                        help='Status given to imported projects')
+    parser.add_argument('--create-missing', action='store_true', help='Create unknown companies and contacts')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel uploads')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be imported')
+    parser.add_argument('--project', default='autodocgen-prod', help='Firebase project ID')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗄️  AutoDocGen Legacy Archive Import")
+    print("=" * 60)
+
+    firebase_admin.initialize_app(credentials.ApplicationDefault(), {
+        'projectId': args.project,
+        'storageBucket': f'{args.project}.firebasestorage.app'
+    })
+    print(f"✅ Firebase initialized for project: {args.project}")
+
+    archive = ArchiveImport(
+        get_db(), get_bucket(), args.user, args.status,
+        args.create_missing, args.dry_run, args.workers
+    )
+
+    run_dates = sorted(
+        entry.name for entry in (project_root / 'input').iterdir()
+        if entry.is_dir() and RUN_FOLDER.match(entry.name) and (entry / 'projects.json').is_file()
+    )
+
+    for run_date in run_dates:
+        print(f"\n📁 {run_date}")
+        try:
+            archive.import_folder(run_date)
+        except Exception as e:
+            archive.error(run_date, str(e))
+
+    counts = archive.counts
+    prefix = "Would import" if args.dry_run else "Imported"
+    print(f"\n✅ {prefix} {len(run_dates)} run folders")
+    print(f"   Projects: {counts['projects_created']} created, {counts['projects_updated']} updated, "
+          f"{counts['projects_skipped']} already imported")
+    print(f"   Files: {counts['files_uploaded']} uploaded, {counts['files_skipped']} already stored")
+    if counts['errors']:
+        print(f"   ⚠️  {counts['errors']} errors")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Import cancelled by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n❌ Import failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
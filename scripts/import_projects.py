@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Project Import Script
+Imports projects from a local file in the legacy projects.json format
+(JSON array, JSON Lines or CSV), streaming the file row by row.
+
+Usage:
+    python scripts/import_projects.py input/2025-04-21/projects.json --user <uid>
+    python scripts/import_projects.py projects.csv --user <uid> --create-missing --dry-run
+"""
+
+import argparse
+import os
+import sys
+
+# Add functions directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials
+    from src.projects.bulk_import import run_project_import
+    from src.utils.clients import get_db
+    from src.utils.row_streams import FORMATS, detect_format, iter_rows
+except ImportError:
+    print("❌ Required packages not installed.")
+    print("Please install: pip install -r functions/requirements.txt")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import projects from a JSON, JSON Lines or CSV file')
+    parser.add_argument('file', help='File to import')
+    parser.add_argument('--user', required=True, help='User ID recorded as the projects\' creator')
+    parser.add_argument('--format', choices=FORMATS, help='Input format (default: from the file extension)')
+    parser.add_argument('--create-missing', action='store_true', help='Create unknown companies and contacts')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+    parser.add_argument('--project', default='autodocgen-prod', help='Firebase project ID')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📥 AutoDocGen Project Import")
+    print("=" * 60)
+
+    firebase_admin.initialize_app(credentials.ApplicationDefault(), {
+        'projectId': args.project,
+    })
+    print(f"✅ Firebase initialized for project: {args.project}")
+
+    fmt = args.format or detect_format(args.file)
+
+    def progress(counts):
+        print(f"   {counts['rows']} rows read, {counts['imported']} imported, {counts['failed']} failed")
+
+    with open(args.file, 'r', encoding='utf-8-sig', newline='') as stream:
+        report = run_project_import(
+            get_db(),
+            iter_rows(stream, fmt),
+            args.user,
+            create_missing=args.create_missing,
+            dry_run=args.dry_run,
+            progress=progress
+        )
+
+    action = "Would import" if report['dry_run'] else "Imported"
+    print(f"\n✅ {action} {report['imported']} of {report['rows']} rows")
+    if report['created_companies'] or report['created_contacts']:
+        print(f"   Created {report['created_companies']} companies, {report['created_contacts']} contacts")
+
+    for error in report['errors']:
+        where = f"Row {error['row']}" if error['row'] is not None else "Aggregates"
+        print(f"   ⚠️  {where}: {error['error']}")
+    if report['failed'] > len(report['errors']):
+        print(f"   ... and {report['failed'] - len(report['errors'])} more errors")
+
+    if report['aborted']:
+        print(f"\n❌ Stopped early: {report['aborted']}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Import cancelled by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n❌ Import failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Status History Migration Script
+Moves the legacy `status_history` array of each project into the
+projects/{id}/status_history subcollection and removes the array.
+
+Entries get deterministic IDs (legacy_0000, legacy_0001, ...), so running
+the script again does not duplicate history.
+
+Usage:
+    python scripts/migrate_status_history.py [--project autodocgen-prod] [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+# Add functions directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from src.projects.status_history import history_collection
+    from src.utils.clients import get_db
+except ImportError:
+    print("❌ Required packages not installed.")
+    print("Please install: pip install -r functions/requirements.txt")
+    sys.exit(1)
+
+
+def migrate_project(db, snapshot, dry_run: bool = False) -> int:
+    """
+    Move one project's status_history array into its subcollection.
+
+    Returns:
+        Number of history entries migrated
+    """
+    project = snapshot.to_dict()
+    history = project.get('status_history') or []
+    fallback_time = project.get('created_at') or project.get('updated_at')
+
+    if dry_run:
+        return len(history)
+
+    batch = db.batch()
+    collection = history_collection(db, snapshot.id)
+
+    previous_status = None
+    last_timestamp = fallback_time
+    for index, entry in enumerate(history):
+        timestamp = entry.get('timestamp') or last_timestamp
+        batch.set(collection.document(f'legacy_{index:04d}'), {
+            'status': entry.get('status'),
+            'previous_status': previous_status,
+            'updated_by': entry.get('updated_by'),
+            'timestamp': timestamp
+        })
+        previous_status = entry.get('status')
+        last_timestamp = timestamp
+
+    batch.update(snapshot.reference, {
+        'status_history': firestore.DELETE_FIELD,
+        'status_changed_at': last_timestamp
+    })
+    batch.commit()
+
+    return len(history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move project status history into subcollections')
+    parser.add_argument('--project', default='autodocgen-prod', help='Firebase project ID')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be migrated')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🕒 AutoDocGen Status History Migration")
+    print("=" * 60)
+
+    firebase_admin.initialize_app(credentials.ApplicationDefault(), {
+        'projectId': args.project,
+    })
+    print(f"✅ Firebase initialized for project: {args.project}")
+
+    db = get_db()
+    projects = db.collection('projects').select(
+        ['status_history', 'created_at', 'updated_at']
+    ).stream()
+
+    migrated_projects = 0
+    migrated_entries = 0
+    for snapshot in projects:
+        if 'status_history' not in (snapshot.to_dict() or {}):
+            continue
+
+        count = migrate_project(db, snapshot, dry_run=args.dry_run)
+        migrated_projects += 1
+        migrated_entries += count
+        print(f"  ✓ {snapshot.id}: {count} entries")
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"\n✅ {action} {migrated_entries} entries from {migrated_projects} projects")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Migration cancelled by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
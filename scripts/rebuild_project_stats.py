@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Project Stats Rebuild Script
+Recomputes the materialized dashboard aggregates (project_stats) from all
+projects, replacing each stats document and deleting its increment shards
+in its own transaction.
+
+Usage:
+    python scripts/rebuild_project_stats.py [--project autodocgen-prod]
+"""
+
+import argparse
+import os
+import sys
+
+# Add functions directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions'))
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials
+    from src.projects.aggregates import rebuild_project_stats
+    from src.utils.clients import get_db
+except ImportError:
+    print("❌ Required packages not installed.")
+    print("Please install: pip install -r functions/requirements.txt")
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild project_stats from all projects')
+    parser.add_argument('--project', default='autodocgen-prod', help='Firebase project ID')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📊 AutoDocGen Project Stats Rebuild")
+    print("=" * 60)
+
+    firebase_admin.initialize_app(credentials.ApplicationDefault(), {
+        'projectId': args.project,
+    })
+    print(f"✅ Firebase initialized for project: {args.project}")
+
+    result = rebuild_project_stats(get_db())
+
+    print(f"\n✅ Read {result['projects']} projects")
+    print(f"   Wrote {result['written']} stats documents (shards folded in)")
+    print(f"   Deleted {result['deleted']} stale stats documents")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Rebuild cancelled by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n\n❌ Rebuild failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
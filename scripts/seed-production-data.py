@@ -322,8 +322,17 @@ def create_sample_projects(db, company_refs, contact_refs, template_refs):
 
     project_refs = []
     for project_data in projects_data:
+        # 状态历程存放在子集合，不放在项目文档中
+        history = project_data.pop('status_history')
+        project_data['status_changed_at'] = firestore.SERVER_TIMESTAMP
+
         doc_ref = db.collection('projects').document()
         doc_ref.set(project_data)
+        previous_status = None
+        for entry in history:
+            doc_ref.collection('status_history').add({**entry, 'previous_status': previous_status})
+            previous_status = entry['status']
+
         project_refs.append(doc_ref)
         print(f"  ✓ 创建项目: {project_data['project_name']} (状态: {project_data['status']})")
 
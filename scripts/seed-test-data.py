@@ -316,7 +316,16 @@ def create_sample_projects(db, company_ids, contact_ids, template_ids):
 
     project_ids = []
     for project in projects:
+        # Status history lives in a subcollection, not on the project
+        history = project.pop("status_history")
+        project["status_changed_at"] = firestore.SERVER_TIMESTAMP
+
         doc_ref = db.collection('projects').add(project)
+        previous_status = None
+        for entry in history:
+            doc_ref[1].collection('status_history').add({**entry, "previous_status": previous_status})
+            previous_status = entry["status"]
+
         project_ids.append(doc_ref[1].id)
         print_success(f"Created project: {project['project_name']} ({project['status']})")
 
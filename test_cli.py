@@ -0,0 +1,795 @@
+"""
+Quick test script for the CLI (main.py, cli/) and the render server
+Run this to verify the command line tool before using it on real input
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+COMPANIES = [
+    {'companyName': '海悅地產開發股份有限公司', 'taxID': '24493341', 'companyHead': '王俊傑', 'address': '臺北市'},
+    {'companyName': '霞飛廣告股份有限公司', 'taxID': '28192090', 'companyHead': '林輔政', 'address': '臺北市'},
+]
+
+CONTACTS = [{'name': '楊立豪', 'phone': '0912-000-000'}]
+
+
+def make_templates(directory):
+    """Write the two CLI templates (報價單 and 合約) with the code and project name placeholders"""
+    from docx import Document
+
+    paths = []
+    for name in ('template.docx', 'template2.docx'):
+        doc = Document()
+        doc.add_paragraph('code')
+        doc.add_paragraph('project_name')
+        path = os.path.join(directory, name)
+        doc.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_projects(count, date='2025-04-18'):
+    return [
+        {
+            'project_name': f'項目{n:02}',
+            'company_name': COMPANIES[n % 2]['companyName'],
+            'contacts': '楊立豪',
+            'date': date,
+            'price': 1000 * (n + 1)
+        }
+        for n in range(count)
+    ]
+
+
+def read_code(path):
+    """The code a generated document was given (its first paragraph)"""
+    from docx import Document
+    return Document(path).paragraphs[0].text
+
+
+def run_quiet(fn, *args, **kwargs):
+    """Call fn with its console output captured; returns (result, output)"""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        result = fn(*args, **kwargs)
+    return result, buffer.getvalue()
+
+
+def test_parallel_jobs():
+    """Test that --jobs N renders exactly what a sequential run does"""
+    print("\nTesting parallel rendering...")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        from cli.manifest import RUNS_DIR
+        from cli.registry import Registry
+        from main import process_projects
+
+        template_paths = make_templates(workdir)
+        projects = make_projects(6)
+        projects.insert(3, {'project_name': '缺少公司', 'price': 1})
+
+        runs = {}
+        for jobs in (1, 3):
+            output_base = os.path.join(workdir, f'output-{jobs}')
+            registry = Registry([dict(c) for c in COMPANIES], [dict(c) for c in CONTACTS])
+            success, output = run_quiet(
+                process_projects, list(projects), registry, template_paths, output_base, jobs=jobs
+            )
+            (day,) = [name for name in os.listdir(output_base) if name != RUNS_DIR]
+            output_path = os.path.join(output_base, day)
+            files = sorted(name for name in os.listdir(output_path) if name.endswith('.docx'))
+            codes = {name: read_code(os.path.join(output_path, name)) for name in files}
+            order = [
+                os.path.basename(line.split(': ', 1)[1])
+                for line in output.splitlines() if line.startswith('成功生成文檔')
+            ]
+            runs[jobs] = (success, files, codes, order, output.replace(output_base, '<output>'))
+
+        sequential, parallel = runs[1], runs[3]
+        assert sequential[0] is True and parallel[0] is True
+        assert len(sequential[1]) == 12 and sequential[1] == parallel[1]
+        assert sequential[2] == parallel[2]
+        assert sequential[2]['項目00_報價單.docx'] == 'HIYES25DAR001'
+        assert sequential[2]['項目05_合約.docx'] == 'HIYES25DAR006'
+        print("  ✓ Same files and codes with 1 and 3 processes")
+
+        assert sequential[3][:2] == ['項目00_報價單.docx', '項目00_合約.docx']
+        assert sequential[4] == parallel[4]
+        lines = parallel[4].splitlines()
+        error = lines.index('錯誤: 項目缺少必要字段: company_name')
+        assert lines[error - 1] == '處理項目 #4: 缺少公司'
+        assert lines[error + 2] == '處理項目 #5: 項目03'
+        print("  ✓ Console output identical to a sequential run, grouped per project")
+
+        # Failure gating: nothing valid, or every render failing, is a failed run
+        for jobs in (1, 3):
+            registry = Registry([dict(c) for c in COMPANIES], [])
+            success, _ = run_quiet(
+                process_projects, [{'project_name': 'X', 'company_name': '不存在', 'price': 1}],
+                registry, template_paths, os.path.join(workdir, f'invalid-{jobs}'), jobs=jobs
+            )
+            assert success is False
+
+            broken = os.path.join(workdir, f'broken-{jobs}', 'template.docx')
+            os.makedirs(os.path.dirname(broken))
+            Path(broken).write_bytes(b'not a docx')
+            success, output = run_quiet(
+                process_projects, make_projects(2), registry, [broken],
+                os.path.join(workdir, f'broken-output-{jobs}'), jobs=jobs
+            )
+            assert success is False and '錯誤: 生成文檔時出錯' in output
+
+            success, _ = run_quiet(
+                process_projects, make_projects(2), registry, [os.path.join(workdir, 'missing.docx')],
+                os.path.join(workdir, f'missing-{jobs}'), jobs=jobs
+            )
+            assert success is False
+        print("  ✓ Invalid input, failed renders and missing templates fail in both modes")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_registry():
+    """Test company and contact lookup and saving new contacts"""
+    print("\nTesting registry...")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        import json
+        from cli.registry import Registry
+
+        companies = [
+            {'companyName': 'ＡＢＣ　國際股份有限公司', 'taxID': '1'},
+            {'companyName': 'abc 國際股份有限公司', 'taxID': '2'},
+        ]
+        registry = Registry(companies, [{'name': '楊立豪', 'phone': '1'}, {'name': '楊立豪 ', 'phone': '2'}])
+        assert registry.company('  ABC 國際股份有限公司 ')['taxID'] == '1'
+        assert registry.company('abc  國際股份有限公司')['taxID'] == '1'
+        assert registry.company('ABC') is None
+        assert registry.company(None) is None
+        assert registry.contact(' 楊立豪') == '楊立豪 TEL: 1'
+        print("  ✓ Names matched across full-width forms, spacing and case; first duplicate wins")
+
+        with open(os.path.join(workdir, 'companies.json'), 'w', encoding='utf-8') as file:
+            json.dump(COMPANIES, file, ensure_ascii=False)
+        contacts_file = os.path.join(workdir, 'contacts.json')
+        with open(contacts_file, 'w', encoding='utf-8') as file:
+            json.dump(CONTACTS, file, ensure_ascii=False)
+        original = Path(contacts_file).read_bytes()
+
+        registry = Registry.load(workdir)
+        assert registry.contact('王小明') == '王小明'
+        assert registry.contact('王小明') == '王小明 TEL: ' and len(registry.new_contacts) == 1
+        assert not registry.is_stale()
+
+        # A contact that cannot be written makes the save fail part way
+        registry.contacts.append({'name': 'broken', 'phone': object()})
+        run_quiet(registry.save)
+        assert Path(contacts_file).read_bytes() == original
+        assert sorted(os.listdir(workdir)) == ['companies.json', 'contacts.json']
+        print("  ✓ Failed save leaves contacts.json intact and no temporary file")
+
+        registry.contacts.pop()
+        run_quiet(registry.save)
+        with open(contacts_file, 'r', encoding='utf-8') as file:
+            assert [contact['name'] for contact in json.load(file)] == ['楊立豪', '王小明']
+        assert not registry.is_stale() and registry.new_contacts == []
+        assert Registry.load(workdir).contact('王小明') == '王小明 TEL: '
+        print("  ✓ New contacts written back once and found on reload")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_resume():
+    """Test that an interrupted run resumes from its manifest, also on a later day"""
+    print("\nTesting resumable runs...")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        import json
+        from cli.ledger import NumberingLedger
+        from cli.manifest import RUNS_DIR
+        from cli.registry import Registry
+        from main import process_projects
+
+        template_paths = make_templates(workdir)
+        output_base = os.path.join(workdir, 'output')
+        ledger = NumberingLedger(os.path.join(workdir, 'numbering.sqlite3'))
+        projects = make_projects(4)
+        input_sha256 = 'a' * 64
+
+        def interrupted(records, after):
+            for n, record in enumerate(records):
+                if n == after:
+                    raise KeyboardInterrupt()
+                yield record
+
+        def run(records, **kwargs):
+            registry = Registry([dict(c) for c in COMPANIES], [dict(c) for c in CONTACTS])
+            try:
+                return run_quiet(process_projects, records, registry, template_paths, output_base,
+                                 input_sha256=input_sha256, ledger=ledger, **kwargs)
+            finally:
+                ledger.release_unused()
+
+        try:
+            run(interrupted(projects, 2))
+            raise AssertionError('interrupt swallowed')
+        except KeyboardInterrupt:
+            pass
+
+        manifest_path = os.path.join(output_base, RUNS_DIR, f'{input_sha256}.jsonl')
+        (day,) = [name for name in os.listdir(output_base) if name != RUNS_DIR]
+        assert sorted(os.listdir(os.path.join(output_base, day))) == [
+            '項目00_合約.docx', '項目00_報價單.docx', '項目01_合約.docx', '項目01_報價單.docx'
+        ]
+
+        # Resume "the next day": the first run's folder is no longer today's
+        earlier = os.path.join(output_base, '2000-01-01')
+        os.rename(os.path.join(output_base, day), earlier)
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        for record in records:
+            if record['type'] == 'run':
+                record['output_path'] = earlier
+        with open(manifest_path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+        # A modified document is generated again
+        Path(earlier, '項目01_合約.docx').write_bytes(b'edited')
+
+        success, output = run(list(projects))
+        assert success is True
+        assert '從上次中斷的執行紀錄繼續' in output
+        assert '略過已完成的項目: 項目00 (HIYES25DAR001)' in output
+        assert '略過已完成的項目: 項目01' not in output
+        assert sorted(os.listdir(output_base)) == [RUNS_DIR, '2000-01-01']
+        assert len([name for name in os.listdir(earlier) if name.endswith('.docx')]) == 8
+        codes = sorted(read_code(os.path.join(earlier, f'項目0{n}_報價單.docx')) for n in range(4))
+        assert codes == [f'HIYES25DAR00{n}' for n in range(1, 5)]
+        assert read_code(os.path.join(earlier, '項目01_合約.docx')) == 'HIYES25DAR002'
+        assert not os.path.exists(manifest_path)
+        assert any(name.startswith('manifest-') for name in os.listdir(earlier))
+        print("  ✓ Interrupted run resumed in its own folder with the same codes, valid documents skipped")
+
+        # A manifest whose recorded input hash does not match is not reused
+        input_sha256 = 'b' * 64
+        try:
+            run(interrupted(projects, 1))
+        except KeyboardInterrupt:
+            pass
+        manifest_path = os.path.join(output_base, RUNS_DIR, f'{input_sha256}.jsonl')
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        with open(manifest_path, 'w', encoding='utf-8') as file:
+            file.write(content.replace(input_sha256, 'c' * 64, 1))
+
+        success, output = run(list(projects))
+        assert success is True
+        assert '執行紀錄與輸入內容不符' in output and '略過已完成的項目' not in output
+        print("  ✓ Manifest with a different input hash invalidated")
+
+        # Runs completed within the same second keep their own rotated manifests
+        from cli.manifest import RunManifest
+        rotated_dir = os.path.join(workdir, 'rotated')
+        for _ in range(3):
+            RunManifest(output_base, rotated_dir, {}, 'd' * 64).complete()
+        rotated = sorted(os.listdir(rotated_dir))
+        assert len(rotated) == 3 and all(name.startswith('manifest-') for name in rotated), rotated
+        print("  ✓ Rotated manifests never overwrite each other")
+
+        ledger.close()
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_input_streams():
+    """Test streaming JSON, JSON Lines and CSV input"""
+    print("\nTesting input streams...")
+
+    try:
+        import main
+        from cli import inputs
+        from cli.inputs import detect_format, read_projects
+        from src.utils import row_streams
+        from src.utils.row_streams import iter_json_array
+
+        assert inputs.iter_rows is row_streams.iter_rows
+        assert os.path.abspath(row_streams.__file__) == os.path.join(
+            os.path.dirname(os.path.abspath(main.__file__)), 'functions', 'src', 'utils', 'row_streams.py')
+        print("  ✓ The CLI uses the Cloud Functions readers")
+
+        text = '[ {"project_name": "甲", "price": 12345},\n {"project_name": "乙", "price": 1.5e3}, 678 ]'
+        for chunk_size in (1, 3, 7, 64 * 1024):
+            rows = list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+            assert rows == [(1, {'project_name': '甲', 'price': 12345}),
+                            (2, {'project_name': '乙', 'price': 1500.0}), (3, 678)], (chunk_size, rows)
+        projects = list(read_projects(io.StringIO(text), 'json'))
+        assert projects[0]['project_name'] == '甲'
+        assert isinstance(projects[2], ValueError) and '第 3 筆記錄不是物件' in str(projects[2])
+        print("  ✓ JSON array read element by element across chunk boundaries")
+
+        stream = read_projects(io.StringIO('[{"project_name": "甲"}, {"project_name": '), 'json')
+        assert next(stream) == {'project_name': '甲'}
+        try:
+            next(stream)
+            raise AssertionError('truncated array accepted')
+        except ValueError:
+            pass
+        print("  ✓ Malformed JSON array stops after the rows already read")
+
+        projects = list(read_projects(io.StringIO('{"project_name": "甲"}\n\n{bad\n{"project_name": "乙"}\n'), 'jsonl'))
+        assert projects[0] == {'project_name': '甲'} and projects[2] == {'project_name': '乙'}
+        assert isinstance(projects[1], ValueError) and str(projects[1]).startswith('第 3 行')
+        print("  ✓ JSON Lines: a bad line reported with its line number, the rest read")
+
+        text = 'project_name, company_name ,price,contacts\n甲, 海悅 ,"1,000",\n,,,\n乙,霞飛,2000,楊立豪\n'
+        projects = list(read_projects(io.StringIO(text, newline=''), 'csv'))
+        assert projects == [
+            {'project_name': '甲', 'company_name': '海悅', 'price': '1,000'},
+            {'project_name': '乙', 'company_name': '霞飛', 'price': '2000', 'contacts': '楊立豪'},
+        ]
+        assert [detect_format(name) for name in ('a.json', 'a.JSONL', 'a.ndjson', 'a.csv')] == ['json', 'jsonl', 'jsonl', 'csv']
+        print("  ✓ CSV rows read with stripped headers and values, empty cells and rows left out")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def reserve_serials(ledger_path, date_str, count):
+    """Take count serials from a ledger (run in a separate process)"""
+    from cli.ledger import NumberingLedger
+
+    ledger = NumberingLedger(ledger_path)
+    try:
+        return [ledger.next_serial(date_str) for _ in range(count)]
+    finally:
+        ledger.close()
+
+
+def test_numbering_ledger():
+    """Test serial reservation across processes, returning unused serials and code lookup"""
+    print("\nTesting numbering ledger...")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+        from cli.ledger import RESERVE_BLOCK, NumberingLedger
+        from main import main as cli_main
+
+        ledger_path = os.path.join(workdir, 'numbering.sqlite3')
+        NumberingLedger(ledger_path).close()
+
+        count = RESERVE_BLOCK * 2 + 5
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(reserve_serials, ledger_path, '2025-04-18', count) for _ in range(2)]
+            first, second = [future.result() for future in futures]
+        assert len(first) == len(second) == count
+        assert not set(first) & set(second)
+        assert first == sorted(first) and second == sorted(second)
+        print("  ✓ Two processes never get the same serial")
+
+        ledger = NumberingLedger(ledger_path)
+        assert [ledger.next_serial('2025-05-01') for _ in range(3)] == [1, 2, 3]
+        ledger.release_unused()
+        assert ledger.next_serial('2025-05-01') == 4
+        ledger.close()
+
+        # Unused serials cannot be returned once another run reserved after them
+        ledger = NumberingLedger(ledger_path)
+        assert ledger.next_serial('2025-06-01') == 1
+        assert reserve_serials(ledger_path, '2025-06-01', 1) == [RESERVE_BLOCK + 1]
+        ledger.release_unused()
+        assert ledger.next_serial('2025-06-01') == RESERVE_BLOCK + 2
+        ledger.close()
+        print("  ✓ Unused serials of a partial run returned unless another run reserved after them")
+
+        from cli.registry import Registry
+        from main import prepare_project
+
+        registry = Registry([dict(c) for c in COMPANIES], [dict(c) for c in CONTACTS])
+        assigned = []
+
+        def assign_code(date_str, date):
+            assigned.append(date_str)
+            return f'CODE{len(assigned)}'
+
+        project = {'project_name': '項目', 'company_name': COMPANIES[0]['companyName'], 'price': 1000,
+                   'date': '2025-04-18'}
+        for invalid in ({'price': 'abc'}, {'contact_date': '2025/04/18'}, {'date': '2025-13-01'}):
+            result, _ = run_quiet(prepare_project, {**project, **invalid}, registry, assign_code, '2025-04-18')
+            assert result is None and assigned == [], invalid
+        result, _ = run_quiet(prepare_project, project, registry, assign_code, '2025-04-18')
+        assert result['code'] == 'CODE1' and assigned == ['2025-04-18']
+        print("  ✓ Codes assigned only to rows that pass validation")
+
+        ledger = NumberingLedger(ledger_path)
+        ledger.issue('HIYES25DAR001', '2025-04-18', 1, '項目00', '海悅', '/output/2025-04-18')
+        ledger.close()
+
+        result, output = run_quiet(cli_main, ['--lookup', 'HIYES25DAR001', '--ledger', ledger_path])
+        assert result is True and 'project_name: 項目00' in output and 'serial: 1' in output
+        result, output = run_quiet(cli_main, ['--lookup', 'HIYES25DAR999', '--ledger', ledger_path])
+        assert result is False and '沒有 HIYES25DAR999' in output
+        result, output = run_quiet(cli_main, ['--lookup', 'HIYES25DAR001', '--ledger', os.path.join(workdir, 'none')])
+        assert result is False and '找不到編號帳本' in output
+        print("  ✓ --lookup prints the issue record of a code")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_zip_output():
+    """Test writing documents straight into a zip archive"""
+    print("\nTesting zip output...")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        import codecs
+        import csv
+        import zipfile
+        from cli.archive import MANIFEST_CSV, ZipOutput
+        from cli.registry import Registry
+        from main import process_projects
+
+        zip_path = os.path.join(workdir, 'documents.zip')
+        archive = ZipOutput(zip_path, manifest_csv=True)
+        assert os.path.exists(f'{zip_path}.partial') and not os.path.exists(zip_path)
+        names = archive.add_project({'code': 'C1', 'project_name': '甲', 'price': '1,000'},
+                                    [('甲_報價單.docx', b'one'), ('甲_合約.docx', b'two')])
+        assert names == ['甲_報價單.docx', '甲_合約.docx']
+        names = archive.add_project({'code': 'C2', 'project_name': '甲'}, [('甲_報價單.docx', b'three')])
+        assert names == ['C2_甲_報價單.docx']
+        assert archive.close() == zip_path
+        assert sorted(os.listdir(workdir)) == ['documents.zip']
+        print("  ✓ Archive written to .partial and renamed when complete; duplicate names prefixed with the code")
+
+        with zipfile.ZipFile(zip_path) as archive_file:
+            assert archive_file.namelist() == ['甲_報價單.docx', '甲_合約.docx', 'C2_甲_報價單.docx', MANIFEST_CSV]
+            assert archive_file.read('C2_甲_報價單.docx') == b'three'
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in archive_file.infolist())
+            content = archive_file.read(MANIFEST_CSV)
+        assert content.startswith(codecs.BOM_UTF8)
+        rows = list(csv.DictReader(io.StringIO(content[len(codecs.BOM_UTF8):].decode('utf-8'))))
+        assert [row['code'] for row in rows] == ['C1', 'C2']
+        assert rows[0]['files'] == '甲_報價單.docx;甲_合約.docx' and rows[0]['price'] == '1,000'
+        assert rows[1]['files'] == 'C2_甲_報價單.docx' and rows[1]['price'] == ''
+        print("  ✓ manifest.csv lists every project with its files")
+
+        archive = ZipOutput(os.path.join(workdir, 'empty.zip'), manifest_csv=True)
+        assert archive.close() is None
+        archive = ZipOutput(os.path.join(workdir, 'failed.zip'))
+        archive.add_project({'code': 'C3'}, [('a.docx', b'a')])
+        archive.discard()
+        assert sorted(os.listdir(workdir)) == ['documents.zip']
+        print("  ✓ Empty and discarded archives leave no files")
+
+        # An interrupted run discards its archive
+        template_paths = make_templates(workdir)
+
+        def interrupted(records):
+            yield records[0]
+            raise KeyboardInterrupt()
+
+        registry = Registry([dict(c) for c in COMPANIES], [dict(c) for c in CONTACTS])
+        zip_path = os.path.join(workdir, 'run.zip')
+        try:
+            run_quiet(process_projects, interrupted(make_projects(2)), registry, template_paths,
+                      os.path.join(workdir, 'output'), input_sha256='d' * 64, zip_path=zip_path, zip_manifest=True)
+            raise AssertionError('interrupt swallowed')
+        except KeyboardInterrupt:
+            pass
+        assert not os.path.exists(zip_path) and not os.path.exists(f'{zip_path}.partial')
+
+        success, _ = run_quiet(process_projects, make_projects(2), registry, template_paths,
+                               os.path.join(workdir, 'output'), input_sha256='d' * 64,
+                               zip_path=zip_path, zip_manifest=True)
+        assert success is True
+        with zipfile.ZipFile(zip_path) as archive_file:
+            assert sorted(archive_file.namelist()) == sorted([
+                '項目00_報價單.docx', '項目00_合約.docx', '項目01_報價單.docx', '項目01_合約.docx', MANIFEST_CSV
+            ])
+        print("  ✓ Interrupted run leaves no archive; the rerun writes a complete one")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_watch_polling():
+    """Test that watch mode without inotify picks up a dropped input file"""
+    print("\nTesting watch mode (polling)...")
+
+    workdir = tempfile.mkdtemp()
+    try:
+        import json
+        import threading
+        import time
+        from datetime import datetime
+        from cli.ledger import NumberingLedger
+        from cli.registry import Registry
+        from cli.watch import FolderWatcher
+        from main import parse_args, watch_input
+
+        template_paths = make_templates(workdir)
+        input_dir = os.path.join(workdir, 'input')
+        output_base = os.path.join(workdir, 'output')
+        os.makedirs(input_dir)
+        today = datetime.now().strftime('%Y-%m-%d')
+        moved = os.path.join(input_dir, today, 'projects.json')
+
+        class StopWhenMoved(FolderWatcher):
+            """Polling watcher that ends the watch once the input was moved (or after a timeout)"""
+
+            deadline = time.monotonic() + 30
+
+            def wait(self, timeout=None):
+                if os.path.exists(moved) or time.monotonic() > self.deadline:
+                    raise KeyboardInterrupt()
+                super().wait(timeout)
+
+        watcher = StopWhenMoved(input_dir, poll_interval=0.05, inotify=False)
+        assert watcher.fd is None and watcher.mode.startswith('輪詢')
+
+        def drop():
+            time.sleep(0.3)
+            partial = os.path.join(input_dir, '.projects.json.tmp')
+            with open(partial, 'w', encoding='utf-8') as file:
+                json.dump(make_projects(2), file, ensure_ascii=False)
+            os.replace(partial, os.path.join(input_dir, 'projects.json'))
+
+        dropper = threading.Thread(target=drop)
+        dropper.start()
+
+        ledger = NumberingLedger(':memory:')
+        registry = Registry([dict(c) for c in COMPANIES], [dict(c) for c in CONTACTS])
+        result, output = run_quiet(
+            watch_input, input_dir, workdir, registry, ledger, template_paths, output_base,
+            parse_args(['--watch']), watcher=watcher
+        )
+        dropper.join()
+        ledger.close()
+
+        assert result is True and '發現輸入文件' in output
+        assert os.path.exists(moved) and not os.path.exists(os.path.join(input_dir, 'projects.json'))
+        assert len([name for name in os.listdir(os.path.join(output_base, today)) if name.endswith('.docx')]) == 4
+        print("  ✓ Dropped file processed and moved to the dated input folder")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_render_server():
+    """Test the render server in process: busy replies, template confinement and client fallback"""
+    print("\nTesting render server...")
+
+    workdir = tempfile.mkdtemp()
+    server = None
+    try:
+        import json
+        import socket
+        import threading
+        import urllib.error
+        import urllib.request
+        from render_service.client import RenderClient, RenderServiceError
+        from render_service.server import MAX_LOG_HEADER_BYTES, RenderServer
+
+        root = os.path.join(workdir, 'templates')
+        os.makedirs(root)
+        template_path, _ = make_templates(root)
+        outside = os.path.join(workdir, 'outside.docx')
+        shutil.copy(template_path, outside)
+        os.symlink(outside, os.path.join(root, 'link.docx'))
+        Path(root, 'notes.txt').write_text('x')
+
+        server = RenderServer(('127.0.0.1', 0), [root], workers=1, max_pending=1)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        assert server.resolve_template(template_path) == os.path.realpath(template_path)
+        for path in (os.path.join(root, '..', 'outside.docx'), os.path.join(root, 'link.docx'),
+                     os.path.join(root, 'notes.txt'), os.path.join(root, 'missing.docx'), None):
+            assert server.resolve_template(path) is None, path
+        try:
+            RenderClient(url, max_retries=0).placeholders(os.path.join(root, 'link.docx'))
+            raise AssertionError('symlink escape accepted')
+        except RenderServiceError as e:
+            assert str(e).startswith('403')
+        print("  ✓ Templates outside the allowed roots rejected, including .. and symlink escapes")
+
+        # Requests through a rebound DNS name, or without a JSON body type, are refused
+        body = json.dumps({'template': template_path}).encode('utf-8')
+        port = server.server_address[1]
+        for host, content_type, status in (
+            (f'attacker.example:{port}', 'application/json', 403),
+            ('127.0.0.1', 'application/json', 403),
+            (f'127.0.0.1:{port}', 'text/plain', 415),
+            (f'127.0.0.1:{port}', None, 415),
+            (f'localhost:{port}', 'application/json; charset=utf-8', 200),
+        ):
+            headers = {'Host': host}
+            if content_type:
+                headers['Content-Type'] = content_type
+            request = urllib.request.Request(f'{url}/placeholders', method='POST', data=body, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    code = response.status
+            except urllib.error.HTTPError as e:
+                code = e.code
+            assert code == status, (host, content_type, code)
+        request = urllib.request.Request(f'{url}/health', headers={'Host': f'attacker.example:{port}'})
+        try:
+            urllib.request.urlopen(request, timeout=5)
+            raise AssertionError('foreign Host accepted')
+        except urllib.error.HTTPError as e:
+            assert e.code == 403
+        print("  ✓ Foreign Host headers and non-JSON POST bodies rejected")
+
+        client = RenderClient(url, max_retries=0)
+        assert client.available()
+        content, log = client.render(template_path, {'code': 'HIYES25DAR001'})
+        assert content.startswith(b'PK') and log == ''
+
+        # Every slot taken: the server answers 503 with Retry-After at once
+        server.slots.acquire()
+        request = urllib.request.Request(f'{url}/placeholders', method='POST',
+                                         data=json.dumps({'template': template_path}).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(request, timeout=5)
+            raise AssertionError('busy server accepted a request')
+        except urllib.error.HTTPError as e:
+            assert e.code == 503 and e.headers['Retry-After'] == '1'
+        try:
+            client.placeholders(template_path)
+            raise AssertionError('client did not give up')
+        except RenderServiceError as e:
+            assert str(e).startswith('503')
+
+        # The client retries after Retry-After and succeeds once a slot is free
+        threading.Timer(0.5, server.slots.release).start()
+        assert RenderClient(url, max_retries=3).placeholders(template_path) == []
+        print("  ✓ Busy server replies 503 with Retry-After; the client waits and retries")
+
+        # A long warning log no longer breaks the response headers
+        variables = {f'missing_placeholder_{n:05}': '值' for n in range(3000)}
+        content, log = client.render(template_path, variables)
+        assert content.startswith(b'PK') and '已截斷' in log
+        assert len(json.dumps(log)) <= MAX_LOG_HEADER_BYTES
+        print("  ✓ Oversized render log truncated to fit the header limit")
+
+        # Local fallback when no server is running or the server refuses
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            unused_url = f'http://127.0.0.1:{sock.getsockname()[1]}'
+        assert not RenderClient(unused_url).available()
+
+        sys.path.insert(0, str(Path(__file__).parent / 'web_platform'))
+        import app as web_app
+
+        for render_url in (unused_url, url):
+            os.environ['AUTODOCGEN_RENDER_URL'] = render_url
+            placeholders, output = run_quiet(web_app.extract_placeholders, outside)
+            assert placeholders == set()
+        assert '改為本地解析' in output
+
+        from main import render_document_bytes
+        data = {
+            'project_name': '甲', 'company_name': '海悅', 'contacts': '', 'date': '2025-04-18', 'price': '1',
+            'untaxed': '1', 'taxes': '0', 'company_head': '王', 'taxID': '1', 'company_address': '臺北',
+            'now_year': 114, 'now_month': 4, 'now_day': 18, 'code': 'HIYES25DAR001', 'company_info': '海悅 1'
+        }
+        from docx import Document
+        local, _ = run_quiet(render_document_bytes, template_path, data)
+        remote, _ = run_quiet(render_document_bytes, template_path, data, url)
+        assert [p.text for p in Document(io.BytesIO(local)).paragraphs] == \
+            [p.text for p in Document(io.BytesIO(remote)).paragraphs] == ['HIYES25DAR001', '甲']
+        print("  ✓ Placeholders parsed locally without a server; local and server renders match")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        os.environ.pop('AUTODOCGEN_RENDER_URL', None)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print("CLI Tests")
+    print("=" * 60)
+
+    tests = [
+        test_parallel_jobs,
+        test_registry,
+        test_resume,
+        test_input_streams,
+        test_numbering_ledger,
+        test_zip_output,
+        test_watch_polling,
+        test_render_server,
+    ]
+
+    results = []
+    for test in tests:
+        results.append(test())
+
+    print("\n" + "=" * 60)
+    print(f"Results: {sum(results)}/{len(results)} tests passed")
+    print("=" * 60)
+
+    if all(results):
+        print("\n✓ All tests passed! The CLI is ready to use.")
+        return 0
+    else:
+        print("\n✗ Some tests failed. Please fix the issues before running the CLI.")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
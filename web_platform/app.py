@@ -1,9 +1,13 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory
 import os
+import sys
 import json
-from docx import Document
 from werkzeug.utils import secure_filename
 
+# 與 CLI 共用的 render_service 位於專案根目錄
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from render_service.client import RenderClient, RenderServiceError  # noqa: E402
+
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
@@ -114,35 +118,16 @@ def field_settings(template_name):
     return render_template('field_settings.html', template_name=template_name, placeholders=placeholders, selected_fields=selected_fields)
 
 def extract_placeholders(docx_path):
-    doc = Document(docx_path)
-    placeholders = set()
-
-    def find_placeholders_in_text(text):
-        # 目前假設佔位符格式為 {{欄位}} 或直接欄位名
-        import re
-        # 支援 {{欄位}} 格式
-        matches = re.findall(r'{{(.*?)}}', text)
-        placeholders.update([m.strip() for m in matches if m.strip()])
-        # 也可加入直接字串匹配，視需求調整
-        # matches2 = re.findall(r'\b\w+\b', text)
-        # placeholders.update(matches2)
-
-    for p in doc.paragraphs:
-        find_placeholders_in_text(p.text)
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    find_placeholders_in_text(p.text)
-
-    for section in doc.sections:
-        for p in section.header.paragraphs:
-            find_placeholders_in_text(p.text)
-        for p in section.footer.paragraphs:
-            find_placeholders_in_text(p.text)
-
-    return placeholders
+    # render server 執行中時交給它解析，不必在此載入 python-docx
+    client = RenderClient()
+    if client.available():
+        try:
+            return set(client.placeholders(docx_path))
+        except RenderServiceError as e:
+            print(f"警告: render server 無法解析模板，改為本地解析: {e}")
+
+    from render_service.documents import extract_placeholders as extract_locally
+    return extract_locally(docx_path)
 
 if __name__ == '__main__':
     app.run(debug=True)